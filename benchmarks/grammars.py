@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+"""
+Synthetic EBNF grammars for the benchmarks, each stressing one part of the
+Grammar rules. Every generator returns the text of a grammar that parses
+as a Grammar, and grows linearly with n.
+"""
+
+
+def many_rules(n):
+    """n short rules, each referring to the next one."""
+    return "".join("rule{} = 'x' | rule{} , \"y\" ;\n".format(i, i + 1) for i in xrange(n))
+
+
+def deep_nesting(n, depth=20):
+    """n rules of groups, options and repetitions nested depth times."""
+    brackets = ("( ", " )"), ("[ ", " ]"), ("{ ", " }")
+    opening = "".join(brackets[i % 3][0] for i in xrange(depth))
+    closing = "".join(brackets[i % 3][1] for i in reversed(xrange(depth)))
+    return "".join("deep{} = {}a | 'b'{} ;\n".format(i, opening, closing) for i in xrange(n))
+
+
+def long_terminals(n, length=1000):
+    """n rules with a quoted terminal of about length characters each."""
+    terminal = "abc\\'d" * (length // 6)
+    return "".join("term{} = '{}' ;\n".format(i, terminal) for i in xrange(n))
+
+
+def long_whitespace(n, width=1000):
+    """n rules with runs of width whitespace characters between tokens."""
+    space = "".join(" \t\n"[i % 3] for i in xrange(width))
+    return "".join("ws{0}{1}={1}a{1}|{1}b{1};{1}".format(i, space) for i in xrange(n))
+
+
+GRAMMARS = (
+    ("many_rules", many_rules),
+    ("deep_nesting", deep_nesting),
+    ("long_terminals", long_terminals),
+    ("long_whitespace", long_whitespace),
+)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Time the parse driver, stream handling and serialization.
+
+Every benchmark runs in its own process, so its peak memory is not hidden
+by the ones before it. The best of several runs is reported as characters
+per second, with the peak resident memory the runs added on top of the
+setup. Results can be saved as a JSON baseline, and later runs compared
+against it to catch regressions:
+
+    python -m benchmarks.run --save baseline.json
+    python -m benchmarks.run --compare baseline.json
+"""
+
+from __future__ import print_function
+
+from benchmarks.grammars import GRAMMARS
+from parser_gen.batch import parse_many
+from parser_gen.incremental import IncrementalParse
+from parser_gen.iterator_tools import ExtendedIterator
+from parser_gen.json_writer import dump_json
+from parser_gen.driver import table_parse
+from parser_gen.parse_table import ParseTable
+from parser_gen.production_rules import Grammar, Rule
+from parser_gen.stream_handler import StreamHandler
+from parser_gen.utils import base_parse_args
+
+import collections
+import copy
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+
+# Size of the generated grammars at scale 1, picked so each run takes a
+# fraction of a second.
+SIZES = {
+    "many_rules": 2000,
+    "deep_nesting": 200,
+    "long_terminals": 10,
+    "long_whitespace": 5,
+}
+
+ITERATOR_ITEMS = 100000
+
+SNIPPETS = 2000
+
+# Benchmarks by name. Each is a generator taking the scale, which sets up
+# and yields the number of characters it processes and the function to
+# time, and cleans up once resumed.
+BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def grammar_text(name, scale):
+    return dict(GRAMMARS)[name](max(int(SIZES[name] * scale), 1))
+
+
+def _register_grammar_benchmarks(name):
+    @benchmark("table_parse." + name)
+    def parse(scale):
+        text = grammar_text(name, scale)
+        table = ParseTable(Grammar)
+        yield len(text), lambda: table_parse(StreamHandler.from_str(text), Grammar, table=table)
+
+    @benchmark("json." + name)
+    def to_json(scale):
+        text = grammar_text(name, scale)
+        tree = table_parse(StreamHandler.from_str(text), Grammar)
+        yield len(text), tree.json
+
+    @benchmark("dump_json." + name)
+    def dump(scale):
+        text = grammar_text(name, scale)
+        tree = table_parse(StreamHandler.from_str(text), Grammar)
+        with open(os.devnull, "w") as f:
+            yield len(text), lambda: dump_json(tree, f)
+
+
+for _name, _ in GRAMMARS:
+    _register_grammar_benchmarks(_name)
+
+
+@benchmark("from_filename")
+def from_filename(scale):
+    text = grammar_text("many_rules", scale)
+    f = tempfile.NamedTemporaryFile(suffix=".txt", delete=False)
+    with f:
+        f.write(text)
+    table = ParseTable(Grammar)
+    try:
+        def run():
+            with StreamHandler.from_filename(f.name) as stream:
+                table_parse(stream, Grammar, table=table)
+        yield len(text), run
+    finally:
+        os.remove(f.name)
+
+
+def snippets(scale):
+    """Single Rules of the many_rules grammar."""
+    return grammar_text("many_rules", scale * SNIPPETS / SIZES["many_rules"]).splitlines(True)
+
+
+@benchmark("table_parse.snippets")
+def parse_snippets(scale):
+    texts = snippets(scale)
+    table = ParseTable(Rule)
+    yield sum(map(len, texts)), lambda: [table_parse(StreamHandler.from_str(t), Rule, table=table) for t in texts]
+
+
+@benchmark("parse_many.snippets")
+def parse_many_snippets(scale):
+    texts = snippets(scale)
+    table = ParseTable(Rule)
+    yield sum(map(len, texts)), lambda: parse_many(texts, Rule, table=table)
+
+
+@benchmark("IncrementalParse.edit")
+def incremental_edit(scale):
+    """
+    Edit a Rule in the middle of the many_rules grammar and back. The
+    characters are those of the whole grammar, so the rate compares with
+    parsing it again from scratch.
+    """
+    text = grammar_text("many_rules", scale)
+    doc = IncrementalParse(text)
+    offsets = doc.rule_offsets()
+    pos = offsets[len(offsets) // 2] + text[offsets[len(offsets) // 2]:].index("'x'")
+
+    def run():
+        doc.edit(pos, pos + 3, "'z' | c")
+        doc.edit(pos, pos + 7, "'x'")
+    yield len(text), run
+
+
+@benchmark("ExtendedIterator.peek")
+def peek(scale):
+    items = int(ITERATOR_ITEMS * scale)
+
+    def run():
+        iterator = ExtendedIterator(xrange(items))
+        for i in xrange(items):
+            iterator.peek(2)
+            next(iterator)
+    yield items, run
+
+
+@benchmark("ExtendedIterator.__deepcopy__")
+def deepcopy(scale):
+    items = int(ITERATOR_ITEMS * scale)
+
+    def run():
+        iterator = ExtendedIterator(xrange(items))
+        for i in xrange(items // 100):
+            iterator.peek(1)
+            copy.deepcopy(iterator)
+            next(iterator)
+    yield items // 100, run
+
+
+def _rss_kb():
+    """Resident memory of this process in kB."""
+    with open("/proc/self/statm", "r") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def _run(args):
+    name, scale, repeat = args
+    steps = BENCHMARKS[name](scale)
+    chars, func = next(steps)
+    start_kb = _rss_kb()
+    times = []
+    for i in xrange(repeat):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    next(steps, None)
+    best = min(times)
+    return {
+        "chars": chars,
+        "seconds": best,
+        "chars_per_sec": chars / best if best else float("inf"),
+        "peak_kb": max(peak_kb - start_kb, 0),
+    }
+
+
+def run_benchmarks(names, scale=1.0, repeat=3):
+    """Results of the benchmarks by name, each run in a fresh process."""
+    results = collections.OrderedDict()
+    for name in names:
+        pool = multiprocessing.Pool(1, maxtasksperchild=1)
+        try:
+            results[name] = pool.apply(_run, ((name, scale, repeat),))
+        finally:
+            pool.close()
+            pool.join()
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """Names of the benchmarks that got slower than the baseline allows."""
+    slower = []
+    for name, result in results.iteritems():
+        base = baseline.get(name)
+        if base and result["chars_per_sec"] < base["chars_per_sec"] * (1 - tolerance):
+            slower.append(name)
+    return slower
+
+
+def get_args():
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description="Benchmark the parser.")
+
+    parser.add_argument("benchmarks", nargs="*",
+                        help="Benchmarks to run, or prefixes of their "
+                        "names. Defaults to all of them.")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply the size of every input by this.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs of each benchmark, of which the best "
+                        "one is reported.")
+    parser.add_argument("--save",
+                        help="Save the results as a JSON baseline.")
+    parser.add_argument("--compare",
+                        help="Compare the results to a JSON baseline and "
+                        "fail on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Fraction of speed a benchmark may lose to "
+                        "the baseline. Defaults to %(default)s.")
+
+    return base_parse_args(parser, __name__)
+
+
+def main():
+    args = get_args()
+
+    names = [n for n in BENCHMARKS if not args.benchmarks or any(n.startswith(p) for p in args.benchmarks)]
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(names, scale=args.scale, repeat=args.repeat)
+    print("{:<36} {:>10} {:>14} {:>10} {:>9}".format("benchmark", "chars", "chars/sec", "peak kB", "baseline"))
+    for name, result in results.iteritems():
+        base = baseline.get(name)
+        change = "{:+.0%}".format(result["chars_per_sec"] / base["chars_per_sec"] - 1) if base else ""
+        print("{:<36} {:>10} {:>14.0f} {:>10} {:>9}".format(
+            name, result["chars"], result["chars_per_sec"], result["peak_kb"], change))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    slower = regressions(results, baseline, args.tolerance)
+    if slower:
+        print("Slower than the baseline: {}".format(", ".join(slower)), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
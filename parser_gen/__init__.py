@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""
+EBNF parser generator.
+
+Importing the package only defines parse(), parse_many() and
+compile_grammar(). The parse driver, the EBNF meta-grammar and the grammar
+cache are imported by their first call, so processes that never parse don't
+pay for loading them.
+
+The driver module used to be called parse. parser_gen.parse still imports
+its names, and calling it still calls parse().
+"""
+
+
+def parse(text, starting_rule=None, k=1, lexer=None):
+    """
+    Parse a string from a rule class, or as an EBNF grammar with the builtin
+    Grammar rules if none is given. Returns the parse tree.
+    """
+    from driver import table_parse
+    from stream_handler import StreamHandler
+    if starting_rule is None:
+        from production_rules import Grammar
+        starting_rule = Grammar
+    return table_parse(StreamHandler.from_str(text), starting_rule, k=k, lexer=lexer)
+
+
+def parse_many(inputs, starting_rule=None, *args, **kwargs):
+    """
+    Parse many strings with one parser, as EBNF grammars if no rule is
+    given. Returns a (tree, error) pair per string. Takes the arguments of
+    batch.parse_many.
+    """
+    from batch import parse_many
+    if starting_rule is None:
+        from production_rules import Grammar
+        starting_rule = Grammar
+    return parse_many(inputs, starting_rule, *args, **kwargs)
+
+
+def compile_grammar(filename, *args, **kwargs):
+    """
+    Standalone parser of an EBNF grammar file, kept in an on-disk cache.
+    Takes the arguments of grammar_cache.compile_grammar.
+    """
+    from grammar_cache import compile_grammar
+    return compile_grammar(filename, *args, **kwargs)
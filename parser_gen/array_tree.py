@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parse trees stored in parallel arrays instead of one object per node.
+
+An ArrayTree keeps one entry per node in array.array columns: the id of its
+rule class, its start and end offsets in the buffer, its first child and its
+next sibling. Characters matched directly by a rule are not stored at all,
+they are the text of the node between its children. A node costs a few
+dozen bytes this way instead of the hundreds of a ProductionRule instance
+and its productions tuple, and a terminal character costs nothing.
+
+array_parse() builds the columns from the events of parse_events(), so it
+never instantiates the rules. TreeNode views read the columns on access.
+str() slices the buffer and json() builds the ProductionRule nodes of the
+subtree it is called on, so it returns the same as the json() of the tree
+the other parsers return.
+"""
+
+from iterator_tools import BufferIterator
+from lexer import Lexeme
+from driver import ENTER, EXIT, parse_events
+from production_rules import terminal
+from utils import split_chars
+
+import array
+
+
+# Rule ids, and offsets and node indices, with -1 for no node.
+RULE_TYPECODE = "i"
+INDEX_TYPECODE = "l"
+
+
+class ArrayTree(object):
+    """Nodes of a parse tree over a buffer, in the order they start."""
+
+    def __init__(self, buff, utf8=False):
+        self.__buffer = buff
+        self.__utf8 = utf8
+        self.__rules = []
+        self.__rule_ids = {}
+        self.__rule_column = array.array(RULE_TYPECODE)
+        self.__starts = array.array(INDEX_TYPECODE)
+        self.__ends = array.array(INDEX_TYPECODE)
+        self.__first_children = array.array(INDEX_TYPECODE)
+        self.__next_siblings = array.array(INDEX_TYPECODE)
+        # Last child of every node, only needed while appending.
+        self.__last_children = array.array(INDEX_TYPECODE)
+
+    def buffer(self):
+        return self.__buffer
+
+    def utf8(self):
+        return self.__utf8
+
+    def rules(self):
+        """Rule classes by id."""
+        return self.__rules
+
+    def __len__(self):
+        return len(self.__rule_column)
+
+    def add_node(self, rule_cls, parent, start):
+        """
+        Append a node starting at the offset start as the last child of the
+        node parent, or as a root for -1. Returns its index.
+        """
+        rule_id = self.__rule_ids.get(rule_cls)
+        if rule_id is None:
+            rule_id = self.__rule_ids[rule_cls] = len(self.__rules)
+            self.__rules.append(rule_cls)
+
+        node = len(self.__rule_column)
+        self.__rule_column.append(rule_id)
+        self.__starts.append(start)
+        self.__ends.append(start)
+        self.__first_children.append(-1)
+        self.__next_siblings.append(-1)
+        self.__last_children.append(-1)
+
+        if parent >= 0:
+            last = self.__last_children[parent]
+            if last < 0:
+                self.__first_children[parent] = node
+            else:
+                self.__next_siblings[last] = node
+            self.__last_children[parent] = node
+        return node
+
+    def close_node(self, node, end):
+        self.__ends[node] = end
+
+    def finish(self):
+        """Drop the bookkeeping of add_node once the tree is complete."""
+        self.__last_children = None
+
+    def rule_at(self, node):
+        return self.__rules[self.__rule_column[node]]
+
+    def start_at(self, node):
+        return self.__starts[node]
+
+    def end_at(self, node):
+        return self.__ends[node]
+
+    def first_child_at(self, node):
+        return self.__first_children[node]
+
+    def next_sibling_at(self, node):
+        return self.__next_siblings[node]
+
+    def node(self, index):
+        return TreeNode(self, index)
+
+    def root(self):
+        return TreeNode(self, 0)
+
+    def nbytes(self):
+        """Size of the columns in bytes."""
+        columns = (self.__rule_column, self.__starts, self.__ends, self.__first_children, self.__next_siblings)
+        return sum(len(c) * c.itemsize for c in columns)
+
+
+class TreeNode(object):
+    """View of one node of an ArrayTree."""
+
+    def __init__(self, tree, index):
+        self.__tree = tree
+        self.__index = index
+
+    def tree(self):
+        return self.__tree
+
+    def index(self):
+        return self.__index
+
+    def rule(self):
+        return self.__tree.rule_at(self.__index)
+
+    def start(self):
+        return self.__tree.start_at(self.__index)
+
+    def end(self):
+        return self.__tree.end_at(self.__index)
+
+    def children(self):
+        """Views of the child nodes, without the characters between them."""
+        tree = self.__tree
+        child = tree.first_child_at(self.__index)
+        while child >= 0:
+            yield TreeNode(tree, child)
+            child = tree.next_sibling_at(child)
+
+    def __chars(self, start, end):
+        text = self.__tree.buffer()[start:end]
+        return split_chars(text) if self.__tree.utf8() else list(text)
+
+    def productions(self):
+        """
+        Child views and terminal nodes for the characters in between, in
+        the order of the productions of a ProductionRule.
+        """
+        if self.rule() is Lexeme:
+            return []
+
+        productions = []
+        pos = self.start()
+        for child in self.children():
+            productions.extend(terminal(c)() for c in self.__chars(pos, child.start()))
+            productions.append(child)
+            pos = child.end()
+        productions.extend(terminal(c)() for c in self.__chars(pos, self.end()))
+        return productions
+
+    def __new_rule(self):
+        return Lexeme(str(self)) if self.rule() is Lexeme else self.rule()()
+
+    def rule_node(self):
+        """The ProductionRule subtree of this node."""
+        head = self.__new_rule()
+        pending = [(head, self)]
+        while pending:
+            rule, view = pending.pop()
+            nodes = []
+            for p in view.productions():
+                if isinstance(p, TreeNode):
+                    node = p.__new_rule()
+                    pending.append((node, p))
+                    p = node
+                nodes.append(p)
+            if getattr(type(rule), "repeated", None) is not None:
+                rule.apply_rules(nodes)
+            elif nodes:
+                rule.apply_rules(tuple(nodes))
+        return head
+
+    def json(self):
+        return self.rule_node().json()
+
+    def __str__(self):
+        return self.__tree.buffer()[self.start():self.end()]
+
+    def __repr__(self):
+        return "<{} {} {}:{}>".format(type(self).__name__, self.rule().__name__, self.start(), self.end())
+
+
+def array_parse(stream, starting_rule, k=1, table=None, lexer=None):
+    """
+    Parse a buffer backed stream like table_parse, into an ArrayTree.
+    Returns the view of its root node.
+    """
+    char_iter = stream.char_iter()
+    if not isinstance(char_iter, BufferIterator):
+        raise ValueError("Array trees can only be built over a buffer.")
+
+    tree = ArrayTree(char_iter.buffer(), utf8=char_iter.utf8())
+    parents = [-1]
+    for kind, value, pos in parse_events(stream, starting_rule, k=k, table=table, lexer=lexer):
+        if kind is ENTER:
+            parents.append(tree.add_node(value, parents[-1], pos))
+        elif kind is EXIT:
+            tree.close_node(parents.pop(), pos)
+
+    tree.finish()
+    return tree.root()
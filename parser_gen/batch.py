@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parse many small inputs with one parser.
+
+Parsing a short snippet with table_parse mostly costs the driver itself: a
+StreamHandler over the snippet, and a peek of it for every step. A
+BatchParser compiles its ParseTable once and runs the steps of the
+driver's loops, reading the lookahead directly from the characters of the
+input. Its nodes are built by the driver's _TreeBuilder, which it keeps
+between inputs with the stack and the caches of terminal classes.
+
+The trees and the ParseErrors are the same as the ones of compiled_parse.
+parse_many() returns a (tree, error) pair per input instead of raising, and
+can spread the inputs over a pool of processes in batches.
+"""
+
+from driver import ParseError, expected_lookaheads, _step, _TreeBuilder, _NEW, _CLOSE
+from parse_table import MATCH, ParseTable
+from stream_handler import StreamHandler
+from utils import split_chars
+
+import multiprocessing
+
+
+# Inputs handed to a process at once.
+BATCH_SIZE = 1000
+
+# Parser of the pool, inherited by its processes.
+_PARSER = []
+
+
+class BatchParser(object):
+    """Parser of one starting rule, reused for every input it is given."""
+
+    def __init__(self, starting_rule, k=1, table=None, utf8=False):
+        if table is None:
+            table = ParseTable(starting_rule, k=k)
+        elif table.canonical(starting_rule) is not table.start():
+            raise ValueError("Table was compiled for '{}', not '{}'.".format(table.start().__name__, starting_rule.__name__))
+        self.__table = table
+        self.__utf8 = utf8
+        self.__stack = []
+        self.__builder = _TreeBuilder()
+
+    def table(self):
+        return self.__table
+
+    def __chars(self, text):
+        """
+        Indexable characters of text, UTF-8 sequences of byte strings in
+        UTF-8 mode.
+        """
+        if self.__utf8 and isinstance(text, str):
+            try:
+                text.decode("ascii")
+            except UnicodeDecodeError:
+                return split_chars(text)
+        return text
+
+    def parse(self, text):
+        """Parse a string like compiled_parse. Raises the same ParseErrors."""
+        table = self.__table
+        entries = table.entries()
+        builder = self.__builder
+        builder.reset()
+        open_node, close_node, add_character = builder.open, builder.close, builder.character
+        chars = self.__chars(text)
+        n = len(chars)
+        i = 0
+
+        def peek(k):
+            window = list(chars[i:i + k])
+            return window + [""] * (k - len(window))
+
+        stack = self.__stack
+        del stack[:]
+        stack.append((table.start(), _NEW))
+
+        while stack:
+            rule_cls, state = stack.pop()
+            if state is _CLOSE:
+                close_node(rule_cls)
+                continue
+
+            lookahead = chars[i] if i < n else ""
+            rules = _step(table, entries, stack, rule_cls, state, lookahead, peek)
+
+            if rules is MATCH:
+                add_character(lookahead)
+                i += 1
+            elif rules is None:
+                stream = StreamHandler.from_str(text, utf8=self.__utf8)
+                stream.advance(i)
+                raise ParseError.at(stream, rule_cls.__name__, lookahead, expected_lookaheads(table, rule_cls))
+            elif state is _NEW:
+                open_node(rule_cls)
+
+        return builder.root()
+
+    def parse_all(self, inputs):
+        """A (tree, None) or (None, error) pair for every string of inputs."""
+        results = []
+        for text in inputs:
+            try:
+                results.append((self.parse(text), None))
+            except ParseError as e:
+                results.append((None, e))
+        return results
+
+
+def _parse_batch(inputs):
+    return _PARSER[0].parse_all(inputs)
+
+
+def parse_many(inputs, starting_rule, k=1, table=None, processes=None, batch_size=BATCH_SIZE, utf8=False):
+    """
+    Parse every string of inputs from starting_rule. Returns a list of
+    (tree, None) pairs, or (None, error) for the inputs that fail to parse.
+    With utf8 set, byte strings are read as UTF-8 like
+    StreamHandler.from_str does.
+
+    With processes set above 1, batches of batch_size inputs are parsed by a
+    pool of that many processes, which need the rule classes of the trees to
+    be picklable: rules defined at the top of a module or built by the
+    combinators, but not the rules of ebnf.grammar_rules.
+    """
+    parser = BatchParser(starting_rule, k=k, table=table, utf8=utf8)
+    if not processes or processes == 1:
+        return parser.parse_all(inputs)
+
+    inputs = list(inputs)
+    batches = [inputs[i:i + batch_size] for i in xrange(0, len(inputs), batch_size)]
+    # The processes are forked with the parser, so it is never pickled.
+    _PARSER[:] = [parser]
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = []
+        for batch_results in pool.imap(_parse_batch, batches):
+            results.extend(batch_results)
+        return results
+    finally:
+        pool.close()
+        pool.join()
+        del _PARSER[:]
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+"""
+Generate a standalone parser module from production rules.
+
+The rules are compiled into a ParseTable and written out as plain literals:
+integer rule ids, the table keyed by (rule id, character), and how each node
+turns into json. The generated module carries its own table driven parse
+loop, so it does not import parser_gen, never calls get_rules and creates no
+classes while parsing. Characters outside the alphabet of the table are
+looked up as OTHER, which rules like AnyCharacter were compiled to accept.
+"""
+
+from parse_table import DEFAULT_ALPHABET, ParseTable, LookaheadChoice, is_terminal
+from production_rules import K, ProductionRuleError, StringRule, TerminalRule, Whitespace, signature_of
+from utils import utf8_width
+
+
+# How the json of a node is built from its children in the generated module.
+KIND_NAMED = "named"
+KIND_STRING = "string"
+KIND_LIST = "list"
+KIND_PASS = "pass"
+
+PASS_COMBINATORS = ("alternation", "optional", "exclusion")
+
+# Stands in for every character outside the alphabet of the table, like the
+# multi byte characters of UTF-8 input. Its lead byte claims a longer UTF-8
+# sequence, so it is one character that well formed input never contains.
+OTHER = "\xff\xfe"
+
+# Conflicts listed in the error of a grammar that is not LL(1).
+MAX_CONFLICTS = 10
+
+
+def node_kind(rule_cls):
+    if issubclass(rule_cls, (StringRule, Whitespace)):
+        return KIND_STRING
+    if getattr(rule_cls, "repeated", None) is not None:
+        return KIND_LIST
+    signature = signature_of(rule_cls)
+    if isinstance(signature, tuple):
+        return KIND_PASS if signature[0] in PASS_COMBINATORS else KIND_LIST
+    return KIND_NAMED
+
+
+def rule_ids(table):
+    """
+    Number the rules of a table in the order they are reached from the start.
+    The bytes of terminals, which generated parsers read as UTF-8, are not.
+    """
+    ids = {}
+    order = []
+    pending = [table.start()]
+    terminals = table.terminals()
+    while pending:
+        rule_cls = pending.pop(0)
+        if rule_cls in ids:
+            continue
+        ids[rule_cls] = len(order)
+        order.append(rule_cls)
+        if rule_cls not in terminals:
+            for alt in table.productions(rule_cls):
+                pending.extend(alt)
+    return ids, order
+
+
+def encode_entry(entry, ids):
+    if isinstance(entry, dict):
+        return dict((c, encode_entry(child, ids)) for c, child in entry.iteritems())
+    return tuple(ids[r] for r in entry)
+
+
+def sorted_repr(d):
+    """repr of a dict with sorted keys, so generated modules are reproducible."""
+    return "{" + ", ".join("{!r}: {!r}".format(k, d[k]) for k in sorted(d)) + "}"
+
+
+MODULE_TEMPLATE = '''# -*- coding: utf-8 -*-
+
+"""
+Parser generated by parser_gen. Do not edit.
+
+parse(text) returns the root Node of the parse tree. Node.json() and str()
+match those of the production rules the parser was generated from.
+"""
+
+
+START = %(start)r
+
+# Characters with their own table entries. Any other character is looked up
+# as OTHER.
+ALPHABET = frozenset(%(alphabet)s)
+OTHER = %(other)r
+
+# Name of every rule by id
+NAMES = %(names)s
+
+# How json is built for every rule by id
+KINDS = %(kinds)s
+
+# String matched by each single character terminal
+TERMINALS = %(terminals)s
+
+# String of every terminal, including those split into characters
+STRINGS = %(strings)s
+
+# Rules that collect their repeated elements into one flat node
+REPEATS = frozenset(%(repeats)r)
+
+# (rule id, lookahead) -> production, or a dict keyed by the next
+# characters when the rule needs more than one character of lookahead
+TABLE = %(table)s
+
+
+class ParseError(Exception):
+    def __init__(self, message, pos):
+        Exception.__init__(self, message)
+        self.pos = pos
+
+
+class Node(object):
+    __slots__ = ("rule", "children", "text")
+
+    def __init__(self, rule):
+        self.rule = rule
+        self.children = []
+        # Character matched by an OTHER terminal
+        self.text = None
+
+    def name(self):
+        return NAMES[self.rule]
+
+    def __str__(self):
+        if self.text is not None:
+            return self.text
+        elif self.rule in STRINGS:
+            return STRINGS[self.rule]
+        return "".join(map(str, self.children))
+
+    def json(self):
+        kind = KINDS[self.rule]
+        if self.text is not None:
+            return self.text
+        elif self.rule in STRINGS:
+            return STRINGS[self.rule]
+        elif kind == %(kind_string)r:
+            return "".join(child.json() for child in self.children)
+        elif kind == %(kind_list)r:
+            return [child.json() for child in self.children]
+        elif kind == %(kind_pass)r:
+            return self.children[0].json() if self.children else None
+        return {NAMES[self.rule]: [child.json() for child in self.children]}
+
+
+def _char_at(text, pos):
+    """Character at pos, reading whole UTF-8 sequences from byte strings."""
+    if pos >= len(text):
+        return ""
+    c = text[pos]
+    if isinstance(text, str) and c >= "\\xc0":
+        o = ord(c)
+        return text[pos:pos + (2 if o < 0xe0 else 3 if o < 0xf0 else 4)]
+    return c
+
+
+def _choose(choices, text, pos):
+    pos += len(_char_at(text, pos))
+    while isinstance(choices, dict):
+        c = _char_at(text, pos)
+        choices = choices.get(c if c in ALPHABET else OTHER)
+        pos += len(c)
+    return choices
+
+
+def parse(text, start=START):
+    pos = 0
+    root = Node(start)
+    stack = [root]
+
+    while stack:
+        node = stack.pop()
+        rule = node.rule
+        c = _char_at(text, pos)
+        lookahead = c if c in ALPHABET else OTHER
+
+        if rule in TERMINALS:
+            if TERMINALS[rule] != lookahead:
+                raise ParseError("Expected %%r at position %%d, found %%r." %% (TERMINALS[rule], pos, c), pos)
+            if lookahead is OTHER:
+                node.text = c
+            pos += len(c)
+            continue
+
+        rules = TABLE.get((rule, lookahead))
+        if type(rules) is dict:
+            rules = _choose(rules, text, pos)
+        if rules is None:
+            raise ParseError("Unable to handle token %%r for rule %%r at position %%d." %% (c, NAMES[rule], pos), pos)
+
+        if rule in REPEATS:
+            if rules:
+                child = Node(rules[0])
+                node.children.append(child)
+                stack.append(node)
+                stack.append(child)
+            continue
+
+        children = [Node(r) for r in rules]
+        node.children = children
+        stack.extend(reversed(children))
+
+    return root
+'''
+
+
+def check_conflicts(table):
+    """
+    Raise ProductionRuleError for the conflicts of a table with k = 1. The
+    table keeps the earlier or the consuming alternative of each, so a parser
+    generated from it would reject input the grammar accepts. Generated
+    parsers read UTF-8, so conflicts on the first byte of a character only
+    streams of bytes could see do not count.
+    """
+    conflicts = [conflict for conflict in table.conflicts() if len(conflict[1]) != 1 or utf8_width(conflict[1]) == 1]
+    if table.k() > 1 or not conflicts:
+        return
+    lines = ["Grammar starting at '{}' is not LL(1), {} conflicts:".format(table.start().__name__, len(conflicts))]
+    for rule_cls, lookahead, existing, alt in conflicts[:MAX_CONFLICTS]:
+        alts = table.productions(rule_cls)
+        lines.append("  '{}' on {!r}: alternative {} ({}) or {} ({})".format(
+            rule_cls.__name__, lookahead,
+            alts.index(existing) + 1, ", ".join(r.__name__ for r in existing),
+            alts.index(alt) + 1, ", ".join(r.__name__ for r in alt)))
+    if len(conflicts) > MAX_CONFLICTS:
+        lines.append("  and {} more".format(len(conflicts) - MAX_CONFLICTS))
+    raise ProductionRuleError("\n".join(lines))
+
+
+def generate_parser(starting_rule, k=K):
+    """
+    Source of a standalone module parsing from starting_rule. Raises
+    ProductionRuleError if the rules have conflicts k characters of
+    lookahead cannot resolve.
+    """
+    table = ParseTable(starting_rule, alphabet=DEFAULT_ALPHABET + (OTHER,), k=k)
+    check_conflicts(table)
+    ids, order = rule_ids(table)
+
+    entries = {}
+    for (rule_cls, lookahead), entry in table.entries().iteritems():
+        if rule_cls not in ids or is_terminal(rule_cls):
+            continue
+        if isinstance(entry, LookaheadChoice):
+            entry = entry.choices()
+        entries[(ids[rule_cls], lookahead)] = encode_entry(entry, ids)
+
+    return MODULE_TEMPLATE % {
+        "start": ids[table.start()],
+        "alphabet": repr(sorted(table.alphabet() - set([OTHER]))),
+        "other": OTHER,
+        "names": repr(tuple(r.__name__ for r in order)),
+        "kinds": repr(tuple(node_kind(r) for r in order)),
+        "terminals": sorted_repr(dict((ids[t], t.string) for t in table.terminals() if t in ids)),
+        "strings": sorted_repr(dict((i, r.string) for i, r in enumerate(order) if issubclass(r, TerminalRule))),
+        "repeats": tuple(i for i, r in enumerate(order) if getattr(r, "repeated", None) is not None),
+        "table": sorted_repr(entries),
+        "kind_string": KIND_STRING,
+        "kind_list": KIND_LIST,
+        "kind_pass": KIND_PASS,
+    }
@@ -0,0 +1,550 @@
+# -*- coding: utf-8 -*-
+
+from iterator_tools import BufferIterator
+from lexer import Lexeme
+from parse_table import DEFAULT_ALPHABET, MATCH, LookaheadChoice, ParseTable
+from production_rules import TerminalRule, terminal
+from utils import char_len, utf8_width
+
+import functools
+import timeit
+
+
+# Kinds of the events of parse_events
+ENTER = "enter"
+EXIT = "exit"
+TOKEN = "token"
+
+# States of the rules on the stack of parse_events: not matched yet, a
+# repetition matching its next element, and a rule to exit.
+_NEW = 0
+_CONTINUE = 1
+_CLOSE = 2
+
+
+# Characters of context on each side of a parse error, and expected
+# characters listed in its message.
+CONTEXT_SIZE = 40
+MAX_EXPECTED = 8
+
+
+class ParseError(RuntimeError):
+    """
+    Character a rule could not handle, at an offset, line and column, with
+    the characters the rule expected and the text of the line around it.
+    """
+
+    def __init__(self, token, rule_name, pos, line_no, col_no, expected=(), context="", context_col=0):
+        RuntimeError.__init__(self)
+        self.__token = token
+        self.__rule_name = rule_name
+        self.__pos = pos
+        self.__line_no = line_no
+        self.__col_no = col_no
+        self.__expected = tuple(sorted(expected))
+        self.__context = context
+        self.__context_col = context_col
+
+    @classmethod
+    def at(cls, stream, rule_name, token, expected=()):
+        """
+        Error at the next character of a stream. Only a window of the buffer
+        around it is read, never the rest of the stream.
+        """
+        line_no, col_no = stream.next_line_col()
+        char_iter = stream.char_iter()
+        if isinstance(char_iter, BufferIterator):
+            context, context_col = _context(char_iter.buffer(), stream.pos(), char_iter.utf8())
+        else:
+            context, context_col = token, 0
+        return cls(token, rule_name, stream.pos(), line_no, col_no, expected, context, context_col)
+
+    def __reduce__(self):
+        return (type(self), (self.__token, self.__rule_name, self.__pos, self.__line_no, self.__col_no,
+                             self.__expected, self.__context, self.__context_col))
+
+    def shifted(self, offset):
+        """
+        The same error at an offset moved by offset, for errors of a buffer
+        holding part of the input from that offset on.
+        """
+        return type(self)(self.__token, self.__rule_name, self.__pos + offset, self.__line_no, self.__col_no,
+                          self.__expected, self.__context, self.__context_col)
+
+    def token(self):
+        return self.__token
+
+    def rule_name(self):
+        return self.__rule_name
+
+    def pos(self):
+        return self.__pos
+
+    def line_no(self):
+        return self.__line_no
+
+    def col_no(self):
+        return self.__col_no
+
+    def expected(self):
+        """Sorted characters the rule could have handled, "" for the end of the input."""
+        return self.__expected
+
+    def context(self):
+        """Text of the line of the error, at most CONTEXT_SIZE characters on each side."""
+        return self.__context
+
+    def context_col(self):
+        """Character index of the error in its context."""
+        return self.__context_col
+
+    def __str__(self):
+        message = "Unable to handle token '{}' for rule '{}' at line {}, column {}.".format(
+            self.__token, self.__rule_name, self.__line_no, self.__col_no)
+        if self.__expected:
+            names = ["end of input" if c == "" else repr(c) for c in self.__expected[:MAX_EXPECTED]]
+            if len(self.__expected) > MAX_EXPECTED:
+                names.append("{} more".format(len(self.__expected) - MAX_EXPECTED))
+            message += " Expected {}.".format(names[0] if len(names) == 1 else ", ".join(names[:-1]) + " or " + names[-1])
+        if self.__context:
+            message += "\n    {}\n    {}^".format(self.__context, " " * self.__context_col)
+        return message
+
+
+def _context(buff, pos, utf8):
+    """Text of the line around offset pos of a buffer, and the index of pos in it."""
+    start = max(pos - CONTEXT_SIZE, 0)
+    end = min(pos + CONTEXT_SIZE, len(buff))
+    newline = buff.rfind("\n", start, pos)
+    if newline >= 0:
+        start = newline + 1
+    newline = buff.find("\n", pos, end)
+    if newline >= 0:
+        end = newline
+    if utf8:
+        # Cut the window at whole UTF-8 sequences
+        while start < pos and 0x80 <= ord(buff[start]) < 0xc0:
+            start += 1
+        last = end
+        while last > pos and 0x80 <= ord(buff[last - 1]) < 0xc0:
+            last -= 1
+        if last > pos and last - 1 + utf8_width(buff[last - 1]) > end:
+            end = last - 1
+        return buff[start:end], char_len(buff[start:pos])
+    return buff[start:end], pos - start
+
+
+def expected_lookaheads(table, rule_cls):
+    """Characters a rule of a ParseTable can start with or be followed by when empty."""
+    expected = set(table.first(rule_cls))
+    if table.nullable(rule_cls):
+        expected.update(table.follow(rule_cls))
+    return expected
+
+
+def _probed_lookaheads(rule, lookaheads):
+    """Characters get_rules of a rule node accepts in place of the first lookahead."""
+    return [c for c in DEFAULT_ALPHABET if rule.get_rules(c, *lookaheads[1:]) is not None]
+
+
+def peek_stream(stream, n):
+    if n == 1:
+        return [stream.peek()]
+    top = stream.peek_n(n)
+    return top + [""] * (n - len(top))
+
+
+def table_parse(stream, starting_rule, k=1, table=None, lexer=None, profile=None, recovery=None):
+    """
+    Parse a stream starting from a rule. get_rules only looks at one
+    character, so parsing with k > 1 or with a Lexer goes through an LL(k)
+    ParseTable. Steps are counted per rule in the RuleProfile profile if
+    given. With a Recovery, syntax errors are collected in it instead of
+    raised, and a partial tree is returned.
+    """
+    if table is None and (k > 1 or lexer is not None or recovery is not None):
+        table = ParseTable(starting_rule, k=k)
+    if table is not None:
+        if table.canonical(starting_rule) is not table.start():
+            raise ValueError("Table was compiled for '{}', not '{}'.".format(table.start().__name__, starting_rule.__name__))
+        if recovery is None and profile is None:
+            return compiled_parse(stream, table, lexer=lexer)
+        if lexer is not None and not isinstance(stream.char_iter(), BufferIterator):
+            raise ValueError("The lexer can only scan streams over a buffer.")
+        if recovery is not None:
+            return build_tree(_recovering_events(stream, table, lexer, recovery, profile))
+        return build_tree(_events(stream, table, lexer, [(table.start(), _NEW)], profile=profile))
+
+    clock = timeit.default_timer
+    stack = [starting_rule()]
+    head = stack[-1]
+
+    while stack:
+        if profile is not None:
+            start = clock()
+        top_rule = stack.pop()
+        lookaheads = peek_stream(stream, k)
+
+        if top_rule == lookaheads[0]:
+            stream.pop_char()
+            if profile is not None:
+                profile.add(type(top_rule), 0, 0, 1, clock() - start)
+        else:
+            rules = top_rule.get_rules(*lookaheads)
+            if rules is None:
+                raise ParseError.at(stream, type(top_rule).__name__, lookaheads[0], _probed_lookaheads(top_rule, lookaheads))
+            children = top_rule.expand(rules)
+            stack += list(reversed(children))
+            if profile is not None:
+                profile.add(type(top_rule), 1, len(children), 1, clock() - start)
+
+    if stack:
+        raise RuntimeError("Stack was not exhausted: {}".format([type(x).__name__ for x in stack]))
+
+    return head
+
+
+def compiled_parse(stream, table, lexer=None):
+    """
+    Parse a stream with a ParseTable, doing one table lookup per step. Rules
+    of the lexer are scanned as whole tokens when they match.
+    """
+    if lexer is not None and not isinstance(stream.char_iter(), BufferIterator):
+        raise ValueError("The lexer can only scan streams over a buffer.")
+    return _compiled_tree(stream, table, lexer, [], _TreeBuilder())
+
+
+def _compiled_tree(stream, table, lexer, stack, builder):
+    """
+    The loop of compiled_parse, building the nodes as it goes instead of
+    going through events. The stack and the _TreeBuilder can be kept across
+    parses with the table.
+    """
+    tokens = lexer.rules() if lexer is not None else ()
+    entries = table.entries()
+    peek = functools.partial(peek_stream, stream)
+    builder.reset()
+    open_node, close_node, add_character = builder.open, builder.close, builder.character
+    del stack[:]
+    stack.append((table.start(), _NEW))
+
+    while stack:
+        rule_cls, state = stack.pop()
+        if state is _CLOSE:
+            close_node(rule_cls)
+            continue
+
+        if state is _NEW and rule_cls in tokens:
+            text = lexer.match(rule_cls, stream)
+            if text is not None:
+                open_node(rule_cls)
+                if text:
+                    builder.add(Lexeme(text))
+                close_node(rule_cls)
+                continue
+
+        lookahead = stream.peek()
+        rules = _step(table, entries, stack, rule_cls, state, lookahead, peek)
+
+        if rules is MATCH:
+            stream.pop_char()
+            add_character(lookahead)
+        elif rules is None:
+            raise ParseError.at(stream, rule_cls.__name__, lookahead, expected_lookaheads(table, rule_cls))
+        elif state is _NEW:
+            open_node(rule_cls)
+
+    return builder.root()
+
+
+class _TreeBuilder(object):
+    """
+    Nodes of the tree of a parse, added as its rules open and close by the
+    loops building trees. Terminal classes by character and whether rules
+    are repetitions are kept across trees.
+    """
+
+    def __init__(self):
+        self.__terminals = {}
+        self.__repetitions = {}
+        self.reset()
+
+    def reset(self):
+        # Productions of the open nodes, the root being the only production
+        # of the first one.
+        self.__productions = [[]]
+        self.__current = self.__productions[0]
+        self.__nodes = []
+
+    def root(self):
+        return self.__productions[0][0]
+
+    def open(self, rule_cls):
+        """Add a node of rule_cls, whose productions are added next."""
+        if rule_cls not in self.__repetitions:
+            self.__repetitions[rule_cls] = getattr(rule_cls, "repeated", None) is not None
+        node = rule_cls()
+        self.__current.append(node)
+        self.__nodes.append(node)
+        self.__current = []
+        self.__productions.append(self.__current)
+
+    def close(self, rule_cls):
+        """Apply the productions added since the node of rule_cls was opened."""
+        productions = self.__productions
+        current = productions.pop()
+        self.__nodes.pop().apply_rules(current if self.__repetitions[rule_cls] else tuple(current))
+        self.__current = productions[-1]
+
+    def character(self, c):
+        """Add the node of a terminal matching the character c."""
+        terminal_cls = self.__terminals.get(c)
+        if terminal_cls is None:
+            terminal_cls = self.__terminals[c] = terminal(c)
+        self.__current.append(terminal_cls())
+
+    def add(self, node):
+        self.__current.append(node)
+
+
+def _step(table, entries, stack, rule_cls, state, lookahead, peek):
+    """
+    One step of the loops parsing with a table, for a rule popped off their
+    stack that is not one to close. lookahead is the next character of the
+    input, and peek(n) its next n characters, padded with "". Returns the
+    entry of the table for the rule: MATCH for a terminal matching
+    lookahead, or the rules of the production it picks, after pushing what
+    is left to match of the rule. Returns None without touching the stack
+    if the table has no entry for the rule.
+    """
+    rules = entries.get((rule_cls, lookahead))
+    if rules is None:
+        rules = table.lookup(rule_cls, lookahead)
+
+    if type(rules) is LookaheadChoice:
+        rules = rules.choose(peek(rules.k()))
+
+    if rules is MATCH or rules is None:
+        return rules
+
+    if state is _NEW:
+        stack.append((rule_cls, _CLOSE))
+    if getattr(rule_cls, "repeated", None) is not None:
+        # Match the repetition again after each element
+        if rules:
+            stack.append((rule_cls, _CONTINUE))
+            stack.append((rules[0], _NEW))
+    else:
+        stack.extend([(r, _NEW) for r in reversed(rules)])
+    return rules
+
+
+def parse_events(stream, starting_rule, k=1, table=None, lexer=None):
+    """
+    Parse a stream like table_parse, but yield the parse as events instead
+    of building a tree:
+
+    (ENTER, rule class, pos) when a rule starts matching at offset pos,
+    (EXIT, rule class, pos) when it ends at offset pos, and
+    (TOKEN, text, pos) for the text of a character or lexer token.
+
+    Tokens of the lexer come between the ENTER and EXIT events of a Lexeme.
+    Nothing but the stack of the parser is kept, so memory does not grow
+    with the input.
+    """
+    if lexer is not None and not isinstance(stream.char_iter(), BufferIterator):
+        raise ValueError("The lexer can only scan streams over a buffer.")
+    if table is None:
+        table = ParseTable(starting_rule, k=k)
+    elif table.canonical(starting_rule) is not table.start():
+        raise ValueError("Table was compiled for '{}', not '{}'.".format(table.start().__name__, starting_rule.__name__))
+    return _events(stream, table, lexer, [(table.start(), _NEW)])
+
+
+def _events(stream, table, lexer, stack, on_error=None, profile=None):
+    """
+    The loop of parse_events over a checked table, from the entries of
+    stack. When a rule has no entry for the next character, the events of
+    on_error(stack, rule class, state, character) are yielded instead of
+    raising a ParseError. Steps are counted in the RuleProfile profile if
+    given.
+    """
+    tokens = lexer.rules() if lexer is not None else ()
+    entries = table.entries()
+    if profile is None:
+        peek = functools.partial(peek_stream, stream)
+    else:
+        clock = timeit.default_timer
+        peeks = [0]
+
+        def peek(n):
+            peeks[0] += 1
+            return peek_stream(stream, n)
+
+    while stack:
+        if profile is not None:
+            start = clock()
+            peeks[0] = 1
+        rule_cls, state = stack.pop()
+        if state is _CLOSE:
+            yield EXIT, rule_cls, stream.pos()
+            continue
+
+        if state is _NEW and rule_cls in tokens:
+            pos = stream.pos()
+            text = lexer.match(rule_cls, stream)
+            if text is not None:
+                if profile is not None:
+                    profile.add(rule_cls, 1, 0, 0, clock() - start)
+                yield ENTER, rule_cls, pos
+                if text:
+                    yield ENTER, Lexeme, pos
+                    yield TOKEN, text, pos
+                    yield EXIT, Lexeme, stream.pos()
+                yield EXIT, rule_cls, stream.pos()
+                continue
+
+        lookahead = stream.peek()
+        rules = _step(table, entries, stack, rule_cls, state, lookahead, peek)
+
+        if profile is not None and rules is not None:
+            if rules is MATCH:
+                pushes = 0
+            elif getattr(rule_cls, "repeated", None) is not None:
+                pushes = len(rules[:1])
+            else:
+                pushes = len(rules)
+            profile.add(rule_cls, 1, pushes, peeks[0], clock() - start)
+
+        if rules is MATCH:
+            pos = stream.pos()
+            stream.pop_char()
+            yield TOKEN, lookahead, pos
+        elif rules is None:
+            if on_error is None:
+                raise ParseError.at(stream, rule_cls.__name__, lookahead, expected_lookaheads(table, rule_cls))
+            for event in on_error(stack, rule_cls, state, lookahead):
+                yield event
+        elif state is _NEW:
+            yield ENTER, rule_cls, stream.pos()
+
+
+def build_tree(events):
+    """Build the tree of rule nodes described by the events of parse_events."""
+    builder = _TreeBuilder()
+    # Tokens of a Lexeme are the text of a whole lexer token.
+    in_lexeme = False
+
+    for kind, value, pos in events:
+        if kind is TOKEN:
+            if in_lexeme:
+                builder.add(Lexeme(value))
+            else:
+                builder.character(value)
+        elif value is Lexeme:
+            in_lexeme = kind is ENTER
+        elif kind is ENTER:
+            builder.open(value)
+        else:
+            builder.close(value)
+
+    return builder.root()
+
+
+def _recovering_events(stream, table, lexer, recovery, profile=None):
+    """
+    Events of the parse of a stream with a checked table, recovering from
+    syntax errors with a Recovery.
+    """
+    sync_rules = frozenset(table.canonical(r) for r in recovery.rules())
+    # Offset parsing resumed at after the last error. Errors there, before
+    # any more input is matched, are caused by the recovery.
+    resumed = [None]
+
+    def on_error(stack, rule_cls, state, lookahead):
+        if stream.pos() != resumed[0]:
+            recovery.add(ParseError.at(stream, rule_cls.__name__, lookahead, expected_lookaheads(table, rule_cls)))
+        events = list(_resync(stream, table, stack, (rule_cls, state), sync_rules, recovery.chars()))
+        resumed[0] = stream.pos()
+        return events
+
+    # The starting rule is open from the start, so skipped characters always
+    # have a rule to go to.
+    yield ENTER, table.start(), stream.pos()
+    stack = [(table.start(), _CLOSE), (table.start(), _CONTINUE)]
+    for event in _events(stream, table, lexer, stack, on_error, profile):
+        yield event
+
+
+def _starts_with(rule_cls, chars):
+    """True for the terminal rules starting with one of chars."""
+    return issubclass(rule_cls, TerminalRule) and rule_cls.chars[:1] != () and rule_cls.chars[0] in chars
+
+
+def _resync(stream, table, stack, failed, sync_rules, sync_chars):
+    """
+    Events skipping the input after a syntax error up to a synchronizing
+    character, and closing the rules on the stack that are given up on.
+    The stack is left to resume parsing from. Outside of synchronizing
+    rules, the input is skipped up to a character the failed rule accepts.
+    """
+    pos = stream.pos()
+    skipped = []
+
+    def skip():
+        skipped.append((TOKEN, stream.peek(), stream.pos()))
+        stream.pop_char()
+
+    # Innermost open synchronizing rule
+    base = None
+    for i in xrange(len(stack) - 1, -1, -1):
+        if stack[i][1] is _CLOSE and stack[i][0] in sync_rules:
+            base = i
+            break
+
+    if base is None:
+        # Try again at the next character the failed rule accepts
+        if stream.peek():
+            skip()
+        while stream.peek() and table.lookup(failed[0], stream.peek()) is None:
+            skip()
+        if stream.peek():
+            stack.append(failed)
+        keep = inner = len(stack)
+    else:
+        while stream.peek() and stream.peek() not in sync_chars:
+            skip()
+        # Entry of the production of the synchronizing rule expecting the
+        # synchronizing character
+        resume = None
+        for i in xrange(base + 1, len(stack)):
+            if stack[i][1] is _CLOSE:
+                break
+            if stream.peek() and _starts_with(stack[i][0], stream.peek()):
+                resume = i
+        inner = keep = base + 1
+        if resume is not None:
+            inner = keep = resume + 1
+        elif stream.peek():
+            skip()
+
+    if not stream.peek():
+        # Nothing left to resume with, close every rule
+        keep = 0
+
+    # Rules inside the synchronizing one end where the error is, and the
+    # skipped characters are added to the innermost rule left open.
+    for event in _close(stack, inner, pos):
+        yield event
+    for event in skipped:
+        yield event
+    for event in _close(stack, keep, stream.pos()):
+        yield event
+
+
+def _close(stack, keep, pos):
+    """Exit events of the open rules on the stack above its first keep entries."""
+    while len(stack) > keep:
+        rule_cls, state = stack.pop()
+        if state is _CLOSE:
+            yield EXIT, rule_cls, pos
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+"""
+Earley parsing over the production rules, for any context free grammar.
+
+The parser accepts left recursive and ambiguous grammars, like the rhs rule
+of ebnf_grammar.txt, and returns every derivation of the input at once as a
+shared packed parse forest (SPPF), built while recognising as described by
+Scott in "SPPF-Style Parsing From Earley Recognisers". Every (symbol, start,
+end) triple is one ForestNode, whose families are the different ways of
+deriving it, so the forest takes O(n^3) space and time at most instead of
+enumerating an exponential number of trees.
+
+Rules built by the combinators are expanded through their alternatives().
+Repetitions are expanded as the left recursive rule R = R , X | (empty),
+which Earley parsing handles in linear time, so LL(1) shaped grammars parse
+in O(n). Hand written rules pick their production with get_rules() on the
+character at the current position.
+"""
+
+from iterator_tools import BufferIterator
+from production_rules import TerminalRule
+
+
+def is_character(rule_cls):
+    """Single character terminals are matched against the input."""
+    return issubclass(rule_cls, TerminalRule) and len(rule_cls.chars) == 1
+
+
+class ForestNode(object):
+    """
+    Node of a shared packed parse forest spanning the offsets start to end.
+
+    Symbol nodes are labelled with the rule class they match and character
+    nodes with their terminal class. Intermediate nodes are labelled with a
+    (rule class, alternative, dot) tuple and hold the part of an alternative
+    in front of the dot. Each family is a tuple of children making up one
+    derivation of the node.
+    """
+    def __init__(self, label, start, end):
+        self.__label = label
+        self.__start = start
+        self.__end = end
+        self.__families = []
+        self.__family_set = set()
+
+    def label(self):
+        return self.__label
+
+    def start(self):
+        return self.__start
+
+    def end(self):
+        return self.__end
+
+    def families(self):
+        return self.__families
+
+    def add_family(self, children):
+        if children not in self.__family_set:
+            self.__family_set.add(children)
+            self.__families.append(children)
+
+    def is_intermediate(self):
+        return isinstance(self.__label, tuple)
+
+    def children(self, family):
+        """Symbol and character nodes of a family, expanding intermediate nodes."""
+        children = []
+        pending = list(reversed(family))
+        while pending:
+            node = pending.pop()
+            if node.is_intermediate():
+                pending.extend(reversed(node.families()[0]))
+            else:
+                children.append(node)
+        return children
+
+    def nodes(self):
+        """Every node reachable from this one."""
+        seen = set([self])
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            for family in node.families():
+                for child in family:
+                    if child not in seen:
+                        seen.add(child)
+                        pending.append(child)
+        return seen
+
+    def is_ambiguous(self):
+        return any(len(node.families()) > 1 for node in self.nodes())
+
+    def tree(self):
+        """
+        The derivation of the forest a greedy LL parser would build, as
+        production rule nodes which json() like those of the other parsers.
+        Every node takes the family whose children end furthest, from the
+        leftmost one on, so that repetitions and optional parts match as
+        much as they can. A node is never picked again below itself, which
+        keeps the derivation finite for cyclic grammars.
+        """
+        derivation = _Derivation()
+        root = self.__label()
+        pending = [(root, self)]
+        while pending:
+            rule, node = pending.pop()
+            if not node.families():
+                continue
+
+            children = derivation.children(node)
+            if getattr(node.label(), "repeated", None) is not None:
+                rules = [child.label()() for child in children]
+            else:
+                rules = tuple(child.label()() for child in children)
+
+            rule.apply_rules(rules)
+            pending.extend(zip(rules, children))
+        return root
+
+    def __repr__(self):
+        label = self.__label
+        name = label.__name__ if not isinstance(label, tuple) else "{}.{}".format(label[0].__name__, label[2])
+        return "<{} {} {}:{}>".format(type(self).__name__, name, self.__start, self.__end)
+
+
+class _Derivation(object):
+    """
+    Children ForestNode.tree() picks for the nodes of a forest. Picking
+    them for a node can depend on the children of the nodes spanning the
+    same input below it, which are None while they are being picked.
+    """
+    def __init__(self):
+        self.__children = {}
+        self.__prefixes = {}
+
+    def children(self, node):
+        if node not in self.__children:
+            self.__children[node] = None
+            if getattr(node.label(), "repeated", None) is not None:
+                children = self.__repetition(node)
+            else:
+                children = self.__furthest(node, (node.start(), node.end()))
+            self.__children[node] = children
+        return self.__children[node]
+
+    def __derivable(self, child, span):
+        """Whether child can be derived in a node spanning span."""
+        return ((child.start(), child.end()) != span or not child.families() or
+                self.children(child) is not None)
+
+    def __furthest(self, node, span):
+        """Children of the family of node ending furthest from the left."""
+        best = best_ends = None
+        for family in node.families():
+            children = self.__expand(family, span)
+            if children is None:
+                continue
+            ends = [child.end() for child in children]
+            if best is None or ends > best_ends:
+                best, best_ends = children, ends
+        return best
+
+    def __expand(self, family, span):
+        children = []
+        for child in family:
+            if child.is_intermediate():
+                # Intermediate nodes belong to the alternatives of a single
+                # rule, so those spanning span only make up the node.
+                if child not in self.__prefixes:
+                    self.__prefixes[child] = self.__furthest(child, span)
+                prefix = self.__prefixes[child]
+                if prefix is None:
+                    return None
+                children.extend(prefix)
+            elif self.__derivable(child, span):
+                children.append(child)
+            else:
+                return None
+        return children
+
+    def __repetition(self, node):
+        """
+        Elements of the left recursive R = R , X expansion, each taking the
+        longest element that starts where the previous one ends and still
+        leads to the end of node.
+        """
+        span = start, end = node.start(), node.end()
+        elements = {}
+        seen = set([node])
+        pending = [node]
+        while pending:
+            for family in pending.pop().families():
+                if family:
+                    prefix, element = family
+                    elements.setdefault(prefix.end(), []).append(element)
+                    if prefix not in seen:
+                        seen.add(prefix)
+                        pending.append(prefix)
+
+        children = []
+        pos = start
+        while pos != end:
+            element = max(
+                (element for element in elements[pos] if element.end() > pos and self.__derivable(element, span)),
+                key=lambda element: element.end()
+            )
+            children.append(element)
+            pos = element.end()
+        return children
+
+
+class EarleyParser(object):
+    def __init__(self, char_iter):
+        assert isinstance(char_iter, BufferIterator), "The Earley parser needs a position indexed BufferIterator."
+        self.__iter = char_iter
+        self.__offsets = list(char_iter.offsets())
+        self.__chars = [char_iter.item_at(offset) for offset in self.__offsets]
+        self.__alternatives = {}
+        self.__nodes = {}
+        self.__furthest = 0
+
+    def furthest(self):
+        """Offset of the furthest character any alternative matched up to."""
+        return self.__offsets[self.__furthest]
+
+    def alternatives(self, rule_cls, i):
+        """Alternatives of a rule that can match at the ith character."""
+        alts = self.__alternatives.get(rule_cls)
+        if alts is not None:
+            return alts
+
+        if getattr(rule_cls, "repeated", None) is not None:
+            alts = [(rule_cls, rule_cls.repeated), ()]
+        else:
+            alts = rule_cls.alternatives()
+        if alts is not None:
+            alts = self.__alternatives[rule_cls] = [tuple(alt) for alt in alts]
+            return alts
+
+        rules = rule_cls.get_rules(self.__chars[i])
+        return [] if rules is None else [tuple(rules)]
+
+    def __node(self, label, start, end):
+        key = (label, start, end)
+        node = self.__nodes.get(key)
+        if node is None:
+            node = self.__nodes[key] = ForestNode(label, self.__offsets[start], self.__offsets[end])
+        return node
+
+    def __make_node(self, rule_cls, alt, dot, start, end, w, v):
+        """
+        Node for an item whose dot just moved over the symbol matched by v,
+        after the part of the alternative matched by w.
+        """
+        if dot == len(alt):
+            label = rule_cls
+        elif dot == 1:
+            return v
+        else:
+            label = (rule_cls, alt, dot)
+        node = self.__node(label, start, end)
+        node.add_family((v,) if w is None else (w, v))
+        return node
+
+    def parse(self, rule_cls):
+        """Root node of the forest if rule_cls matches the whole input, otherwise None."""
+        chars = self.__chars
+        n = len(chars) - 1
+        # Items (rule, alternative, dot, start, node) at every position, the
+        # items waiting on each rule there, and those scanning its character
+        items = [set() for i in xrange(n + 1)]
+        waiting = [{} for i in xrange(n + 1)]
+        scans = [[] for i in xrange(n + 1)]
+
+        def add(item, i, pending):
+            if item in items[i]:
+                return
+            rule, alt, dot = item[:3]
+            if dot < len(alt) and is_character(alt[dot]):
+                if alt[dot].string == chars[i]:
+                    items[i].add(item)
+                    scans[i].append(item)
+                    return
+                # Characters of several bytes can still match their bytes
+                if len(alt[dot].string) == 1:
+                    return
+            items[i].add(item)
+            pending.append(item)
+            if dot < len(alt):
+                waiting[i].setdefault(alt[dot], []).append(item)
+
+        pending = []
+        for alt in self.alternatives(rule_cls, 0):
+            add((rule_cls, alt, 0, 0, None), 0, pending)
+
+        for i in xrange(n + 1):
+            if not items[i]:
+                break
+            self.__furthest = i
+
+            # Rules matching the empty string at i
+            completed = {}
+            predicted = set()
+            while pending:
+                rule, alt, dot, start, w = pending.pop()
+                if dot < len(alt):
+                    symbol = alt[dot]
+                    if symbol not in predicted:
+                        predicted.add(symbol)
+                        for symbol_alt in self.alternatives(symbol, i):
+                            add((symbol, symbol_alt, 0, i, None), i, pending)
+                    if symbol in completed:
+                        node = self.__make_node(rule, alt, dot + 1, start, i, w, completed[symbol])
+                        add((rule, alt, dot + 1, start, node), i, pending)
+                    continue
+
+                if w is None:
+                    w = self.__node(rule, i, i)
+                    w.add_family(())
+                if start == i:
+                    completed[rule] = w
+                for parent, parent_alt, parent_dot, parent_start, z in list(waiting[start].get(rule, ())):
+                    node = self.__make_node(parent, parent_alt, parent_dot + 1, parent_start, i, z, w)
+                    add((parent, parent_alt, parent_dot + 1, parent_start, node), i, pending)
+
+            for rule, alt, dot, start, w in scans[i]:
+                v = self.__node(alt[dot], i, i + 1)
+                node = self.__make_node(rule, alt, dot + 1, start, i + 1, w, v)
+                add((rule, alt, dot + 1, start, node), i + 1, pending)
+            # Completions only look back at the waiting items
+            items[i] = scans[i] = None
+
+        return self.__nodes.get((rule_cls, 0, n))
+
+
+def earley_parse(stream, starting_rule):
+    """
+    Parse the whole stream from the starting rule and return the root
+    ForestNode of every derivation, leaving the stream at its end.
+    """
+    char_iter = stream.char_iter()
+    if not isinstance(char_iter, BufferIterator):
+        buff = "".join(char_iter)
+        char_iter = BufferIterator(buff)
+
+    parser = EarleyParser(char_iter)
+    forest = parser.parse(starting_rule)
+    if forest is None:
+        pos = parser.furthest()
+        raise RuntimeError("Unable to handle token '{}' for rule '{}' at position {}.".format(char_iter.item_at(pos), starting_rule.__name__, pos))
+
+    if stream.char_iter() is char_iter:
+        stream.advance_to(char_iter.limit())
+    return forest
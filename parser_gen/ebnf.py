@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""
+Turn a grammar parsed with the Grammar meta rules into production rules.
+
+Every rule of the grammar becomes a NamedRule subclass named after it, whose
+body is built from the combinators. Rules can be referenced before they are
+defined. A few rule names refer to builtin rules unless the grammar defines
+them itself.
+"""
+
+from production_rules import (
+    AnyCharacter, Digit, Grammar, Grouping, Identifier, Letter, Optional, ProductionRule, ProductionRuleError,
+    Repetition, Symbol, Terminal, Whitespace, alternation, concatenation, exclusion, optional, repetition, terminal
+)
+from driver import table_parse
+from stream_handler import StreamHandler
+
+
+BUILTIN_RULES = {
+    "letter": Letter,
+    "digit": Digit,
+    "symbol": Symbol,
+    "whitespace": Whitespace,
+    "any_character": AnyCharacter,
+}
+
+ESCAPES = {
+    "n": "\n",
+    "t": "\t",
+    "r": "\r",
+}
+
+
+class NamedRule(ProductionRule):
+    """Rule defined in a grammar. Expands to the body built for it."""
+    body = None
+
+    @classmethod
+    def get_rules(cls, *lookaheads):
+        if cls.body.get_rules(*lookaheads) is None:
+            return None
+        return [cls.body]
+
+    @classmethod
+    def alternatives(cls):
+        return [(cls.body,)]
+
+
+def unescape(s):
+    chars = []
+    escaped = False
+    for c in s:
+        if escaped:
+            chars.append(ESCAPES.get(c, c))
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        else:
+            chars.append(c)
+    return "".join(chars)
+
+
+class RuleBuilder(object):
+    def __init__(self, names):
+        self.__names = names
+
+    def __lookup(self, name):
+        if name in self.__names:
+            return self.__names[name]
+        if name in BUILTIN_RULES:
+            return BUILTIN_RULES[name]
+        raise ProductionRuleError("Rule '{}' is not defined.".format(name))
+
+    def __tails(self, repeated, index):
+        """Nodes at index in each element of a repetition like MaybeAlternation."""
+        return [node.productions()[index] for node in repeated.productions()]
+
+    def alternation(self, node):
+        prods = node.productions()
+        branches = [prods[0]] + self.__tails(prods[2], 2)
+        branches = [self.concatenation(b) for b in branches]
+        return branches[0] if len(branches) == 1 else alternation(*branches)
+
+    def concatenation(self, node):
+        prods = node.productions()
+        parts = [prods[0]] + self.__tails(prods[2], 2)
+        parts = [self.exclusion(p) for p in parts]
+        return parts[0] if len(parts) == 1 else concatenation(*parts)
+
+    def exclusion(self, node):
+        prods = node.productions()
+        base = self.single_production(prods[0])
+        excluded = [self.single_production(p) for p in self.__tails(prods[2], 2)]
+        return exclusion(base, *excluded) if excluded else base
+
+    def single_production(self, node):
+        node = node.productions()[0]
+        if isinstance(node, Identifier):
+            return self.__lookup(str(node))
+        elif isinstance(node, Terminal):
+            return terminal(unescape(str(node)[1:-1]))
+        elif isinstance(node, Optional):
+            return optional(self.alternation(node.productions()[2]))
+        elif isinstance(node, Repetition):
+            return repetition(self.alternation(node.productions()[2]))
+        elif isinstance(node, Grouping):
+            return self.alternation(node.productions()[2])
+        raise ProductionRuleError("Unexpected production '{}'.".format(type(node).__name__))
+
+
+def grammar_rules(grammar):
+    """
+    Build the rules of a Grammar parse tree. Returns the list of rule classes
+    in the order they are defined.
+    """
+    names = {}
+    rules = []
+    for rule in grammar.productions():
+        name = str(rule.productions()[0])
+        if name in names:
+            raise ProductionRuleError("Rule '{}' is defined twice.".format(name))
+        names[name] = type(name, (NamedRule,), {})
+        rules.append(names[name])
+
+    builder = RuleBuilder(names)
+    for rule_cls, rule in zip(rules, grammar.productions()):
+        rule_cls.body = builder.alternation(rule.productions()[4])
+    return rules
+
+
+def find_rule(rules, name=None):
+    """Rule of a grammar called name, or its first rule if name is None."""
+    if name is None:
+        return rules[0]
+    for rule_cls in rules:
+        if rule_cls.__name__ == name:
+            return rule_cls
+    raise ProductionRuleError("Grammar has no rule '{}'.".format(name))
+
+
+def load_grammar(filename):
+    """Parse an EBNF grammar file into its rule classes."""
+    with StreamHandler.from_filename(filename) as stream:
+        return grammar_rules(table_parse(stream, Grammar))
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compile grammar files once and load them from an on-disk cache afterwards.
+
+Compiling a grammar parses the EBNF file, builds its rule classes and
+their ParseTable, and generates the standalone parser module of codegen,
+which holds the table, the character classes of the alphabet and the
+metadata of every rule as plain literals. The compiled grammar file keeps
+the source of that module and its marshalled code object. Loading it only
+unmarshals the code and runs it, without building any rule class.
+
+Cache files are named after a hash of the grammar text, the start rule, k
+and the format version, so an edited grammar compiles into a new file.
+Files written by another format version or another python version are
+compiled again.
+"""
+
+from codegen import generate_parser
+from ebnf import find_rule, grammar_rules
+from driver import table_parse
+from production_rules import Grammar, K
+from stream_handler import StreamHandler
+
+import hashlib
+import imp
+import marshal
+import os
+import tempfile
+
+
+# Bumped whenever the layout of compiled grammar files or of the generated
+# parser changes.
+FORMAT_VERSION = 1
+
+MAGIC = "parser_gen compiled grammar"
+
+SUFFIX = ".pgc"
+
+DEFAULT_CACHE_DIR = os.environ.get("PARSER_GEN_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "parser_gen"))
+
+
+def grammar_key(text, start=None, k=K):
+    """Hash of everything a compiled grammar depends on."""
+    digest = hashlib.sha1()
+    digest.update(repr((FORMAT_VERSION, start, k)))
+    digest.update(text)
+    return digest.hexdigest()
+
+
+class CompiledGrammar(object):
+    """Standalone parser of a grammar, as source and code object."""
+
+    def __init__(self, source, code=None):
+        self.__source = source
+        self.__code = code if code is not None else compile(source, "<compiled grammar>", "exec")
+        self.__namespace = None
+
+    @classmethod
+    def from_text(cls, text, start=None, k=K):
+        rules = grammar_rules(table_parse(StreamHandler.from_str(text, utf8=True), Grammar))
+        return cls(generate_parser(find_rule(rules, start), k=k))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Compiled grammar saved to filename, or None if it was written by
+        another format or python version.
+        """
+        with open(filename, "rb") as f:
+            try:
+                header = marshal.load(f)
+                if header != (MAGIC, FORMAT_VERSION, imp.get_magic()):
+                    return None
+                source, code = marshal.load(f)
+            except (EOFError, ValueError, TypeError):
+                return None
+        return cls(source, code)
+
+    def save(self, filename):
+        """Write to filename atomically, so readers never see part of it."""
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, tmp = tempfile.mkstemp(suffix=SUFFIX, dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump((MAGIC, FORMAT_VERSION, imp.get_magic()), f)
+                marshal.dump((self.__source, self.__code), f)
+            os.rename(tmp, filename)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def source(self):
+        return self.__source
+
+    def namespace(self):
+        """
+        Globals of the parser module, run from the code object the first
+        time. They are kept in a plain dict rather than a module, whose
+        globals python 2 clears once the module is garbage collected while
+        the parse trees still need them.
+        """
+        if self.__namespace is None:
+            namespace = {"__name__": "compiled_grammar"}
+            exec self.__code in namespace
+            self.__namespace = namespace
+        return self.__namespace
+
+    def parse_error(self):
+        """Exception class parse() raises."""
+        return self.namespace()["ParseError"]
+
+    def parse(self, text):
+        return self.namespace()["parse"](text)
+
+
+def compile_grammar(filename, start=None, k=K, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    CompiledGrammar of a grammar file, parsing from the rule named start or
+    the first one. It is read from cache_dir if the same grammar was compiled
+    there before, and saved there otherwise. Nothing is cached if cache_dir
+    is None.
+    """
+    with open(filename, "rb") as f:
+        text = f.read()
+    if cache_dir is None:
+        return CompiledGrammar.from_text(text, start=start, k=k)
+
+    path = os.path.join(cache_dir, grammar_key(text, start=start, k=k) + SUFFIX)
+    if os.path.exists(path):
+        compiled = CompiledGrammar.load(path)
+        if compiled is not None:
+            return compiled
+
+    compiled = CompiledGrammar.from_text(text, start=start, k=k)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    compiled.save(path)
+    return compiled
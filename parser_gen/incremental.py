@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keep the Grammar parse tree of a text up to date across edits.
+
+Every Rule of a grammar ends at its ";" and the whitespace after it, so the
+Rule subtrees of a Grammar cover the text back to back. The text is kept as
+one piece per Rule, in a treap ordered by position whose nodes sum up the
+length, Rules and newlines below them. No offset is stored, so the Rules
+after an edit are reused without shifting anything.
+
+An edit finds the Rule before it and its line and column in O(log n) of the
+number of Rules, and reparses the Rules from that one up to the first old
+Rule boundary past the edit, reading only their pieces. Apart from moving
+the references of the Grammar's list of Rules, an edit costs the size of the
+Rules it reparses. text() and rule_offsets() walk every Rule.
+"""
+
+from iterator_tools import BufferIterator
+from driver import CONTEXT_SIZE, ParseError, table_parse
+from parse_table import ParseTable
+from production_rules import Grammar, Rule
+from stream_handler import StreamHandler
+from utils import char_len
+
+import random
+
+
+class _Piece(object):
+    """
+    Treap node holding the text of one Rule. Besides its own, it sums up
+    the length, Rules and newlines of its subtree, and the characters after
+    the last of those newlines.
+    """
+    __slots__ = ("rule", "text", "priority", "left", "right", "own_newlines", "own_tail",
+                 "length", "count", "newlines", "tail")
+
+    def __init__(self, rule, text, utf8):
+        self.rule = rule
+        self.text = text
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.own_newlines = text.count("\n")
+        self.own_tail = (char_len if utf8 else len)(text[text.rfind("\n") + 1:])
+        self.update()
+
+    def update(self):
+        length, count, newlines, tail = len(self.text), 1, self.own_newlines, self.own_tail
+        left = self.left
+        if left is not None:
+            length += left.length
+            count += left.count
+            if not newlines:
+                tail += left.tail
+            newlines += left.newlines
+        right = self.right
+        if right is not None:
+            length += right.length
+            count += right.count
+            tail = right.tail if right.newlines else tail + right.tail
+            newlines += right.newlines
+        self.length, self.count, self.newlines, self.tail = length, count, newlines, tail
+
+
+def _merge(left, right):
+    """Treap of the pieces of left followed by those of right."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def _split(node, count):
+    """Treaps of the first count pieces of node and of the rest."""
+    if node is None:
+        return None, None
+    left_count = node.left.count if node.left is not None else 0
+    if count <= left_count:
+        left, node.left = _split(node.left, count)
+        node.update()
+        return left, node
+    node.right, right = _split(node.right, count - left_count - 1)
+    node.update()
+    return node, right
+
+
+def _build(pieces):
+    """Treap of new pieces in order, built in linear time."""
+    spine = []
+    for piece in pieces:
+        last = None
+        while spine and spine[-1].priority < piece.priority:
+            last = spine.pop()
+            last.update()
+        piece.left = last
+        if spine:
+            spine[-1].right = piece
+        spine.append(piece)
+    for piece in reversed(spine):
+        piece.update()
+    return spine[0] if spine else None
+
+
+def _pieces(node):
+    """Pieces of a treap in order."""
+    stack = []
+    while stack or node is not None:
+        if node is not None:
+            stack.append(node)
+            node = node.left
+        else:
+            node = stack.pop()
+            yield node
+            node = node.right
+
+
+def _locate(node, offset):
+    """
+    Index and start offset of the piece holding offset, the newlines before
+    it, and the characters between the last of them and the piece. The end
+    of the text is past the last piece.
+    """
+    rank = start = newlines = tail = 0
+    while node is not None:
+        left = node.left
+        if left is not None:
+            if offset < start + left.length:
+                node = left
+                continue
+            start += left.length
+            rank += left.count
+            tail = left.tail if left.newlines else tail + left.tail
+            newlines += left.newlines
+        if offset < start + len(node.text):
+            break
+        start += len(node.text)
+        rank += 1
+        tail = node.own_tail if node.own_newlines else tail + node.own_tail
+        newlines += node.own_newlines
+        node = node.right
+    return rank, start, newlines, tail
+
+
+class IncrementalParse(object):
+    """Grammar parse tree of a text, updated in place by edit()."""
+
+    def __init__(self, text, lexer=None, utf8=False):
+        self.__lexer = lexer
+        self.__utf8 = utf8 and isinstance(text, str)
+        self.__table = ParseTable(Rule) if lexer is not None else None
+        rules, offsets = self.__parse_rules(text, 0, 1, 1, lambda pos: False)
+        self.__root = _build(self.__new_pieces(text, rules, offsets))
+        self.__grammar = Grammar(rules)
+
+    @classmethod
+    def from_filename(cls, filename, lexer=None):
+        with open(filename, "rb") as f:
+            return cls(f.read(), lexer=lexer, utf8=True)
+
+    def text(self):
+        return "".join(piece.text for piece in _pieces(self.__root))
+
+    def grammar(self):
+        return self.__grammar
+
+    def rule_offsets(self):
+        """Offset in the text at which each Rule of the Grammar starts."""
+        offsets = []
+        pos = 0
+        for piece in _pieces(self.__root):
+            offsets.append(pos)
+            pos += len(piece.text)
+        return offsets
+
+    def edit(self, start, end, replacement):
+        """
+        Replace text[start:end] with replacement and reparse the Rules the
+        edit touches. Returns the updated Grammar. If the new text does not
+        parse, the error is raised and nothing is changed.
+        """
+        root = self.__root
+        if not 0 <= start <= end <= (root.length if root is not None else 0):
+            raise ValueError("Edit {}:{} is outside of the text.".format(start, end))
+
+        # Start at the Rule ending right before the edit, since the edit can
+        # extend its trailing whitespace, and reparse up to the Rule the edit
+        # ends in.
+        first, pos, newlines, tail = _locate(root, max(start - 1, 0))
+        last = _locate(root, end)[0] + 1
+        left, rest = _split(root, first)
+        window, right = _split(rest, last - first)
+        delta = len(replacement) - (end - start)
+
+        # Text before the window, for the context of errors
+        prefix = ""
+        if left is not None:
+            node = left
+            while node.right is not None:
+                node = node.right
+            prefix = node.text[-CONTEXT_SIZE:]
+        done = False
+        try:
+            while True:
+                old_text = "".join(piece.text for piece in _pieces(window))
+                text = prefix + old_text[:start - pos] + replacement + old_text[end - pos:]
+                # Old offsets of the Rules in the window, and of its end
+                boundaries = [pos]
+                for piece in _pieces(window):
+                    boundaries.append(boundaries[-1] + len(piece.text))
+                new_start = pos - len(prefix)
+
+                def reached_old_rule(i):
+                    old_pos = new_start + i - delta
+                    return old_pos >= end and old_pos in boundaries
+
+                try:
+                    rules, offsets = self.__parse_rules(text, len(prefix), newlines + 1, tail + 1, reached_old_rule)
+                    break
+                except ParseError as e:
+                    if right is None or e.pos() < len(text):
+                        raise e.shifted(new_start)
+                    # A Rule goes on past the window, which grows to twice
+                    # as many Rules.
+                    more, right = _split(right, window.count if window is not None else 1)
+                    window = _merge(window, more)
+            done = True
+        finally:
+            if not done:
+                self.__root = _merge(_merge(left, window), right)
+
+        # Old Rules up to the boundary the parse stopped at are replaced
+        replaced = boundaries.index(new_start + offsets[-1] - delta)
+        window = _split(window, replaced)[1]
+        new_pieces = _build(self.__new_pieces(text, rules, offsets))
+        self.__root = _merge(_merge(left, new_pieces), _merge(window, right))
+        self.__grammar.productions()[first:first + replaced] = rules
+        return self.__grammar
+
+    def __new_pieces(self, text, rules, offsets):
+        return [_Piece(rule, text[offsets[i]:offsets[i + 1]], self.__utf8) for i, rule in enumerate(rules)]
+
+    def __parse_rules(self, text, pos, line_no, col_no, stop):
+        """
+        Parse consecutive Rules of text from the offset pos, at the given
+        line and column, until stop is true for the offset reached or the
+        text ends. Returns the Rules and the offsets they start at, followed
+        by the offset after the last one.
+        """
+        stream = StreamHandler(BufferIterator(text, start=pos, utf8=self.__utf8), line_no=line_no, col_no=col_no)
+        rules = []
+        offsets = [pos]
+        while pos < len(text) and not stop(pos):
+            rules.append(table_parse(stream, Rule, table=self.__table, lexer=self.__lexer))
+            pos = stream.pos()
+            offsets.append(pos)
+        return rules, offsets
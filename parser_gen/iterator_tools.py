@@ -1,22 +1,25 @@
 #-*- coding: utf-8 -*-
 
+from utils import utf8_width
+
+import collections
 import itertools
 import copy
 
 
-# Thanks: http://stackoverflow.com/a/2065624
-def sum_to_n(n, size=None):
-    """Generate the series of +ve integer lists which sum to a +ve integer, n."""
-    from operator import sub
-    mid = xrange(1, n)
-    splits = (d for i in xrange(n) for d in itertools.combinations(mid, i))
-    for s in splits:
-        combo = map(sub, itertools.chain(s, [n]), itertools.chain([0], s))
-        if size is not None:
-            if len(combo) == size:
-                yield combo
-        else:
-            yield combo
+def offset_partitions(offsets, parts, limit=None):
+    """
+    Lazily split the range from the first to the last of a sorted sequence
+    of offsets into parts non empty (start, end) ranges, which only start
+    and end at those offsets. Generates at most limit splits if given.
+    """
+    offsets = list(offsets)
+    if parts < 1 or len(offsets) <= parts:
+        return iter(())
+    first = (offsets[0],)
+    last = (offsets[-1],)
+    splits = (zip(first + inner, inner + last) for inner in itertools.combinations(offsets[1:-1], parts - 1))
+    return itertools.islice(splits, limit)
 
 
 class ExtendedIterator(object):
@@ -27,6 +30,8 @@ class ExtendedIterator(object):
     def __init__(self, iterator, start=0, end=None):
         assert not isinstance(iterator, ExtendedIterator), "The iterator provided to ExtendedIterator must not be an ExtendedIterator."
         self.__iter = iter(iterator)
+        # Items taken from the iterator by peek, but not by next yet
+        self.__peeked = collections.deque()
         self.__end = end
         self.__count = start
 
@@ -42,7 +47,7 @@ class ExtendedIterator(object):
                 raise StopIteration
 
         # Automatically raises StopIteration
-        item = next(self.__iter)
+        item = self.__peeked.popleft() if self.__peeked else next(self.__iter)
 
         # Increment on successful retrieval
         self.__count += 1
@@ -56,12 +61,17 @@ class ExtendedIterator(object):
         return self.__end
 
     def peek(self, n):
-        """Args are same as thos passed to islice."""
+        """
+        The next n items without consuming them. They are kept aside instead
+        of chaining them in front of the iterator, which would nest another
+        chain on every call.
+        """
         if self.__end:
             n = min(n, self.__end - self.__count)
-        items = list(itertools.islice(self.__iter, n))
-        self.__iter = itertools.chain(items, self.__iter)
-        return items
+        peeked = self.__peeked
+        if len(peeked) < n:
+            peeked.extend(itertools.islice(self.__iter, n - len(peeked)))
+        return list(itertools.islice(peeked, n))
 
     def __str__(self):
         head = self.peek(1)
@@ -81,10 +91,14 @@ class ExtendedIterator(object):
         )
 
     def iterator(self):
+        """The underlying iterator, starting with the peeked items."""
+        if self.__peeked:
+            self.__iter = itertools.chain(list(self.__peeked), self.__iter)
+            self.__peeked.clear()
         return self.__iter
 
     def __deepcopy__(self, memo):
-        self.__iter, copied = copy_iterator(self.__iter)
+        self.__iter, copied = copy_iterator(self)
         return ExtendedIterator(
             copied,
             start=self.__count,
@@ -95,6 +109,142 @@ class ExtendedIterator(object):
         return bool(self.peek(1))
 
 
+class BufferIterator(ExtendedIterator):
+    """
+    ExtendedIterator over a str or mmap buffer. The position is an index
+    into the buffer, so peeking, copying and advancing are constant time
+    and never wrap the underlying data in more iterators.
+
+    With utf8 set, the buffer holds UTF-8 encoded bytes. Items are whole
+    UTF-8 sequences whose length is read from their lead byte, and the
+    position stays a byte offset, so the buffer never has to be decoded
+    to be indexed.
+    """
+    def __init__(self, buff, start=0, end=None, utf8=False):
+        self.__buff = buff
+        self.__count = start
+        self.__end = end
+        self.__utf8 = utf8
+
+    def limit(self):
+        """Offset the iterator stops at."""
+        if self.__end is None:
+            return len(self.__buff)
+        return min(self.__end, len(self.__buff))
+
+    def item_at(self, i):
+        """Item starting at offset i of the buffer, or "" past the end."""
+        if i >= self.limit():
+            return ""
+        if self.__utf8:
+            return self.__buff[i:i+utf8_width(self.__buff[i])]
+        return self.__buff[i]
+
+    def set_end(self, new_end):
+        self.__end = new_end
+
+    def next(self):
+        if self.__count >= self.limit():
+            raise StopIteration
+        item = self.item_at(self.__count)
+        self.__count += len(item) if self.__utf8 else 1
+        return item
+
+    def count(self):
+        return self.__count
+
+    def end(self):
+        return self.__end
+
+    def buffer(self):
+        return self.__buff
+
+    def utf8(self):
+        return self.__utf8
+
+    def view(self, start, end):
+        """Iterator over the offsets start to end of the same buffer."""
+        return BufferIterator(self.__buff, start=start, end=end, utf8=self.__utf8)
+
+    def offsets(self):
+        """Offset of every item left, followed by the limit."""
+        if not self.__utf8:
+            return xrange(self.__count, self.limit() + 1)
+        offsets = []
+        i = self.__count
+        limit = self.limit()
+        while i < limit:
+            offsets.append(i)
+            i += utf8_width(self.__buff[i])
+        offsets.append(limit)
+        return offsets
+
+    def item_before(self, i):
+        """Offset at which the item ending at offset i starts."""
+        if not self.__utf8 or i <= 1:
+            return i - 1
+        j = i - 1
+        while j > max(i - 4, 0) and "\x80" <= self.__buff[j] < "\xc0":
+            j -= 1
+        if j + utf8_width(self.__buff[j]) == i:
+            return j
+        # A stray continuation byte is an item of its own
+        return i - 1
+
+    def partitions(self, parts, limit=None):
+        """
+        Lazily generate every split of the items left into parts non empty
+        (start, end) ranges of offsets, at most limit of them if given.
+        """
+        return offset_partitions(self.offsets(), parts, limit=limit)
+
+    def seek(self, i):
+        """Move the position to an absolute offset in the buffer."""
+        self.__count = max(0, min(i, self.limit()))
+
+    def skip(self, n):
+        """Move the position forward by n items."""
+        if not self.__utf8:
+            self.seek(self.__count + n)
+            return
+        limit = self.limit()
+        i = self.__count
+        while n > 0 and i < limit:
+            i += utf8_width(self.__buff[i])
+            n -= 1
+        self.seek(i)
+
+    def peek(self, n):
+        limit = self.limit()
+        if not self.__utf8:
+            return list(self.__buff[self.__count:min(self.__count + n, limit)])
+        items = []
+        i = self.__count
+        while len(items) < n and i < limit:
+            item = self.item_at(i)
+            items.append(item)
+            i += len(item)
+        return items
+
+    def __str__(self):
+        head = self.peek(1)
+        return "<{} count={} end={} stream={}>".format(
+            type(self).__name__,
+            self.__count,
+            self.__end,
+            "[{}..]".format(head[0]) if head else "[]"
+        )
+
+    def iterator(self):
+        return iter(copy.deepcopy(self))
+
+    def __deepcopy__(self, memo):
+        return BufferIterator(self.__buff, start=self.__count, end=self.__end, utf8=self.__utf8)
+
+    def __nonzero__(self):
+        return self.__count < self.limit()
+
+
 def copy_iterator(iterator, n=2):
     # Avoid invifinte recursion by not having nested ExtendedIterators
     if isinstance(iterator, ExtendedIterator):
@@ -146,33 +296,16 @@ def partition_iterator(iterator, *args, **kwargs):
     return replacement, [first_part] + rest
 
 
-def all_iterator_partitions(iterator, n):
+def all_iterator_partitions(iterator, n, limit=None):
     """
-    Split an iterator by creating different generators that start and end
-    at different points.
-
-    Partition by just setting start and end points for generators on each
-    partition. The last one will not have and end. This function does not have
-    knowledge of the "length" or end of the iterator.
-
-    Work by creating up to n-1 partitions that are split up among an
-    incrementing n-1. For example: to split an iterator into n 4 partitions,
-    set the initial size as n-1 to be split into n-1 parts, forming 3 initial
-    partitions of size 1, and the fourth the remainder of the iterator
-    with the first 3 elements popped off. Next is size 4 with 3 parts,
-    so the next 3 will be be of size (2, 1, 1), (1, 2, 1), and (1, 1, 2) with
-    the fourth in each sequence being the remainder of the iterator with
-    the first 4 elements popped off.
-    """
-    size = n-1
-    if size <= 0:
-        yield [copy.deepcopy(iterator)]
-        return
-    while True:
-        for nums in sum_to_n(size, n-1):
-            iterator, parts = partition_iterator(iterator, *nums)
-            if not all(parts):
-                return
-            yield parts
-        size += 1
+    Lazily generate every split of an iterator into n non empty parts, at
+    most limit of them if given.
 
+    The parts are views over one buffer that only differ in their start and
+    end offsets. Iterators that are not buffer backed are copied into a list
+    once, which the views then share.
+    """
+    if not isinstance(iterator, BufferIterator):
+        iterator = BufferIterator(list(copy.deepcopy(iterator)))
+    for ranges in iterator.partitions(n, limit=limit):
+        yield [iterator.view(start, end) for start, end in ranges]
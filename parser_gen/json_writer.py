@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Write the json of a parse tree as JSON text without building it in memory.
+
+iter_json() walks the tree iteratively with one iterator per open node, so
+it holds the path to the current node instead of the whole json() value,
+and yields the text piece by piece. Nodes are written by the JSON shape of
+their rule class (see json_shape_of), which mirrors what their json()
+returns. Nodes of any other shape, like strings and terminals, are written
+from their json() value.
+"""
+
+from production_rules import JSON_LIST, JSON_NAMED, JSON_PASS, ProductionRule, json_shape_of
+
+import json
+
+
+# Characters collected before each write to the file.
+CHUNK_SIZE = 1 << 16
+
+_END = object()
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=True)
+
+
+def iter_json(rule, compact=False):
+    """
+    Pieces of the JSON text of rule.json(). Compact text has no spaces after
+    the separators.
+    """
+    item_sep, key_sep = (",", ":") if compact else (", ", ": ")
+
+    # Open nodes as [productions iterator, closing text, first item]
+    stack = [[iter((rule,)), "", True]]
+    while stack:
+        frame = stack[-1]
+        node = next(frame[0], _END)
+        if node is _END:
+            stack.pop()
+            yield frame[1]
+            continue
+
+        if frame[2]:
+            frame[2] = False
+        else:
+            yield item_sep
+
+        shape = json_shape_of(type(node)) if isinstance(node, ProductionRule) else None
+        while shape == JSON_PASS:
+            productions = node.productions()
+            node = productions[0] if productions else None
+            shape = json_shape_of(type(node)) if isinstance(node, ProductionRule) else None
+
+        if shape == JSON_NAMED:
+            yield "{" + _encode(type(node).__name__) + key_sep + "["
+            stack.append([iter(node.productions()), "]}", True])
+        elif shape == JSON_LIST:
+            yield "["
+            stack.append([iter(node.productions()), "]", True])
+        elif shape is not None:
+            yield _encode(node.json())
+        else:
+            yield _encode(node)
+
+
+def dump_json(rule, f, compact=False, chunk_size=CHUNK_SIZE):
+    """Write the JSON text of rule.json() to the file object f in chunks."""
+    chunk = []
+    size = 0
+    for piece in iter_json(rule, compact=compact):
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            f.write("".join(chunk))
+            chunk = []
+            size = 0
+    f.write("".join(chunk))
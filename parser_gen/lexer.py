@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+Scan whole tokens of lexical rules with compiled regular expressions.
+
+A Lexer is built from rules whose productions are regular, like Identifier,
+Terminal and Whitespace. Their structure is translated into one pattern per
+rule. When the parser has one of those rules on top of its stack, the lexer
+matches the rule at the current offset of the buffer in one step, instead of
+pushing a node for every character of the token. The token becomes a node of
+the rule holding its text as a single Lexeme.
+
+Repetitions and choices are wrapped in atomic groups, so like the parser the
+patterns never give back what a repetition consumed. If a rule does not match
+at an offset, the parser falls back to matching it character by character,
+which reports the same errors as parsing without a lexer.
+"""
+
+from production_rules import (
+    CharacterClassRule, Identifier, ProductionRuleError, Terminal, TerminalRule, Whitespace
+)
+
+import re
+
+
+# One character of a UTF-8 buffer, split like the items of a BufferIterator.
+UTF8_CHARACTER = r"(?:[\xc0-\xdf][\s\S]|[\xe0-\xef][\s\S]{2}|[\xf0-\xff][\s\S]{3}|[\s\S])"
+
+# One character of any other buffer.
+CHARACTER = r"[\s\S]"
+
+
+class Lexeme(TerminalRule):
+    """Text of a whole token matched by the lexer."""
+    def __init__(self, text):
+        super(Lexeme, self).__init__()
+        self.string = text
+
+    def __reduce__(self):
+        return (Lexeme, (self.string,))
+
+
+def character_class_pattern(rule_cls, utf8=True):
+    chars = sorted(rule_cls.chars)
+    if not chars:
+        positive = "(?!)"
+    elif all(len(c) == 1 for c in chars):
+        positive = "[{}]".format("".join(map(re.escape, chars)))
+    else:
+        positive = "(?:{})".format("|".join(map(re.escape, chars)))
+
+    if not rule_cls.negated:
+        return positive
+    character = UTF8_CHARACTER if utf8 else CHARACTER
+    return character if not chars else "(?!{}){}".format(positive, character)
+
+
+def rule_pattern(rule_cls, utf8=True):
+    """
+    Regular expression source matching what the parser matches for
+    rule_cls. Raises ProductionRuleError if the rule is recursive or only
+    described through get_rules.
+    """
+    groups = [0]
+
+    def atomic(pattern):
+        # A lookahead is never backtracked into, so matching what it
+        # captured commits to its first match like the parser does.
+        groups[0] += 1
+        return "(?=(?P<g{0}>{1}))(?P=g{0})".format(groups[0], pattern)
+
+    def build(rule_cls, visiting):
+        if issubclass(rule_cls, TerminalRule):
+            return re.escape(rule_cls.string)
+        elif issubclass(rule_cls, CharacterClassRule):
+            return character_class_pattern(rule_cls, utf8=utf8)
+        elif rule_cls in visiting:
+            raise ProductionRuleError("Rule '{}' is recursive and cannot be scanned.".format(rule_cls.__name__))
+        visiting = visiting | set([rule_cls])
+
+        repeated = getattr(rule_cls, "repeated", None)
+        if repeated is not None:
+            return atomic("(?:{})*".format(build(repeated, visiting)))
+
+        alts = rule_cls.alternatives()
+        if alts is None:
+            raise ProductionRuleError("Rule '{}' has no alternatives to scan.".format(rule_cls.__name__))
+        seqs = ["".join(build(r, visiting) for r in alt) for alt in alts]
+        return seqs[0] if len(seqs) == 1 else atomic("|".join(seqs))
+
+    return build(rule_cls, set())
+
+
+class Lexer(object):
+    def __init__(self, rules):
+        self.__rules = frozenset(rules)
+        self.__patterns = {}
+        # Fail early on rules that are not regular.
+        for rule_cls in self.__rules:
+            self.pattern(rule_cls)
+
+    def rules(self):
+        return self.__rules
+
+    def pattern(self, rule_cls, utf8=True):
+        """Compiled pattern of a rule for UTF-8 or other buffers."""
+        key = (rule_cls, utf8)
+        pattern = self.__patterns.get(key)
+        if pattern is None:
+            pattern = self.__patterns[key] = re.compile(rule_pattern(rule_cls, utf8=utf8))
+        return pattern
+
+    def match(self, rule_cls, stream):
+        """
+        Text of the token of a rule at the position of a buffer backed
+        stream, after advancing the stream past it, or None without
+        advancing if the rule does not match.
+        """
+        char_iter = stream.char_iter()
+        pattern = self.pattern(rule_cls, char_iter.utf8())
+        match = pattern.match(char_iter.buffer(), char_iter.count(), char_iter.limit())
+        if match is None:
+            return None
+
+        text = match.group()
+        if text:
+            stream.advance_to(match.end())
+        return text
+
+
+# Tokens of the Grammar meta rules
+GRAMMAR_LEXER = Lexer((Identifier, Terminal, Whitespace))
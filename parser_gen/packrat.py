@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+Packrat parsing over the production rules.
+
+Alternatives are tried in order and the parser backtracks to the next one
+when an alternative fails, so alternatives may share a prefix of any length.
+Every (rule, position) result is memoized, which keeps ordered choice linear
+in the size of the input. Rules built by the combinators are matched through
+their alternatives(); hand written rules still pick their production with
+get_rules() on the character at the current position.
+
+A left recursive rule fails when it reaches itself at the same position, so
+only its non left recursive alternatives can match.
+"""
+
+from iterator_tools import BufferIterator
+from production_rules import TerminalRule
+
+
+# Memo entry for a rule that failed to match
+FAILED = None
+
+
+class PackratParser(object):
+    def __init__(self, char_iter):
+        assert isinstance(char_iter, BufferIterator), "The packrat parser needs a position indexed BufferIterator."
+        self.__iter = char_iter
+        self.__buff = char_iter.buffer()
+        self.__memo = {}
+        self.__furthest = char_iter.count()
+
+    def memo_size(self):
+        return len(self.__memo)
+
+    def furthest(self):
+        """Furthest offset any rule tried to match at."""
+        return self.__furthest
+
+    def parse(self, rule_cls, pos):
+        """Return a (node, end) pair if rule_cls matches at pos, otherwise FAILED."""
+        key = (rule_cls, pos)
+        if key in self.__memo:
+            return self.__memo[key]
+
+        # Fail on left recursion instead of looping
+        self.__memo[key] = FAILED
+        if pos > self.__furthest:
+            self.__furthest = pos
+
+        if issubclass(rule_cls, TerminalRule):
+            result = self.__parse_terminal(rule_cls, pos)
+        elif getattr(rule_cls, "repeated", None) is not None:
+            result = self.__parse_repetition(rule_cls, pos)
+        else:
+            alts = rule_cls.alternatives()
+            if alts is None:
+                rules = rule_cls.get_rules(self.__iter.item_at(pos))
+                alts = [] if rules is None else [rules]
+            result = self.__parse_choice(rule_cls, alts, pos)
+
+        self.__memo[key] = result
+        return result
+
+    def __parse_terminal(self, rule_cls, pos):
+        s = rule_cls.string
+        end = pos + len(s)
+        if end > self.__iter.limit() or self.__buff[pos:end] != s:
+            return FAILED
+        return rule_cls(), end
+
+    def __parse_repetition(self, rule_cls, pos):
+        node = rule_cls()
+        while True:
+            result = self.parse(rule_cls.repeated, pos)
+            if result is FAILED or result[1] == pos:
+                break
+            child, pos = result
+            node.productions().append(child)
+        return node, pos
+
+    def __parse_choice(self, rule_cls, alts, pos):
+        for alt in alts:
+            children = []
+            end = pos
+            for child_cls in alt:
+                result = self.parse(child_cls, end)
+                if result is FAILED:
+                    break
+                child, end = result
+                children.append(child)
+            else:
+                node = rule_cls()
+                node.apply_rules(tuple(children))
+                return node, end
+        return FAILED
+
+
+def packrat_parse(stream, starting_rule):
+    """
+    Parse a stream with ordered choice and backtracking, leaving the stream
+    just after the input the starting rule matched.
+    """
+    char_iter = stream.char_iter()
+    if not isinstance(char_iter, BufferIterator):
+        buff = "".join(char_iter)
+        char_iter = BufferIterator(buff)
+
+    parser = PackratParser(char_iter)
+    start = char_iter.count()
+    result = parser.parse(starting_rule, start)
+    if result is FAILED:
+        pos = parser.furthest()
+        raise RuntimeError("Unable to handle token '{}' for rule '{}' at position {}.".format(char_iter.item_at(pos), starting_rule.__name__, pos))
+
+    head, end = result
+    if stream.char_iter() is char_iter:
+        stream.advance_to(end)
+    return head
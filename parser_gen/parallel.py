@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parse the Rules of a large grammar in several processes.
+
+A Grammar is a repetition of Rules, and every Rule ends at a ";" outside of
+quotes followed by whitespace. The text is split at those offsets into
+chunks of about the same size without parsing it, each chunk is parsed as a
+Grammar by a multiprocessing pool, and the Rules of the chunks are joined
+into one Grammar. Each chunk is parsed with the line and column it starts
+at, and its errors are moved by its offset, so they report their position
+in the whole text.
+
+A chunk parses exactly like the same Rules in the whole text: the last Rule
+of a chunk ends after its trailing whitespace, and the next chunk starts at
+the following character.
+"""
+
+from iterator_tools import BufferIterator
+from lexer import GRAMMAR_LEXER
+from driver import ParseError, compiled_parse
+from parse_table import ParseTable
+from production_rules import Grammar
+from stream_handler import StreamHandler
+from utils import char_len
+
+import multiprocessing
+import re
+
+
+# Quoted terminals, which are skipped as a whole, and the end of a Rule
+# including the whitespace after it.
+RULE_END = re.compile(r"""'(?:[^'\\]|\\[\s\S])*'|"(?:[^"\\]|\\[\s\S])*"|;\s*""")
+
+# Chunks handed to every process, so slow chunks even out.
+CHUNKS_PER_PROCESS = 4
+
+# Grammar table of the current process
+_TABLE = []
+
+
+def split_rules(text, size):
+    """
+    Offsets splitting text at the end of Rules into chunks of at least size
+    characters, except for the last one.
+    """
+    offsets = [0]
+    for match in RULE_END.finditer(text):
+        end = match.end()
+        if end - offsets[-1] >= size and match.group()[0] == ";" and end < len(text):
+            offsets.append(end)
+    return offsets
+
+
+def parse_chunk(args):
+    """Rules of one chunk of text starting at the given offset, line and column."""
+    text, start, line_no, col_no, lex, utf8 = args
+    if not _TABLE:
+        _TABLE.append(ParseTable(Grammar))
+    stream = StreamHandler(BufferIterator(text, utf8=utf8), line_no=line_no, col_no=col_no)
+    try:
+        grammar = compiled_parse(stream, _TABLE[0], lexer=GRAMMAR_LEXER if lex else None)
+    except ParseError as e:
+        raise e.shifted(start)
+    return grammar.productions()
+
+
+def _chunk_result(args):
+    """
+    Rules of a chunk or the error parsing it. Pools in python 2 stop reading
+    results after a task raises and can hang on the workers still sending
+    theirs, so errors are returned and raised once every chunk is done.
+    """
+    try:
+        return parse_chunk(args), None
+    except RuntimeError as e:
+        return None, e
+
+
+def parallel_parse(text, processes=None, lex=False, utf8=False):
+    """
+    Parse text as a Grammar in processes processes, defaulting to one per
+    CPU. With lex set, the tokens of every chunk are scanned with the
+    GRAMMAR_LEXER. With utf8 set, a byte string is read as UTF-8 like
+    StreamHandler.from_str does.
+    """
+    utf8 = utf8 and isinstance(text, str)
+    processes = processes or multiprocessing.cpu_count()
+    offsets = split_rules(text, len(text) // (processes * CHUNKS_PER_PROCESS) + 1)
+
+    chunks = []
+    line_no = 1
+    for start, end in zip(offsets, offsets[1:] + [len(text)]):
+        line_start = text.rfind("\n", 0, start) + 1
+        col_no = (char_len if utf8 else len)(text[line_start:start]) + 1
+        chunks.append((text[start:end], start, line_no, col_no, lex, utf8))
+        line_no += text.count("\n", start, end)
+
+    if len(chunks) == 1 or processes == 1:
+        results = map(_chunk_result, chunks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_chunk_result, chunks)
+        finally:
+            pool.close()
+            pool.join()
+
+    rules = []
+    for chunk_rules, error in results:
+        if error is not None:
+            raise error
+        rules.extend(chunk_rules)
+    return Grammar(rules)
@@ -1,31 +1,42 @@
 # -*- coding: utf-8 -*-
 
-def peek_stream(stream, n):
-    top = stream.peek_n(n)
-    return top + [""] * (n - len(top))
+"""
+Former name of the driver module, so imports from parser_gen.parse keep
+working.
 
+Importing a submodule sets it as an attribute of its package, which would
+replace the parser_gen.parse() function. The module puts a callable copy of
+itself in sys.modules instead, which the import then sets, and calling it
+calls the function.
+"""
 
-def table_parse(stream, starting_rule, k=1):
-    stack = [starting_rule()]
-    head = stack[-1]
+from driver import *
 
-    while stack:
-        top_rule = stack.pop()
-        lookaheads = peek_stream(stream, k)
+import sys
+import types
 
-        if top_rule == lookaheads[0]:
-            stream.pop_char()
-        else:
-            rules = top_rule.get_rules(*lookaheads)
-            if rules is not None:
-                rules = tuple(r() for r in rules)
-                top_rule.apply_rules(rules)
-                stack += list(reversed(rules))
-            else:
-                raise RuntimeError("Unable to handle token '{}' for rule '{}'. {}".format(lookaheads[0], type(top_rule).__name__, stream))
 
-    if stack:
-        raise RuntimeError("Stack was not exhausted: {}".format([type(x).__name__ for x in stack]))
+class _CallableModule(types.ModuleType):
+    """Module calling the parse() function of its package."""
 
-    return head
+    def __init__(self, name, doc, parse):
+        types.ModuleType.__init__(self, name, doc)
+        self.__parse = parse
 
+    def __call__(self, *args, **kwargs):
+        return self.__parse(*args, **kwargs)
+
+
+def _replace_module(name):
+    package = sys.modules.get(name.rpartition(".")[0])
+    if package is None:
+        return
+    parse = package.__dict__.get("parse")
+    if isinstance(parse, _CallableModule) or not callable(parse):
+        return
+    module = _CallableModule(name, __doc__, parse)
+    module.__dict__.update((key, value) for key, value in globals().iteritems() if key not in ("__name__", "__doc__"))
+    sys.modules[name] = module
+
+
+_replace_module(__name__)
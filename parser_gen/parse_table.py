@@ -0,0 +1,574 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compile production rules into an LL(k) parse table.
+
+The grammar is walked once from the starting rule. Rules built by the
+combinators describe their productions through alternatives(). Hand written
+rules are probed with get_rules() for every character in the alphabet. FIRST
+and FOLLOW sets are computed over the collected productions and used to fill
+a (rule, lookahead) -> production table, so the parse driver only needs one
+dict lookup per step.
+
+With k > 1, alternatives that start with the same character, or an empty
+alternative and one starting with a character that can follow the rule,
+are told apart by the next k characters: the table entry for that
+character becomes a LookaheadChoice which the driver resolves by peeking k
+characters. Only those entries ever peek past the next character.
+"""
+
+from production_rules import K, CharacterClassRule, ProductionRuleError, TerminalRule, signature_of, terminal
+from utils import split_chars
+
+
+EOF = ""
+
+# Every byte plus the end of the stream.
+DEFAULT_ALPHABET = tuple(chr(i) for i in xrange(256)) + (EOF,)
+
+# Table entry for a terminal that consumes the lookahead.
+MATCH = object()
+
+
+def is_terminal(rule_cls):
+    """Single character terminals are matched directly against the input."""
+    return issubclass(rule_cls, TerminalRule) and len(split_chars(rule_cls.string)) == 1
+
+
+def sequence_first(seq, first, nullable):
+    """FIRST set of a sequence of rules and whether the whole sequence is nullable."""
+    result = set()
+    for rule_cls in seq:
+        result |= first[rule_cls]
+        if rule_cls not in nullable:
+            return result, False
+    return result, True
+
+
+class FollowOf(object):
+    """Marks the end of an alternative, followed by whatever follows its rule."""
+    def __init__(self, rule_cls):
+        self.rule_cls = rule_cls
+
+    def __eq__(self, other):
+        return isinstance(other, FollowOf) and other.rule_cls is self.rule_cls
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.rule_cls)
+
+
+# Matches anything once an alternative and what follows it are behind us.
+ANY = object()
+
+# Longest stack of pending rules before a rule is considered left recursive.
+MAX_LOOKAHEAD_STACK = 1000
+
+# Characters followed before consuming instead of taking an empty alternative
+# is no longer assumed to accept the same input.
+MAX_GREEDY_DEPTH = 8
+
+
+class LookaheadChoice(object):
+    """
+    Table entry choosing between alternatives on the next k characters. The
+    choices are a trie of dicts keyed by the characters after the first one,
+    whose leaves are productions.
+    """
+    def __init__(self, k, choices):
+        self.__k = k
+        self.__choices = choices
+
+    def k(self):
+        return self.__k
+
+    def choices(self):
+        return self.__choices
+
+    def choose(self, lookaheads):
+        """Production selected by the lookaheads, or None."""
+        node = self.__choices
+        for lookahead in lookaheads[1:]:
+            node = node.get(lookahead)
+            if not isinstance(node, dict):
+                return node
+        return None
+
+
+class ParseTable(object):
+    def __init__(self, starting_rule, alphabet=DEFAULT_ALPHABET, k=K):
+        self.__k = k
+        self.__canonical = {}
+        self.__alphabet = set(alphabet)
+        self.__alphabet.add(EOF)
+        self.__entries = {}
+        self.__conflicts = []
+        self.__start = self.canonical(starting_rule)
+        self.compile()
+
+    def canonical(self, rule_cls):
+        """Map structurally equal combinator classes onto a single class."""
+        return self.__canonical.setdefault(signature_of(rule_cls), rule_cls)
+
+    def start(self):
+        return self.__start
+
+    def alphabet(self):
+        return self.__alphabet
+
+    def k(self):
+        return self.__k
+
+    def entries(self):
+        return self.__entries
+
+    def conflicts(self):
+        """
+        (rule, lookahead, alternative, other alternative) of the lookaheads
+        that two alternatives of a rule can both start with, or that an empty
+        alternative can be followed by. With k = 1 they are resolved in favour
+        of the earlier alternative, or of the one consuming the lookahead.
+        """
+        return self.__conflicts
+
+    def rules(self):
+        return self.__productions.keys()
+
+    def terminals(self):
+        return self.__terminals
+
+    def productions(self, rule_cls):
+        return self.__productions[rule_cls]
+
+    def first(self, rule_cls):
+        return self.__first[rule_cls]
+
+    def follow(self, rule_cls):
+        return self.__follow[rule_cls]
+
+    def nullable(self, rule_cls):
+        return rule_cls in self.__nullable
+
+    def lookup(self, rule_cls, lookahead):
+        """
+        Production for a rule on a lookahead, MATCH for a terminal consuming
+        it, or None on a syntax error. Characters outside the alphabet are
+        added to it, with their entries.
+        """
+        entry = self.__entries.get((rule_cls, lookahead))
+        if entry is None and lookahead not in self.__alphabet:
+            self.__add_lookahead(lookahead)
+            entry = self.__entries.get((rule_cls, lookahead))
+        return entry
+
+    def compile(self):
+        # Hand written rules are only probed with the alphabet, so it has to
+        # contain every character the grammar names explicitly.
+        while self.__collect():
+            pass
+        self.__compute_first()
+        self.__compute_follow()
+        self.__fill()
+        self.__resolve()
+
+    def __collect(self):
+        """
+        Find every rule reachable from the start and its productions. Returns
+        True if characters had to be added to the alphabet, in which case the
+        rules have to be collected again.
+        """
+        missing = set()
+        productions = {}
+        probes = {}
+        chosen_on = {}
+        terminals = set()
+        pending = [self.__start]
+        lookaheads = sorted(self.__alphabet)
+        while pending:
+            rule_cls = pending.pop()
+            if rule_cls in productions or rule_cls in terminals:
+                continue
+            if is_terminal(rule_cls):
+                terminals.add(rule_cls)
+                missing.add(rule_cls.string)
+                if len(rule_cls.string) > 1:
+                    # Streams not read as UTF-8 match the bytes of the character
+                    alt = tuple(self.canonical(terminal(b)) for b in rule_cls.string)
+                    productions[rule_cls] = [alt]
+                    pending.extend(alt)
+                continue
+            if issubclass(rule_cls, CharacterClassRule) and not rule_cls.negated:
+                missing |= rule_cls.chars
+
+            alts = rule_cls.alternatives()
+            if alts is None:
+                probed = {}
+                alts = []
+                for lookahead in lookaheads:
+                    rules = rule_cls.get_rules(lookahead)
+                    if rules is not None:
+                        rules = tuple(self.canonical(r) for r in rules)
+                        probed[lookahead] = rules
+                        if rules not in alts:
+                            alts.append(rules)
+                probes[rule_cls] = probed
+                chosen_on[rule_cls] = dict((alt, set()) for alt in alts)
+                for lookahead, alt in probed.iteritems():
+                    chosen_on[rule_cls][alt].add(lookahead)
+            else:
+                alts = [tuple(self.canonical(r) for r in alt) for alt in alts]
+
+            productions[rule_cls] = alts
+            for alt in alts:
+                pending.extend(alt)
+
+        self.__productions = productions
+        self.__probes = probes
+        self.__chosen_on = chosen_on
+        self.__terminals = terminals
+
+        missing -= self.__alphabet
+        self.__alphabet |= missing
+        return bool(missing)
+
+    def __compute_first(self):
+        first = dict((t, set([t.string])) for t in self.__terminals)
+        for rule_cls in self.__productions:
+            first.setdefault(rule_cls, set())
+        nullable = set()
+
+        changed = True
+        while changed:
+            changed = False
+            for rule_cls, alts in self.__productions.iteritems():
+                chosen_on = self.__chosen_on.get(rule_cls)
+                for alt in alts:
+                    alt_first, alt_nullable = sequence_first(alt, first, nullable)
+                    if chosen_on is not None:
+                        # A probed rule only starts with what it accepted.
+                        alt_first &= chosen_on[alt]
+                    if not alt_first <= first[rule_cls]:
+                        first[rule_cls] |= alt_first
+                        changed = True
+                    if alt_nullable and rule_cls not in nullable:
+                        nullable.add(rule_cls)
+                        changed = True
+
+        self.__first = first
+        self.__nullable = nullable
+
+    def __compute_follow(self):
+        first = self.__first
+        nullable = self.__nullable
+        follow = dict((rule_cls, set()) for rule_cls in first)
+        follow[self.__start].add(EOF)
+
+        # Rules and the rest of their alternatives after every use of a rule
+        occurrences = dict((rule_cls, []) for rule_cls in first)
+        for rule_cls, alts in self.__productions.iteritems():
+            for alt in alts:
+                for i, sym in enumerate(alt):
+                    occurrences[sym].append((rule_cls, alt[i + 1:]))
+        self.__occurrences = occurrences
+
+        changed = True
+        while changed:
+            changed = False
+            for rule_cls, alts in self.__productions.iteritems():
+                for alt in alts:
+                    trailer = set(follow[rule_cls])
+                    for sym in reversed(alt):
+                        if not trailer <= follow[sym]:
+                            follow[sym] |= trailer
+                            changed = True
+                        if sym in nullable:
+                            trailer = trailer | first[sym]
+                        else:
+                            trailer = set(first[sym])
+
+        self.__follow = follow
+
+    def __fill(self):
+        entries = self.__entries
+        entries.clear()
+        del self.__conflicts[:]
+
+        for t in self.__terminals:
+            entries[(t, t.string)] = MATCH
+
+        for rule_cls in self.__productions:
+            self.__fill_rule(rule_cls)
+
+    def __fill_rule(self, rule_cls, lookaheads=None):
+        """Entries of a rule, only for the given lookaheads if there are any."""
+        entries = self.__entries
+        follow = self.__follow[rule_cls]
+        if lookaheads is not None:
+            follow = follow & lookaheads
+        if rule_cls in self.__probes:
+            # The rule already decided on each lookahead. Only restrict
+            # empty productions to what can actually follow the rule.
+            for lookahead, alt in self.__probes[rule_cls].iteritems():
+                if (alt or lookahead in follow) and (lookaheads is None or lookahead in lookaheads):
+                    entries[(rule_cls, lookahead)] = alt
+            return
+
+        # Prefer consuming input over taking an empty production. That
+        # is only a conflict if the empty production can accept input the
+        # consuming one rejects.
+        nullable_alts = []
+        for alt in self.__productions[rule_cls]:
+            alt_first, alt_nullable = sequence_first(alt, self.__first, self.__nullable)
+            if lookaheads is not None:
+                alt_first &= lookaheads
+            for lookahead in alt_first:
+                key = (rule_cls, lookahead)
+                existing = entries.get(key)
+                if existing is None:
+                    entries[key] = alt
+                elif existing != alt:
+                    self.__conflicts.append((rule_cls, lookahead, existing, alt))
+            if alt_nullable:
+                nullable_alts.append(alt)
+        for alt in nullable_alts:
+            for lookahead in follow:
+                key = (rule_cls, lookahead)
+                existing = entries.get(key)
+                if existing is None:
+                    entries[key] = alt
+                elif existing != alt and not self.__accepts_all(rule_cls, lookahead, existing, alt):
+                    self.__conflicts.append((rule_cls, lookahead, existing, alt))
+
+    def __add_lookahead(self, c):
+        """
+        Add a character to the alphabet and fill in its entries. FIRST and
+        FOLLOW only change for the character, unless probing it finds rules
+        or alternatives the table has not collected yet, or LookaheadChoices
+        would have to be rebuilt. The table is compiled again then.
+        """
+        self.__alphabet.add(c)
+        if self.__k > 1 and self.__conflicts:
+            return self.compile()
+
+        productions = self.__productions
+        first = self.__first
+        follow = self.__follow
+        nullable = self.__nullable
+        probed = {}
+        for rule_cls in self.__probes:
+            rules = rule_cls.get_rules(c)
+            if rules is None:
+                continue
+            alt = tuple(self.canonical(r) for r in rules)
+            if alt not in productions[rule_cls]:
+                # Only the terminal of the character itself can be new. The
+                # rule has to start with its first byte already, which
+                # streams not read as UTF-8 match on their own.
+                if len(alt) != 1 or not is_terminal(alt[0]) or alt[0].string != c:
+                    return self.compile()
+                if len(c) > 1 and (c[0] not in first[rule_cls] or not all(
+                        self.canonical(terminal(b)) in self.__terminals for b in c)):
+                    return self.compile()
+            probed[rule_cls] = alt
+
+        new_terminals = set()
+        for rule_cls, alt in probed.iteritems():
+            chosen_on = self.__chosen_on[rule_cls]
+            if alt not in chosen_on:
+                t = alt[0]
+                if t not in self.__terminals:
+                    self.__terminals.add(t)
+                    new_terminals.add(t)
+                    first[t] = set([c])
+                    follow[t] = set()
+                    self.__occurrences[t] = []
+                    self.__entries[(t, c)] = MATCH
+                productions[rule_cls].append(alt)
+                self.__occurrences[t].append((rule_cls, ()))
+                follow[t] |= follow[rule_cls]
+                chosen_on[alt] = set()
+            chosen_on[alt].add(c)
+            self.__probes[rule_cls][c] = alt
+
+        for t in new_terminals:
+            if len(c) > 1:
+                alt = tuple(self.canonical(terminal(b)) for b in c)
+                productions[t] = [alt]
+                first[t].add(c[0])
+                self.__entries[(t, c[0])] = alt
+                for i, sym in enumerate(alt):
+                    self.__occurrences[sym].append((t, alt[i + 1:]))
+                    follow[sym] |= follow[t] if i + 1 == len(alt) else set([alt[i + 1].string])
+
+        changed = True
+        while changed:
+            changed = False
+            for rule_cls, alts in productions.iteritems():
+                if c in first[rule_cls]:
+                    continue
+                chosen_on = self.__chosen_on.get(rule_cls)
+                for alt in alts:
+                    if chosen_on is not None and c not in chosen_on[alt]:
+                        continue
+                    if c in sequence_first(alt, first, nullable)[0]:
+                        first[rule_cls].add(c)
+                        changed = True
+                        break
+
+        changed = True
+        while changed:
+            changed = False
+            for rule_cls, alts in productions.iteritems():
+                for alt in alts:
+                    in_trailer = c in follow[rule_cls]
+                    for sym in reversed(alt):
+                        if in_trailer and c not in follow[sym]:
+                            follow[sym].add(c)
+                            changed = True
+                        in_trailer = c in first[sym] or (in_trailer and sym in nullable)
+
+        lookaheads = set([c])
+        for rule_cls in productions:
+            self.__fill_rule(rule_cls, lookaheads)
+
+    def __accepts_all(self, rule_cls, lookahead, alt, other):
+        """
+        Whether alt accepts every input starting with the lookahead that
+        other accepts: following both character by character, the stacks of
+        other become a subset of those of alt within MAX_GREEDY_DEPTH
+        characters.
+        """
+        try:
+            pending = [(self.__step(set([alt + (FollowOf(rule_cls),)]), lookahead),
+                        self.__step(set([other + (FollowOf(rule_cls),)]), lookahead), 1)]
+            seen = set()
+            while pending:
+                stacks, other_stacks, depth = pending.pop()
+                if other_stacks <= stacks:
+                    continue
+                if not stacks or depth >= MAX_GREEDY_DEPTH:
+                    return False
+                state = (frozenset(stacks), frozenset(other_stacks))
+                if state in seen:
+                    continue
+                seen.add(state)
+                for c in self.__next_chars(other_stacks):
+                    stepped = self.__step(other_stacks, c)
+                    if stepped:
+                        pending.append((self.__step(stacks, c), stepped, depth + 1))
+        except ProductionRuleError:
+            # Left recursion, where only the conflict can be reported
+            return False
+        return True
+
+    def __next_chars(self, stacks):
+        """Characters the stacks of pending rules can continue with."""
+        chars = set()
+        for stack in stacks:
+            for rule_cls in stack:
+                if rule_cls is ANY:
+                    return self.__alphabet
+                elif isinstance(rule_cls, FollowOf):
+                    chars |= self.__follow[rule_cls.rule_cls]
+                    break
+                chars |= self.__first[rule_cls]
+                if rule_cls not in self.__nullable:
+                    break
+        return chars
+
+    def __resolve(self):
+        """
+        Replace the entries of conflicts with LookaheadChoices. With k = 1
+        conflicts keep the earlier alternative, like get_rules, or the one
+        consuming the lookahead.
+        """
+        if self.__k <= 1:
+            return
+
+        decisions = {}
+        for rule_cls, lookahead, existing, alt in self.__conflicts:
+            alts = decisions.setdefault((rule_cls, lookahead), [existing])
+            if alt not in alts:
+                alts.append(alt)
+
+        needed = 1
+        for key, alts in decisions.iteritems():
+            rule_cls, lookahead = key
+            configs = {}
+            for alt in alts:
+                configs[alt] = self.__step(set([alt + (FollowOf(rule_cls),)]), lookahead)
+            choices, depth = self.__build_choice(rule_cls, lookahead, configs, 1, {})
+            needed = max(needed, depth)
+            self.__entries[key] = LookaheadChoice(self.__k, choices)
+
+        if needed < self.__k:
+            raise ProductionRuleError("Grammar starting at '{}' only needs k={}, not k={}.".format(self.__start.__name__, needed, self.__k))
+
+    def __build_choice(self, rule_cls, lookahead, configs, depth, memo):
+        """
+        Build the lookahead trie below a prefix of depth characters. configs
+        maps every alternative still matching the prefix to the stacks of
+        rules it can continue with. Characters that leave the alternatives in
+        the same state share one subtree. Returns the trie and the number of
+        characters it needs.
+        """
+        configs = dict((alt, stacks) for alt, stacks in configs.iteritems() if stacks)
+        if len(configs) == 1:
+            return configs.keys()[0], depth
+        if depth >= self.__k or all(stacks == set([(ANY,)]) for stacks in configs.itervalues()):
+            raise ProductionRuleError("Alternatives of '{}' starting with '{}' cannot be told apart with k={}.".format(rule_cls.__name__, lookahead, self.__k))
+
+        choices = {}
+        needed = depth
+        for c in self.__alphabet:
+            successors = {}
+            for alt, stacks in configs.iteritems():
+                stepped = self.__step(stacks, c)
+                if stepped:
+                    successors[alt] = frozenset(stepped)
+            if not successors:
+                continue
+            state = (depth, frozenset(successors.iteritems()))
+            if state not in memo:
+                memo[state] = self.__build_choice(rule_cls, lookahead, successors, depth + 1, memo)
+            choices[c], child_depth = memo[state]
+            needed = max(needed, child_depth)
+        return choices, needed
+
+    def __step(self, stacks, c):
+        """Every stack of pending rules left after matching the character c."""
+        results = set()
+        seen = set()
+        pending = list(stacks)
+        while pending:
+            stack = pending.pop()
+            if stack in seen:
+                continue
+            seen.add(stack)
+            if len(stack) > MAX_LOOKAHEAD_STACK:
+                raise ProductionRuleError("Rule '{}' is left recursive.".format(stack[0].__name__))
+
+            head = stack[0]
+            if head is ANY:
+                results.add(stack)
+            elif isinstance(head, FollowOf):
+                # Continue with the rest of every alternative using the rule
+                if head.rule_cls is self.__start and c == EOF:
+                    results.add((ANY,))
+                for parent, rest in self.__occurrences[head.rule_cls]:
+                    pending.append(rest + (FollowOf(parent),) + stack[1:])
+            elif head in self.__terminals:
+                if head.string == c:
+                    results.add(stack[1:])
+                for alt in self.__productions.get(head, ()):
+                    pending.append(alt + stack[1:])
+            elif head in self.__probes:
+                alt = self.__probes[head].get(c)
+                if alt is not None:
+                    pending.append(alt + stack[1:])
+            else:
+                for alt in self.__productions[head]:
+                    pending.append(alt + stack[1:])
+        return results
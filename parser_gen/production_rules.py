@@ -3,8 +3,9 @@
 
 from __future__ import print_function
 
-from stream_handler import *
+from utils import split_chars
 
+import functools
 import string
 import json
 
@@ -16,16 +17,125 @@ class ProductionRuleError(Exception):
     pass
 
 
+# How json() builds the value of a node: a {name: [productions]} object, a
+# list of the productions, the value of its only production, or anything
+# else, which is taken from json() itself.
+JSON_NAMED = "named"
+JSON_LIST = "list"
+JSON_PASS = "pass"
+JSON_VALUE = "value"
+
+# Classes built by the combinators, keyed by their signature.
+_COMBINATORS = {}
+
+
+def signature_of(rule_cls):
+    """
+    Structural identity of a rule class. Classes built by the combinators
+    below share a signature when they were built from the same arguments.
+    Every other class is only equal to itself.
+    """
+    return rule_cls.__dict__.get("signature", rule_cls)
+
+
+def json_shape_of(rule_cls):
+    """
+    JSON shape declared next to the json() method a rule class uses. A class
+    overriding json() without declaring a json_shape has a JSON_VALUE shape.
+    """
+    for cls in rule_cls.__mro__:
+        if "json_shape" in cls.__dict__:
+            return cls.json_shape
+        if "json" in cls.__dict__:
+            return JSON_VALUE
+    return JSON_VALUE
+
+
+def interned(factory):
+    """
+    Return the same class for every call of a combinator with the same
+    arguments instead of defining a new class each time. Arguments are
+    either strings or rule classes which are themselves interned, so
+    structurally equal combinators end up as the same class object.
+    """
+    @functools.wraps(factory)
+    def wrapper(*args):
+        signature = (factory.__name__,) + args
+        rule_cls = _COMBINATORS.get(signature)
+        if rule_cls is None:
+            rule_cls = factory(*args)
+            if "signature" not in rule_cls.__dict__:
+                rule_cls.signature = signature
+            _COMBINATORS[signature] = rule_cls
+        return rule_cls
+    return wrapper
+
+
+class RuleReference(object):
+    """
+    Picklable stand in for a rule class. Classes built by the combinators
+    cannot be pickled by name, so they are rebuilt from their signature in
+    the process loading them. One reference is kept per class, so a pickle
+    of a parse tree resolves every class once.
+    """
+    __references = {}
+
+    def __init__(self, rule_cls):
+        self.__rule_cls = rule_cls
+
+    @classmethod
+    def of(cls, rule_cls):
+        reference = cls.__references.get(rule_cls)
+        if reference is None:
+            reference = cls.__references[rule_cls] = cls(rule_cls)
+        return reference
+
+    def __reduce__(self):
+        signature = signature_of(self.__rule_cls)
+        if not isinstance(signature, tuple):
+            return (_identity, (self.__rule_cls,))
+        args = tuple(RuleReference.of(a) if isinstance(a, type) else a for a in signature[1:])
+        return (_build_combinator, (signature[0],) + args)
+
+
+def _identity(rule_cls):
+    return rule_cls
+
+
+def _build_combinator(name, *args):
+    return globals()[name](*args)
+
+
+def _restore_rule(rule_cls, productions):
+    rule = rule_cls.__new__(rule_cls)
+    rule.apply_rules(productions)
+    return rule
+
+
 class ProductionRule(object):
+    json_shape = JSON_NAMED
+
     def __init__(self, productions=None):
         self.__productions = productions or []
 
+    def __reduce__(self):
+        return (_restore_rule, (RuleReference.of(type(self)), self.__productions))
+
     def productions(self):
         return self.__productions
 
     def apply_rules(self, rules):
         self.__productions = rules
 
+    def expand(self, rule_classes):
+        """
+        Instantiate the rules returned by get_rules as the productions of
+        this node and return the nodes the parser still has to match.
+        """
+        rules = tuple(r() for r in rule_classes)
+        self.apply_rules(rules)
+        return rules
+
     def __str__(self):
         return "".join(map(str, self.__productions))
 
@@ -43,6 +153,14 @@ class ProductionRule(object):
     def get_rules(cls, *lookaheads):
         raise NotImplementedError
 
+    @classmethod
+    def alternatives(cls):
+        """
+        Every production this rule can expand to as a list of tuples of rule
+        classes, or None if the rule can only be queried through get_rules.
+        """
+        return None
+
 
 """
 Builtins
@@ -54,36 +172,170 @@ class StringRule(ProductionRule):
         return "".join(p.json() for p in self.productions())
 
 
-def terminal(s):
-    class TerminalStringRule(StringRule):
-        @classmethod
-        def get_rules(cls, *lookaheads):
-            expected = "" if not s else s[0]
-            if lookaheads[0] == expected:
-                return map(terminal, s)
-            else:
-                return None
+class TerminalRule(StringRule):
+    """
+    Rule for a fixed string. Single characters are matched directly. Streams
+    not read as UTF-8 match the characters of several bytes a byte at a time.
+    """
+    string = ""
+    chars = ()
 
-        def json(self):
-            return s
+    @classmethod
+    def matches(cls, *lookaheads):
+        if not cls.chars:
+            return lookaheads[0] == ""
+        first = cls.chars[0]
+        return lookaheads[0] == first or (len(first) > 1 and lookaheads[0] == first[0])
 
-        def __str__(self):
-            return s
+    @classmethod
+    def get_rules(cls, *lookaheads):
+        if not cls.matches(*lookaheads):
+            return None
+        if len(cls.chars) == 1 and lookaheads[0] != cls.string:
+            return map(terminal, cls.string)
+        return map(terminal, cls.chars)
 
-        def __eq__(self, other):
-            return s == other
+    @classmethod
+    def alternatives(cls):
+        if len(cls.chars) == 1 and len(cls.string) > 1:
+            return [(cls,), tuple(map(terminal, cls.string))]
+        return [tuple(map(terminal, cls.chars))]
+
+    def json(self):
+        return self.string
+
+    def __str__(self):
+        return self.string
+
+    def __eq__(self, other):
+        return self.string == other
+
+
+@interned
+def terminal(s):
+    class TerminalStringRule(TerminalRule):
+        string = s
+        chars = tuple(split_chars(s))
 
     return TerminalStringRule
 
 
-class AnyCharacter(StringRule):
+class CharacterClassRule(StringRule):
+    """
+    Rule for a single character out of a precomputed set of characters, or
+    out of every character but those when negated. Streams not read as UTF-8
+    match the characters of several bytes a byte at a time, starting from
+    the rest of the characters with the same first byte in leads.
+    """
+    chars = frozenset()
+    negated = False
+    leads = {}
+
+    @classmethod
+    def contains(cls, c):
+        return bool(c) and (c in cls.chars) is not cls.negated
+
+    @classmethod
+    def matches(cls, *lookaheads):
+        return cls.contains(lookaheads[0]) or (not cls.negated and lookaheads[0] in cls.leads)
+
     @classmethod
     def get_rules(cls, *lookaheads):
-        return [terminal(lookaheads[0])] if lookaheads[0] else None
+        c = lookaheads[0]
+        if cls.contains(c):
+            return [terminal(c)]
+        rests = None if cls.negated else cls.leads.get(c)
+        if rests is None:
+            return None
+        elif len(rests) == 1:
+            return [terminal(c + rests[0])]
+        return [terminal(c), character_class(rests)]
+
+
+@interned
+def _character_class(chars, negated):
+    class CharacterClass(CharacterClassRule):
+        pass
+
+    CharacterClass.chars = chars
+    CharacterClass.negated = negated
+    CharacterClass.leads = {}
+    for c in sorted(chars):
+        if isinstance(c, str) and len(c) > 1:
+            CharacterClass.leads.setdefault(c[0], []).append(c[1:])
+    return CharacterClass
+
+
+def character_class(chars, negated=False):
+    """Rule for one of the characters in chars, or any other one if negated."""
+    return _character_class(frozenset(chars), bool(negated))
+
+
+def character_range(first, last):
+    """Rule for a character between first and last inclusive."""
+    to_char = unichr if isinstance(first, unicode) else chr
+    return character_class(to_char(i) for i in xrange(ord(first), ord(last) + 1))
+
+
+def as_character_class(rule_cls):
+    """
+    The (chars, negated) pair of a rule matching exactly one character, or
+    None for any other rule.
+    """
+    if issubclass(rule_cls, CharacterClassRule):
+        return rule_cls.chars, rule_cls.negated
+    if issubclass(rule_cls, TerminalRule) and len(rule_cls.chars) == 1:
+        return frozenset(rule_cls.chars), False
+    return None
+
+
+def character_union(*args):
+    """Rule for a character matched by any of the single character rules."""
+    chars, negated = frozenset(), False
+    for other_chars, other_negated in map(as_character_class, args):
+        if not negated and not other_negated:
+            chars = chars | other_chars
+        elif negated and other_negated:
+            chars = chars & other_chars
+        elif negated:
+            chars = chars - other_chars
+        else:
+            chars = other_chars - chars
+        negated = negated or other_negated
+    return character_class(chars, negated)
+
+
+def character_difference(rule_cls, *args):
+    """Rule for a character matched by rule_cls but none of the others."""
+    chars, negated = as_character_class(rule_cls)
+    other_chars, other_negated = as_character_class(character_union(*args))
+    if not negated and not other_negated:
+        return character_class(chars - other_chars)
+    elif not negated:
+        return character_class(chars & other_chars)
+    elif not other_negated:
+        return character_class(chars | other_chars, negated=True)
+    return character_class(other_chars - chars)
+
+
+def negation(rule_cls):
+    """Rule for any character not matched by a single character rule."""
+    chars, negated = as_character_class(rule_cls)
+    return character_class(chars, not negated)
+
+
+class AnyCharacter(character_class((), negated=True)):
+    pass
 
 
+@interned
 def alternation(*args):
+    if all(as_character_class(rule_cls) is not None for rule_cls in args):
+        return character_union(*args)
+
     class MaybeAlternation(ProductionRule):
+        json_shape = JSON_PASS
+
         @classmethod
         def get_rules(cls, *lookaheads):
             for rule_cls in args:
@@ -91,6 +343,10 @@ def alternation(*args):
                     return [rule_cls]
             return None
 
+        @classmethod
+        def alternatives(cls):
+            return [(rule_cls,) for rule_cls in args]
+
         def json(self):
             assert len(self.productions()) == 1
             return self.productions()[0].json()
@@ -98,32 +354,49 @@ def alternation(*args):
     return MaybeAlternation
 
 
+@interned
 def repetition(rule_cls):
     class Repetition(ProductionRule):
+        # Rule matched by every element
+        repeated = rule_cls
+        json_shape = JSON_LIST
+
         @classmethod
         def get_rules(cls, *lookaheads):
             if rule_cls.matches(lookaheads[0]):
-                return [rule_cls, repetition(rule_cls)]
+                return [rule_cls, cls]
             else:
                 return []
 
-        def repeating_rules(self, acc):
-            prods = self.productions()
-            if prods:
-                assert len(self.productions()) == 2
-                acc.append(prods[0].json())
-                prods[1].repeating_rules(acc)
+        @classmethod
+        def alternatives(cls):
+            return [(rule_cls, cls), ()]
+
+        def expand(self, rule_classes):
+            """
+            Append each repeated element to this node and match this node
+            again afterwards, so the elements end up in one flat list.
+            """
+            if not rule_classes:
+                return ()
+            rule = rule_classes[0]()
+            self.productions().append(rule)
+            return (rule, self)
 
         def json(self):
-            repetitions = []
-            self.repeating_rules(repetitions)
-            return repetitions
+            return [p.json() for p in self.productions()]
 
     return Repetition
 
 
+@interned
 def exclusion(rule_cls, *args):
+    if all(as_character_class(r) is not None for r in (rule_cls,) + args):
+        return character_difference(rule_cls, *args)
+
     class Exclusion(ProductionRule):
+        json_shape = JSON_PASS
+
         @classmethod
         def get_rules(cls, *lookaheads):
             if rule_cls.matches(lookaheads[0]):
@@ -142,8 +415,11 @@ def exclusion(rule_cls, *args):
     return Exclusion
 
 
+@interned
 def optional(rule_cls):
     class Optional(ProductionRule):
+        json_shape = JSON_PASS
+
         @classmethod
         def get_rules(cls, *lookaheads):
             if rule_cls.matches(lookaheads[0]):
@@ -151,6 +427,10 @@ def optional(rule_cls):
             else:
                 return []
 
+        @classmethod
+        def alternatives(cls):
+            return [(rule_cls,), ()]
+
         def json(self):
             prods = self.productions()
             if prods:
@@ -160,8 +440,11 @@ def optional(rule_cls):
     return Optional
 
 
+@interned
 def concatenation(*args):
     class Concatentation(ProductionRule):
+        json_shape = JSON_LIST
+
         @classmethod
         def get_rules(cls, *lookaheads):
             if args[0].matches(lookaheads[0]):
@@ -169,44 +452,30 @@ def concatenation(*args):
             else:
                 return None
 
+        @classmethod
+        def alternatives(cls):
+            return [tuple(args)]
+
         def json(self):
             return [p.json() for p in self.productions()]
 
     return Concatentation
 
 
-class Letter(StringRule):
-    @classmethod
-    def get_rules(cls, *lookaheads):
-        if lookaheads[0] and lookaheads[0] in string.ascii_letters:
-            return [terminal(lookaheads[0])]
-        return None
+class Letter(character_class(string.ascii_letters)):
+    pass
 
 
-class Digit(StringRule):
-    @classmethod
-    def get_rules(cls, *lookaheads):
-        if lookaheads[0].isdigit():
-            return [terminal(lookaheads[0])]
-        return None
+class Digit(character_class(string.digits)):
+    pass
 
 
-class Symbol(StringRule):
+class Symbol(character_class("[]{}()<>'\"=|.,;")):
     SYMBOLS = "[]{}()<>'\"=|.,;"
 
-    @classmethod
-    def get_rules(cls, *lookaheads):
-        if lookaheads[0] and lookaheads[0] in cls.SYMBOLS:
-            return [terminal(lookaheads[0])]
-        return None
-
 
-class SingleWhitespace(StringRule):
-    @classmethod
-    def get_rules(cls, *lookaheads):
-        if lookaheads[0].isspace():
-            return [terminal(lookaheads[0])]
-        return None
+class SingleWhitespace(character_class(string.whitespace)):
+    pass
 
 
 class Whitespace(repetition(SingleWhitespace)):
@@ -219,14 +488,21 @@ class Whitespace(repetition(SingleWhitespace)):
 Custom rules provided by grammar
 """
 
+IdentifierCharacter = alternation(Letter, Digit, terminal("_"))
+
+
 class Identifier(ProductionRule):
     @classmethod
     def get_rules(cls, *lookaheads):
         if Letter.matches(lookaheads[0]):
-            return [Letter, repetition(alternation(Letter, Digit, terminal("_")))]
+            return [Letter, repetition(IdentifierCharacter)]
         else:
             return None
 
+    @classmethod
+    def alternatives(cls):
+        return [(Letter, repetition(IdentifierCharacter))]
+
 
 class EscapeCharacter(ProductionRule):
     @classmethod
@@ -236,35 +512,43 @@ class EscapeCharacter(ProductionRule):
         else:
             return None
 
+    @classmethod
+    def alternatives(cls):
+        return [(terminal("\\"), AnyCharacter)]
+
+
+SingleQuotedCharacters = repetition(
+    alternation(
+        exclusion(AnyCharacter, terminal("'"), terminal("\\")),
+        EscapeCharacter
+    )
+)
+
+DoubleQuotedCharacters = repetition(
+    alternation(
+        exclusion(AnyCharacter, terminal('"'), terminal("\\")),
+        EscapeCharacter
+    )
+)
+
 
 class Terminal(ProductionRule):
     @classmethod
     def get_rules(cls, *lookaheads):
         if terminal("'").matches(lookaheads[0]):
-            return [
-                terminal("'"),
-                repetition(
-                    alternation(
-                        exclusion(AnyCharacter, terminal("'"), terminal("\\")),
-                        EscapeCharacter
-                    )
-                ),
-                terminal("'")
-            ]
+            return [terminal("'"), SingleQuotedCharacters, terminal("'")]
         elif terminal('"').matches(lookaheads[0]):
-            return [
-                terminal('"'),
-                repetition(
-                    alternation(
-                        exclusion(AnyCharacter, terminal('"'), terminal("\\")),
-                        EscapeCharacter
-                    )
-                ),
-                terminal('"')
-            ]
+            return [terminal('"'), DoubleQuotedCharacters, terminal('"')]
         else:
             return None
 
+    @classmethod
+    def alternatives(cls):
+        return [
+            (terminal("'"), SingleQuotedCharacters, terminal("'")),
+            (terminal('"'), DoubleQuotedCharacters, terminal('"')),
+        ]
+
 
 class Optional(ProductionRule):
     @classmethod
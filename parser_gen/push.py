@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parse input that arrives in chunks, like data read from a socket or a pipe.
+
+A PushParser runs parse_events over a stream of the characters fed to it so
+far. The parser is only advanced while more characters than its lookahead
+are waiting, so it never reads past the input that has arrived: it suspends
+at the end of every chunk and resumes with the next one. Nothing blocks, so
+feed() can be called from the data callback of any event loop, without a
+thread per connection.
+"""
+
+from driver import build_tree, parse_events
+from parse_table import ParseTable
+from stream_handler import StreamHandler
+from utils import split_chars, utf8_width
+
+import collections
+
+
+# Bytes read at once by parse_reader.
+CHUNK_SIZE = 1 << 16
+
+
+class PushParser(object):
+    """
+    Parser fed with chunks of input. feed() and close() return the events
+    of parse_events the input parsed so far, at character offsets.
+    """
+
+    def __init__(self, starting_rule, k=1, table=None):
+        if table is None:
+            table = ParseTable(starting_rule, k=k)
+        self.__k = table.k()
+        self.__pending = collections.deque()
+        self.__fed = 0
+        # Start of a UTF-8 sequence the next chunk continues
+        self.__tail = ""
+        self.__closed = False
+        self.__done = False
+        self.__stream = StreamHandler.from_iterator(self.__chars())
+        self.__events = parse_events(self.__stream, starting_rule, table=table)
+
+    def done(self):
+        """True once the starting rule matched, or failed to."""
+        return self.__done
+
+    def __chars(self):
+        pending = self.__pending
+        while pending or not self.__closed:
+            yield pending.popleft()
+
+    def feed(self, chunk):
+        if self.__closed:
+            raise ValueError("Cannot feed a closed parser.")
+        if isinstance(chunk, str):
+            chars = split_chars(self.__tail + chunk)
+            self.__tail = ""
+            if chars and len(chars[-1]) < utf8_width(chars[-1][0]):
+                self.__tail = chars.pop()
+        else:
+            chars = list(chunk)
+        self.__pending.extend(chars)
+        self.__fed += len(chars)
+        return self.__run()
+
+    def close(self):
+        """Signal the end of the input and return the remaining events."""
+        if self.__tail:
+            # Truncated UTF-8 sequence, taken as it is
+            self.__pending.append(self.__tail)
+            self.__fed += 1
+            self.__tail = ""
+        self.__closed = True
+        return self.__run()
+
+    def __run(self):
+        events = []
+        stream = self.__stream
+        try:
+            while not self.__done and (self.__closed or self.__fed - stream.pos() > self.__k):
+                event = next(self.__events, None)
+                if event is None:
+                    self.__done = True
+                else:
+                    events.append(event)
+        except Exception:
+            self.__done = True
+            raise
+        return events
+
+
+def parse_chunks(chunks, starting_rule, k=1, table=None):
+    """Parse an iterable of chunks into a tree while they are produced."""
+    parser = PushParser(starting_rule, k=k, table=table)
+
+    def events():
+        for chunk in chunks:
+            for event in parser.feed(chunk):
+                yield event
+        for event in parser.close():
+            yield event
+
+    return build_tree(events())
+
+
+def parse_reader(read, starting_rule, k=1, table=None, size=CHUNK_SIZE):
+    """
+    Parse the data returned by calling read(size) until it returns an empty
+    string, like the read method of a pipe or the recv method of a socket.
+    """
+    return parse_chunks(iter(lambda: read(size), ""), starting_rule, k=k, table=table)
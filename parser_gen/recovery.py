@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+"""
+Panic mode error recovery, to report every syntax error of an input in one
+parse.
+
+Passing a Recovery to table_parse hooks it into the event loop of the
+parser, which then does not raise on a syntax error. The error is recorded
+as a ParseError instead, the input is skipped up to the next synchronizing
+character, and the rules the stack still expected inside the innermost
+open synchronizing rule are dropped. Parsing resumes at the synchronizing
+character if that rule still expects it, as a Rule expects the ";" ending
+it, or after it otherwise. Further errors before any more input is matched
+are caused by the recovery and not recorded.
+
+The rules cut short keep what they matched, and the skipped characters
+become terminals of the synchronizing rule, so the partial tree still
+holds the whole input.
+"""
+
+from production_rules import Rule
+
+
+class Recovery(object):
+    """Synchronizing rules and characters, and the errors recovered from."""
+
+    def __init__(self, rules=(Rule,), chars=";"):
+        self.__rules = tuple(rules)
+        self.__chars = frozenset(chars)
+        self.__errors = []
+
+    def rules(self):
+        return self.__rules
+
+    def chars(self):
+        return self.__chars
+
+    def add(self, error):
+        self.__errors.append(error)
+
+    def errors(self):
+        """ParseErrors in the order they were found."""
+        return self.__errors
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per rule counters of a parse, to find the rules a grammar spends its time in.
+
+Passing a RuleProfile to table_parse makes the parse loop add up for the
+rule on top of the stack at every step: the steps, get_rules calls or table
+lookups, rules pushed on the stack, lookahead peeks and time spent. Without
+a profile, the loop only checks for one, and compiled_parse never does.
+"""
+
+from production_rules import CharacterClassRule, signature_of
+
+import collections
+
+
+RuleStats = collections.namedtuple("RuleStats", ("steps", "lookups", "pushes", "peeks", "seconds"))
+
+
+def rule_name(rule_cls):
+    """Name of a rule class, spelling out combinators by their arguments."""
+    signature = signature_of(rule_cls)
+    if not isinstance(signature, tuple):
+        return rule_cls.__name__
+    if issubclass(rule_cls, CharacterClassRule):
+        chars = repr("".join(sorted(rule_cls.chars)))
+        return "negation(character_class({}))".format(chars) if rule_cls.negated else "character_class({})".format(chars)
+    args = (rule_name(a) if isinstance(a, type) else repr(a) for a in signature[1:])
+    return "{}({})".format(signature[0], ", ".join(args))
+
+
+class RuleProfile(object):
+    def __init__(self):
+        self.__stats = {}
+
+    def add(self, rule_cls, lookups, pushes, peeks, seconds):
+        """Count one parse step with rule_cls on top of the stack."""
+        stats = self.__stats.get(rule_cls)
+        if stats is None:
+            stats = self.__stats[rule_cls] = [0, 0, 0, 0, 0.0]
+        stats[0] += 1
+        stats[1] += lookups
+        stats[2] += pushes
+        stats[3] += peeks
+        stats[4] += seconds
+
+    def stats(self):
+        """RuleStats of every rule class, by class."""
+        return dict((rule_cls, RuleStats(*stats)) for rule_cls, stats in self.__stats.iteritems())
+
+    def report(self, limit=None, width=48):
+        """Table of the rules taking the most time, at most limit of them."""
+        rows = sorted(self.stats().iteritems(), key=lambda item: item[1].seconds, reverse=True)[:limit]
+        total = sum(stats.seconds for stats in self.stats().itervalues()) or 1.0
+
+        lines = ["{:<{w}} {:>9} {:>9} {:>9} {:>9} {:>9} {:>6}".format(
+            "rule", "steps", "lookups", "pushes", "peeks", "seconds", "%", w=width)]
+        for rule_cls, stats in rows:
+            name = rule_name(rule_cls)
+            if len(name) > width:
+                name = name[:width - 3] + "..."
+            lines.append("{:<{w}} {:>9} {:>9} {:>9} {:>9} {:>9.4f} {:>6.1%}".format(
+                name, stats.steps, stats.lookups, stats.pushes, stats.peeks, stats.seconds,
+                stats.seconds / total, w=width))
+        return "\n".join(lines)
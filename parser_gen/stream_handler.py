@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
-from utils import SlotDefinedClass, char_generator
-from iterator_tools import ExtendedIterator, all_iterator_partitions, copy_iterator, sum_to_n
+from utils import SlotDefinedClass, char_generator, char_len
+from iterator_tools import ExtendedIterator, BufferIterator, copy_iterator
 
 import itertools
 import copy
+import mmap
 
 
 class StreamHandler(object):
@@ -18,12 +19,45 @@ class StreamHandler(object):
         self.__char = starting_char
 
     @classmethod
-    def from_str(cls, s):
-        return cls(ExtendedIterator(iter(s)))
+    def from_str(cls, s, utf8=False):
+        """
+        Handler over a string. With utf8 set, a byte string is read as whole
+        UTF-8 sequences like the files of from_filename, instead of bytes.
+        """
+        return cls(BufferIterator(s, utf8=utf8 and isinstance(s, str)))
 
     @classmethod
     def from_filename(cls, filename):
-        return cls(ExtendedIterator(char_generator(filename)))
+        """
+        Handler over a memory map of a UTF-8 file. The parser indexes the
+        mapped bytes directly, so the file is never copied into memory. The
+        map stays open until the handler is closed, which a with block over
+        the handler does once it ends.
+        """
+        with open(filename, "rb") as f:
+            try:
+                buff = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                buff = ""
+        return cls(BufferIterator(buff, utf8=True))
+
+    @classmethod
+    def from_iterator(cls, char_iter):
+        """Handler for a stream that can only be iterated, like a generator."""
+        return cls(ExtendedIterator(char_iter))
+
+    def close(self):
+        """Release the buffer of the stream if it holds a memory map."""
+        char_iter = self.__char_iter
+        if isinstance(char_iter, BufferIterator) and isinstance(char_iter.buffer(), mmap.mmap):
+            char_iter.buffer().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def char(self):
         return self.__char
@@ -51,9 +85,48 @@ class StreamHandler(object):
         self.__pop_without_increment()
 
     def advance(self, n):
+        if n > 0 and isinstance(self.__char_iter, BufferIterator):
+            self.__skip(n)
+            return
         for i in xrange(n):
             self.pop_char()
 
+    def __skip(self, n):
+        """Advance a buffer backed stream by n characters at once."""
+        char_iter = self.__char_iter
+        start = char_iter.count()
+        char_iter.skip(n - 1)
+        end = char_iter.count()
+        char_iter.seek(start)
+        item = char_iter.item_at(end)
+        if item:
+            self.advance_to(end + len(item))
+        else:
+            # The stream ends before the nth character
+            self.advance_to(end)
+            self.pop_char()
+
+    def advance_to(self, offset):
+        """
+        Advance a buffer backed stream to an offset of its buffer, computing
+        the new line and column from the offsets of the skipped newlines.
+        """
+        char_iter = self.__char_iter
+        start = char_iter.count()
+        if offset <= start:
+            return
+        last = char_iter.item_before(offset)
+        skipped = self.__char + char_iter.buffer()[start:last]
+        length = char_len if char_iter.utf8() else len
+        newlines = skipped.count("\n")
+        if newlines:
+            self.__line_no += newlines
+            self.__col_no = length(skipped[skipped.rfind("\n"):])
+        else:
+            self.__col_no += length(skipped)
+        char_iter.seek(last)
+        self.__pop_without_increment()
+
     def __deepcopy__(self, memo):
         """
         Create a copy of the handler such that advancing this iterator
@@ -93,30 +166,57 @@ class StreamHandler(object):
     def __nonzero__(self):
         return bool(self.__char_iter)
 
-    def partitions(self, partitions):
-        n = partitions-1
-        if n <= 0:
-            yield [copy.deepcopy(self)]
-            return
-        while True:
-            for sizes in sum_to_n(n, size=partitions-1):
-                parts = [copy.deepcopy(self)]
-                end = 0
-                for size in sizes:
-                    end += size
-                    parts[-1].char_iter().set_end(end)
-                    part = copy.deepcopy(parts[-1])
-                    part.char_iter().set_end(self.__char_iter.end())
-                    part.advance(size)
-                    parts.append(part)
-                if not all(parts):
-                    return
-                yield parts
-            n += 1
+    def view(self, start, end):
+        """
+        Handler over the offsets start to end of a buffer backed stream,
+        sharing the buffer of this one.
+        """
+        handler = copy.deepcopy(self)
+        handler.advance_to(start)
+        handler.char_iter().set_end(end)
+        return handler
+
+    def buffered(self):
+        """
+        This handler if it is buffer backed, or else a handler over a buffer
+        holding the rest of the stream.
+        """
+        if isinstance(self.__char_iter, BufferIterator):
+            return self
+        return StreamHandler(BufferIterator("".join(copy.deepcopy(self.__char_iter))),
+                             line_no=self.__line_no,
+                             col_no=self.__col_no,
+                             starting_char=self.__char)
+
+    def offset_partitions(self, partitions, limit=None):
+        """
+        Lazily generate every split of the rest of a buffer backed stream
+        into non empty (start, end) ranges of offsets, at most limit of them
+        if given.
+        """
+        return self.__char_iter.partitions(partitions, limit=limit)
+
+    def partitions(self, partitions, limit=None):
+        """
+        Lazily generate every split of the rest of the stream into non empty
+        handlers, at most limit of them if given. The handlers are views over
+        one buffer.
+        """
+        handler = self.buffered()
+        for ranges in handler.offset_partitions(partitions, limit=limit):
+            yield [handler.view(start, end) for start, end in ranges]
 
     def pos(self):
         return self.__char_iter.count()
 
+    def next_line_col(self):
+        """Line and column of the next character, without peeking at it."""
+        if not self.__char:
+            return self.__line_no, self.__col_no
+        elif self.__char == "\n":
+            return self.__line_no + 1, 1
+        return self.__line_no, self.__col_no + 1
+
     def peek_n(self, n):
         return self.__char_iter.peek(n)
 
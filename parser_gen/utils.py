@@ -1,7 +1,6 @@
 #-*- coding: utf-8 -*-
 
 import string
-import logging
 import sys
 
 
@@ -12,8 +11,48 @@ def char_generator(filename):
                 yield c
 
 
+def utf8_width(lead):
+    """Number of bytes in the UTF-8 sequence starting with the byte lead."""
+    o = ord(lead)
+    if o < 0xc0:
+        # ASCII, or a stray continuation byte taken on its own
+        return 1
+    elif o < 0xe0:
+        return 2
+    elif o < 0xf0:
+        return 3
+    return 4
+
+
+def split_chars(s):
+    """
+    Split a string into characters. Byte strings are split into UTF-8
+    sequences so they line up with the characters of a UTF-8 stream.
+    """
+    if not isinstance(s, str):
+        return list(s)
+    chars = []
+    i = 0
+    while i < len(s):
+        width = utf8_width(s[i])
+        chars.append(s[i:i+width])
+        i += width
+    return chars
+
+
+def char_len(s):
+    """Number of characters in a string, counting UTF-8 sequences once."""
+    if isinstance(s, str):
+        try:
+            return len(s.decode("utf-8"))
+        except UnicodeDecodeError:
+            return len(split_chars(s))
+    return len(s)
+
+
 def base_parse_args(parser, name=None):
     """Add various arguments for more verbosity."""
+    import logging
 
     # Logging/debugging
     parser.add_argument("-v", "--verbose", action="count", default=0,
@@ -3,10 +3,16 @@
 
 from __future__ import print_function
 
-from parser_gen.production_rules import Grammar
-from parser_gen.parse import table_parse
+from parser_gen.production_rules import Grammar, K, ProductionRuleError
+from parser_gen.driver import table_parse
+from parser_gen.parse_table import ParseTable
 from parser_gen.utils import base_parse_args
 from parser_gen.stream_handler import StreamHandler
+from parser_gen.ebnf import find_rule, grammar_rules
+from parser_gen.lexer import GRAMMAR_LEXER
+from parser_gen.json_writer import dump_json
+
+import sys
 
 
 def get_args():
@@ -14,20 +20,109 @@ def get_args():
     parser = ArgumentParser(description="Create a parser for an ebnf grammar.")
 
     parser.add_argument("grammar", help="File containing ebnf grammar.")
+    parser.add_argument("-p", "--parser",
+                        help="Write a standalone parser module for the "
+                        "grammar to this file instead of printing the "
+                        "parsed grammar.")
+    parser.add_argument("-s", "--start",
+                        help="Rule the generated parser starts from. "
+                        "Defaults to the first rule of the grammar.")
+    parser.add_argument("-k", type=int, default=K,
+                        help="Characters of lookahead for the generated "
+                        "parser. Defaults to %(default)s.")
+    parser.add_argument("-l", "--lex", action="store_true",
+                        help="Scan identifiers, terminals and whitespace of "
+                        "the grammar as whole tokens, which are printed as "
+                        "single strings.")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="Parse the rules of the grammar in this many "
+                        "processes.")
+    parser.add_argument("-o", "--output",
+                        help="Write the parsed grammar as JSON to this file "
+                        "instead of printing it.")
+    parser.add_argument("-c", "--compact", action="store_true",
+                        help="Leave the spaces out of the JSON.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print the steps, lookups, pushes, peeks and "
+                        "time of every rule while parsing the grammar to "
+                        "stderr. Parses in this process even with --jobs.")
+    parser.add_argument("--recover", action="store_true",
+                        help="Keep parsing after syntax errors, resyncing at "
+                        "the ';' ending each rule. Every error is printed to "
+                        "stderr and the partial grammar is still output. "
+                        "Parses in this process even with --jobs.")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="Keep compiled grammars in this directory, so "
+                        "--parser only parses a grammar the first time it "
+                        "is given.")
 
     return base_parse_args(parser, __name__)
 
 
+def write_parser(grammar, args):
+    from parser_gen.codegen import generate_parser
+    start = find_rule(grammar_rules(grammar), args.start)
+    # Nothing is written if the grammar has conflicts
+    source = generate_parser(start, k=args.k)
+    with open(args.parser, "w") as f:
+        f.write(source)
+
+
 def main():
     args = get_args()
+    try:
+        return create_parser(args)
+    except ProductionRuleError as e:
+        print("{}: {}".format(args.grammar, e), file=sys.stderr)
+        return 1
+
 
+def create_parser(args):
     filename = args.grammar
-    grammar = table_parse(StreamHandler.from_filename(filename), Grammar)
-    print(grammar.json())
+    if args.parser and args.cache:
+        from parser_gen.grammar_cache import compile_grammar
+        compiled = compile_grammar(filename, start=args.start, k=args.k, cache_dir=args.cache)
+        with open(args.parser, "w") as f:
+            f.write(compiled.source())
+        return 0
 
-    return 0
+    if args.jobs and not args.profile and not args.recover:
+        from parser_gen.parallel import parallel_parse
+        with open(filename, "rb") as f:
+            grammar = parallel_parse(f.read(), processes=args.jobs, lex=args.lex, utf8=True)
+    else:
+        table = ParseTable(Grammar)
+        lexer = GRAMMAR_LEXER if args.lex else None
+        profile = None
+        if args.profile:
+            from parser_gen.rule_profile import RuleProfile
+            profile = RuleProfile()
+        recovery = None
+        if args.recover:
+            from parser_gen.recovery import Recovery
+            recovery = Recovery()
+        with StreamHandler.from_filename(filename) as stream:
+            grammar = table_parse(stream, Grammar, table=table, lexer=lexer, profile=profile, recovery=recovery)
+        if profile is not None:
+            print(profile.report(), file=sys.stderr)
+        if recovery is not None and recovery.errors():
+            for error in recovery.errors():
+                print("{}: {}".format(filename, error), file=sys.stderr)
+            if args.parser:
+                # No parser for a broken grammar
+                return 1
 
+    if args.parser:
+        write_parser(grammar, args)
+    elif args.output:
+        with open(args.output, "w") as f:
+            dump_json(grammar, f, compact=args.compact)
+    else:
+        dump_json(grammar, sys.stdout, compact=args.compact)
+        print()
+
+    return 1 if args.recover and recovery.errors() else 0
 
-if __name__ == "__main__":
-    main()
 
+if __name__ == "__main__":
+    sys.exit(main())
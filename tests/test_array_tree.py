@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.array_tree import *
+from parser_gen.lexer import GRAMMAR_LEXER, Lexeme
+
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar2.txt"
+
+
+class TestArrayTree(unittest.TestCase):
+    def setUp(self):
+        with open(TEST_GRAMMAR, "r") as f:
+            self.__text = f.read()
+
+    def test_same_parse(self):
+        for lexer in (None, GRAMMAR_LEXER):
+            root = array_parse(StreamHandler.from_str(self.__text), Grammar, lexer=lexer)
+            expected = table_parse(StreamHandler.from_str(self.__text), Grammar, lexer=lexer)
+            self.assertEqual(root.json(), expected.json())
+            self.assertEqual(str(root), self.__text)
+
+    def test_columns(self):
+        root = array_parse(StreamHandler.from_str("ab = 'c' ;\n"), Rule)
+        self.assertIs(root.rule(), Rule)
+        self.assertEqual((root.start(), root.end()), (0, 11))
+
+        children = list(root.children())
+        self.assertEqual(map(str, children), ["ab", " ", " ", "'c' ", "", "\n"])
+        # Characters matched by the rule itself are terminals between its children
+        productions = root.productions()
+        self.assertEqual(map(str, productions), ["ab", " ", "=", " ", "'c' ", "", ";", "\n"])
+        self.assertIsInstance(productions[2], TerminalRule)
+        self.assertIs(productions[3].tree(), root.tree())
+
+        identifier = children[0]
+        self.assertEqual(identifier.json(), {"Identifier": ["a", ["b"]]})
+        # The repetition holds its elements as children
+        repetition = list(identifier.children())[1]
+        self.assertEqual(map(str, repetition.children()), ["b"])
+        self.assertLessEqual(root.tree().nbytes(), len(root.tree()) * 40)
+
+    def test_lexeme(self):
+        root = array_parse(StreamHandler.from_str("ab = 'c' ;"), Rule, lexer=GRAMMAR_LEXER)
+        identifier = list(root.children())[0]
+        lexeme = list(identifier.children())[0]
+        self.assertIs(lexeme.rule(), Lexeme)
+        self.assertEqual(str(lexeme), "ab")
+        self.assertEqual(identifier.json(), {"Identifier": ["ab"]})
+
+    def test_errors(self):
+        self.assertRaises(RuntimeError, array_parse, StreamHandler.from_str("a = ! ;"), Rule)
+        self.assertRaises(ValueError, array_parse, StreamHandler.from_iterator(iter("a = b ;")), Rule)
+
+
+if __name__ == "__main__":
+    unittest.main()
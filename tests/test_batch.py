@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.parse_table import ParseTable
+from parser_gen.batch import *
+
+import unittest
+
+
+SNIPPETS = [
+    "a = b;",
+    "rule = 'x' | rule , \"y\" ;\n",
+    "c = [d] - {e | (f)};",
+    "g = 'caf\xc3\xa9';",
+    "a = ;",
+    "h = i;",
+    "",
+]
+
+
+def expected_results(texts, table):
+    results = []
+    for text in texts:
+        try:
+            results.append((compiled_parse(StreamHandler.from_str(text), table).json(), None))
+        except RuntimeError as e:
+            results.append((None, str(e)))
+    return results
+
+
+def result_values(results):
+    return [(tree.json() if tree is not None else None, str(error) if error is not None else None)
+            for tree, error in results]
+
+
+class TestBatch(unittest.TestCase):
+    def test_same_parse(self):
+        table = ParseTable(Rule)
+        parser = BatchParser(Rule, table=table)
+        for text in SNIPPETS[:4] + SNIPPETS[5:6]:
+            prod = parser.parse(text)
+            self.assertIsInstance(prod, Rule)
+            self.assertEqual(text, str(prod))
+            self.assertEqual(compiled_parse(StreamHandler.from_str(text), table).json(), prod.json())
+
+    def test_lookahead(self):
+        rule = alternation(concatenation(terminal("a"), terminal("b")), concatenation(terminal("a"), terminal("c")))
+        parser = BatchParser(rule, k=2)
+        for text in ("ab", "ac"):
+            self.assertEqual(table_parse(StreamHandler.from_str(text), rule, k=2).json(), parser.parse(text).json())
+
+    def test_errors(self):
+        table = ParseTable(Rule)
+        parser = BatchParser(Rule, table=table)
+        self.assertRaises(RuntimeError, parser.parse, "a = ;")
+        results = parse_many(SNIPPETS, Rule, table=table)
+        self.assertEqual(expected_results(SNIPPETS, table), result_values(results))
+        self.assertIsNotNone(results[4][1])
+        self.assertIsNone(results[5][1])
+
+    def test_table(self):
+        self.assertRaises(ValueError, BatchParser, Grammar, table=ParseTable(Rule))
+
+    def test_processes(self):
+        table = ParseTable(Rule)
+        texts = SNIPPETS * 5
+        results = parse_many(texts, Rule, table=table, processes=2, batch_size=3)
+        self.assertEqual(expected_results(texts, table), result_values(results))
+
+    def test_package(self):
+        import parser_gen
+        results = parser_gen.parse_many(["a = b;", "c = d; e = f;"])
+        self.assertEqual(["a = b;", "c = d; e = f;"], [str(tree) for tree, error in results])
+        self.assertIsInstance(results[0][0], Grammar)
+
+
+if __name__ == "__main__":
+    unittest.main()
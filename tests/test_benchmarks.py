@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from benchmarks.grammars import GRAMMARS
+from benchmarks.run import BENCHMARKS, regressions, run_benchmarks
+
+import unittest
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_grammars(self):
+        for name, generate in GRAMMARS:
+            text = generate(3)
+            prod = table_parse(StreamHandler.from_str(text), Grammar)
+            self.assertEqual(str(prod), text)
+            self.assertEqual(len(prod.productions()), 3)
+
+    def test_run(self):
+        results = run_benchmarks(["table_parse.many_rules", "ExtendedIterator.peek"], scale=0.01, repeat=1)
+        self.assertEqual(results.keys(), ["table_parse.many_rules", "ExtendedIterator.peek"])
+        for result in results.values():
+            self.assertGreater(result["chars_per_sec"], 0)
+            self.assertGreaterEqual(result["peak_kb"], 0)
+        self.assertIn("from_filename", BENCHMARKS)
+        self.assertIn("IncrementalParse.edit", BENCHMARKS)
+
+    def test_regressions(self):
+        baseline = {"a": {"chars_per_sec": 100.0}, "b": {"chars_per_sec": 100.0}}
+        results = {"a": {"chars_per_sec": 85.0}, "b": {"chars_per_sec": 75.0}, "c": {"chars_per_sec": 1.0}}
+        self.assertEqual(regressions(results, baseline, 0.2), ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.ebnf import load_grammar
+from parser_gen.codegen import *
+
+import imp
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar.txt"
+TEST_GRAMMAR2 = "ebnf_grammar2.txt"
+
+
+def load_module(source):
+    module = imp.new_module("generated_parser")
+    exec source in module.__dict__
+    return module
+
+
+class TestCodegen(unittest.TestCase):
+    def __test_same_parse(self, module, s, rule_cls):
+        # Generated parsers read byte strings as UTF-8
+        expected = table_parse(StreamHandler.from_str(s, utf8=True), rule_cls)
+        prod = module.parse(s)
+        self.assertEqual(s, str(prod))
+        self.assertEqual(expected.json(), prod.json())
+
+    def test_meta_grammar(self):
+        module = load_module(generate_parser(Grammar))
+        self.assertNotIn("parser_gen", module.__dict__)
+        with open(TEST_GRAMMAR, "r") as f:
+            self.__test_same_parse(module, f.read(), Grammar)
+        self.__test_same_parse(module, "a = 'caf\xc3\xa9' - \"\\\\\";", Grammar)
+        self.assertRaises(module.ParseError, module.parse, "a = b")
+
+    def test_grammar_file(self):
+        rules = load_grammar(TEST_GRAMMAR2)
+        module = load_module(generate_parser(rules[0]))
+        self.__test_same_parse(module, "grammar = {rule};\nrule = identifier, [x] | ('y');\n", rules[0])
+
+    def test_lookahead(self):
+        rule_cls = repetition(alternation(terminal("ab"), terminal("ac"), terminal("b")))
+        module = load_module(generate_parser(rule_cls, k=2))
+        self.assertEqual(module.parse("acbab").json(), ["ac", "b", "ab"])
+        self.assertRaises(module.ParseError, module.parse, "ad")
+
+    def test_conflicts(self):
+        rule_cls = alternation(terminal("ab"), terminal("ac"))
+        self.assertRaises(ProductionRuleError, generate_parser, rule_cls)
+        module = load_module(generate_parser(rule_cls, k=2))
+        self.assertEqual(module.parse("ac").json(), "ac")
+
+        # Left recursive rules of the grammar file conflict with k=1
+        rules = dict((r.__name__, r) for r in load_grammar(TEST_GRAMMAR))
+        with self.assertRaises(ProductionRuleError) as caught:
+            generate_parser(rules["grammar"])
+        self.assertIn("not LL(1)", str(caught.exception))
+
+    def test_byte_conflicts(self):
+        # Only streams of bytes see the common first byte of \xc3\xa9 and \xc3\xa8
+        rule_cls = alternation(terminal("\xc3\xa9a"), terminal("\xc3\xa8b"))
+        module = load_module(generate_parser(rule_cls))
+        self.assertEqual(module.parse("\xc3\xa8b").json(), "\xc3\xa8b")
+
+    def test_nullable_conflicts(self):
+        # Taking the optional "ab" on "a" would reject "ac"
+        rule_cls = concatenation(optional(concatenation(terminal("a"), terminal("b"))), terminal("a"), terminal("c"))
+        with self.assertRaises(ProductionRuleError) as caught:
+            generate_parser(rule_cls)
+        self.assertIn("alternative 1 (Concatentation) or 2 ()", str(caught.exception))
+        module = load_module(generate_parser(rule_cls, k=2))
+        self.assertEqual(module.parse("ac").json(), [None, "a", "c"])
+        self.assertEqual(module.parse("abac").json(), [["a", "b"], "a", "c"])
+
+    def test_reproducible(self):
+        self.assertEqual(generate_parser(Grammar), generate_parser(Grammar))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.earley import *
+from parser_gen.ebnf import *
+
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar2.txt"
+LEFT_RECURSIVE_GRAMMAR = "ebnf_grammar.txt"
+
+
+class TestEarley(unittest.TestCase):
+    def __rules(self, s):
+        grammar = table_parse(StreamHandler.from_str(s), Grammar)
+        return dict((r.__name__, r) for r in grammar_rules(grammar))
+
+    def test_same_parse(self):
+        rules = self.__rules(
+            'a = "x" , { b | c } , [ "?" ] ;\n'
+            'b = \'y\' - "z" ;\n'
+            'c = ( digit | "\\n" ) ;\n'
+        )
+        for s in ("xy1\ny?", "x", "x?"):
+            forest = earley_parse(StreamHandler.from_str(s), rules["a"])
+            self.assertFalse(forest.is_ambiguous())
+            self.assertEqual(forest.tree().json(), table_parse(StreamHandler.from_str(s), rules["a"]).json())
+
+    def test_grammar(self):
+        with StreamHandler.from_filename(TEST_GRAMMAR) as stream:
+            forest = earley_parse(stream, Grammar)
+        with open(TEST_GRAMMAR, "r") as f:
+            text = f.read()
+        self.assertEqual(str(forest.tree()), text)
+        self.assertEqual((forest.start(), forest.end()), (0, len(text)))
+        self.assertEqual(stream.pos(), len(text))
+
+    def test_greedy_tree(self):
+        """On ambiguous forests the tree is the one of the LL parser."""
+        texts = ["a = b ;\n", "a = { b } , [ c ] | d - e ;"]
+        for filename in (TEST_GRAMMAR, LEFT_RECURSIVE_GRAMMAR):
+            with open(filename, "r") as f:
+                texts.append(f.read())
+        for s in texts:
+            forest = earley_parse(StreamHandler.from_str(s), Grammar)
+            self.assertTrue(forest.is_ambiguous())
+            self.assertEqual(forest.tree().json(), table_parse(StreamHandler.from_str(s), Grammar).json())
+
+    def test_left_recursion(self):
+        rules = dict((r.__name__, r) for r in load_grammar(LEFT_RECURSIVE_GRAMMAR))
+        forest = earley_parse(StreamHandler.from_str("a|b,c"), rules["rhs"])
+        self.assertTrue(forest.is_ambiguous())
+        self.assertEqual(str(forest.tree()), "a|b,c")
+        # The longest leftmost child is (a|b)
+        concatenation = forest.tree().productions()[0].productions()[0]
+        self.assertEqual(map(str, concatenation.productions()), ["a|b", ",", "c"])
+        # a|(b,c) and (a|b),c share the nodes of a, b and c
+        spans = [(n.start(), n.end()) for n in forest.nodes() if n.label() is rules["identifier"]]
+        self.assertEqual(sorted(spans), [(0, 1), (2, 3), (4, 5)])
+
+        forest = earley_parse(StreamHandler.from_str("{a|b}"), rules["rhs"])
+        self.assertFalse(forest.is_ambiguous())
+        self.assertEqual(forest.tree().json(), {"rhs": [["{", {"rhs": [[
+            {"rhs": [{"identifier": [[{"letter": ["a"]}, []]]}]}, "|",
+            {"rhs": [{"identifier": [[{"letter": ["b"]}, []]]}]}
+        ]]}, "}"]]})
+
+    def test_cycle(self):
+        rules = self.__rules('a = a | "x" ;')
+        forest = earley_parse(StreamHandler.from_str("x"), rules["a"])
+        self.assertTrue(forest.is_ambiguous())
+        self.assertEqual(str(forest.tree()), "x")
+
+    def test_errors(self):
+        rules = dict((r.__name__, r) for r in load_grammar(LEFT_RECURSIVE_GRAMMAR))
+        with self.assertRaisesRegexp(RuntimeError, "Unable to handle token '|' for rule 'rhs' at position 2."):
+            earley_parse(StreamHandler.from_str("a||b"), rules["rhs"])
+        # The whole input has to match
+        self.assertRaises(RuntimeError, earley_parse, StreamHandler.from_str("a|"), rules["rhs"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.ebnf import *
+
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar2.txt"
+
+
+class TestEbnf(unittest.TestCase):
+    def __rules(self, s):
+        grammar = table_parse(StreamHandler.from_str(s), Grammar)
+        return dict((r.__name__, r) for r in grammar_rules(grammar))
+
+    def __make_prod(self, s, rule_cls):
+        return table_parse(StreamHandler.from_str(s), rule_cls)
+
+    def test_combinators(self):
+        rules = self.__rules(
+            'a = "x" , { b | c } , [ "?" ] ;\n'
+            'b = \'y\' - "z" ;\n'
+            'c = ( digit | "\\n" ) ;\n'
+        )
+        self.assertIs(rules["b"].body, exclusion(terminal("y"), terminal("z")))
+        self.assertIs(rules["c"].body, alternation(Digit, terminal("\n")))
+        self.assertIs(rules["a"].body, concatenation(
+            terminal("x"),
+            repetition(alternation(rules["b"], rules["c"])),
+            optional(terminal("?"))
+        ))
+
+        prod = self.__make_prod("xy1\ny?", rules["a"])
+        self.assertEqual(prod.json(), {
+            "a": [["x", [{"b": ["y"]}, {"c": ["1"]}, {"c": ["\n"]}, {"b": ["y"]}], "?"]]
+        })
+
+    def test_forward_references(self):
+        rules = self.__rules("a = b ; b = 'b' ;")
+        self.assertEqual(self.__make_prod("b", rules["a"]).json(), {"a": [{"b": ["b"]}]})
+
+    def test_errors(self):
+        self.assertRaises(ProductionRuleError, self.__rules, "a = b ;")
+        self.assertRaises(ProductionRuleError, self.__rules, "a = 'a' ; a = 'b' ;")
+
+    def test_load_grammar(self):
+        rules = load_grammar(TEST_GRAMMAR)
+        self.assertEqual(rules[0].__name__, "grammar")
+        s = "rule = identifier, whitespace, \"=\";\n"
+        self.assertEqual(s, str(self.__make_prod(s, rules[0])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.ebnf import find_rule, load_grammar
+from parser_gen.grammar_cache import *
+
+import marshal
+import os
+import shutil
+import tempfile
+import unittest
+
+
+TEST_GRAMMAR2 = "ebnf_grammar2.txt"
+
+
+class TestGrammarCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def __cache_files(self):
+        return sorted(os.listdir(self.cache_dir)) if os.path.isdir(self.cache_dir) else []
+
+    def __write_grammar(self, text):
+        filename = os.path.join(self.tmp_dir, "grammar.txt")
+        with open(filename, "w") as f:
+            f.write(text)
+        return filename
+
+    def test_same_parse(self):
+        start = find_rule(load_grammar(TEST_GRAMMAR2))
+        compiled = compile_grammar(TEST_GRAMMAR2, cache_dir=self.cache_dir)
+        for s in ("a = b;", "a = b;\nc = 'd' | [e];"):
+            expected = table_parse(StreamHandler.from_str(s), start)
+            self.assertEqual(expected.json(), compiled.parse(s).json())
+        self.assertRaises(compiled.parse_error(), compiled.parse, "a = b")
+
+    def test_cache_hit(self):
+        compiled = compile_grammar(TEST_GRAMMAR2, cache_dir=self.cache_dir)
+        files = self.__cache_files()
+        self.assertEqual(1, len(files))
+        path = os.path.join(self.cache_dir, files[0])
+        mtime = os.stat(path).st_mtime
+
+        cached = compile_grammar(TEST_GRAMMAR2, cache_dir=self.cache_dir)
+        self.assertEqual(files, self.__cache_files())
+        self.assertEqual(mtime, os.stat(path).st_mtime)
+        self.assertEqual(compiled.source(), cached.source())
+        self.assertEqual(compiled.parse("a = b;").json(), cached.parse("a = b;").json())
+
+    def test_key(self):
+        filename = self.__write_grammar("a = 'b'; c = 'c';")
+        compile_grammar(filename, cache_dir=self.cache_dir)
+        compile_grammar(filename, start="c", cache_dir=self.cache_dir)
+        self.__write_grammar("a = 'c'; c = 'c';")
+        compiled = compile_grammar(filename, cache_dir=self.cache_dir)
+        self.assertEqual(3, len(self.__cache_files()))
+        self.assertEqual("c", str(compiled.parse("c")))
+
+    def test_start(self):
+        filename = self.__write_grammar("a = b, 'c'; b = 'b';")
+        self.assertEqual("b", str(compile_grammar(filename, start="b", cache_dir=self.cache_dir).parse("b")))
+        self.assertRaises(ProductionRuleError, compile_grammar, filename, start="d", cache_dir=self.cache_dir)
+
+    def test_conflicts(self):
+        # Taking the optional "ab" on "a" would reject "ac"
+        filename = self.__write_grammar("a = ['a', 'b'], 'a', 'c';")
+        self.assertRaises(ProductionRuleError, compile_grammar, filename, cache_dir=self.cache_dir)
+        self.assertEqual([], self.__cache_files())
+        self.assertEqual("ac", str(compile_grammar(filename, k=2, cache_dir=self.cache_dir).parse("ac")))
+
+    def test_stale_version(self):
+        filename = self.__write_grammar("a = 'b';")
+        compile_grammar(filename, cache_dir=self.cache_dir)
+        path = os.path.join(self.cache_dir, grammar_key("a = 'b';") + SUFFIX)
+        with open(path, "wb") as f:
+            marshal.dump((MAGIC, FORMAT_VERSION - 1, ""), f)
+        self.assertIsNone(CompiledGrammar.load(path))
+
+        compiled = compile_grammar(filename, cache_dir=self.cache_dir)
+        self.assertEqual("b", str(compiled.parse("b")))
+        self.assertIsNotNone(CompiledGrammar.load(path))
+
+    def test_no_cache(self):
+        compiled = compile_grammar(TEST_GRAMMAR2, cache_dir=None)
+        self.assertEqual([], self.__cache_files())
+        self.assertEqual("a = b;", str(compiled.parse("a = b;")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.production_rules import *
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+
+IMPORT_SCRIPT = """
+import json, sys
+before = set(sys.modules)
+import {module}
+loaded = sorted(m for m in set(sys.modules) - before if sys.modules[m] is not None)
+print(json.dumps(loaded))
+"""
+
+
+def import_in_subprocess(module):
+    """Modules loaded by importing module in a fresh interpreter."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT.format(module=module)], env=env)
+    return json.loads(output)
+
+
+class TestImports(unittest.TestCase):
+    def test_package(self):
+        # Nothing but the package itself, which only defines its functions
+        self.assertEqual(["parser_gen"], import_in_subprocess("parser_gen"))
+
+    def test_production_rules(self):
+        loaded = import_in_subprocess("parser_gen.production_rules")
+        for module in ("logging", "argparse", "parser_gen.stream_handler", "parser_gen.driver"):
+            self.assertNotIn(module, loaded)
+
+    def test_parse(self):
+        import parser_gen
+        self.assertEqual("a = b;", str(parser_gen.parse("a = b;")))
+        self.assertIsInstance(parser_gen.parse("a = b;"), Grammar)
+        self.assertEqual("abc", str(parser_gen.parse("abc", Identifier)))
+        self.assertEqual(["a", "b"], parser_gen.parse("ab", repetition(Letter)).json())
+
+    def test_parse_module(self):
+        """The former name of the driver module still imports."""
+        import parser_gen
+        from parser_gen.parse import ParseError, table_parse
+        from parser_gen import driver
+        self.assertIs(table_parse, driver.table_parse)
+        self.assertIs(ParseError, driver.ParseError)
+        # The package function is still called by parser_gen.parse
+        self.assertIsInstance(parser_gen.parse("a = b;"), Grammar)
+        self.assertIs(parser_gen.parse.compiled_parse, driver.compiled_parse)
+
+    def test_compile_grammar(self):
+        import parser_gen
+        compiled = parser_gen.compile_grammar("ebnf_grammar2.txt", cache_dir=None)
+        self.assertEqual("a = b;", str(compiled.parse("a = b;")))
+
+
+if __name__ == "__main__":
+    unittest.main()
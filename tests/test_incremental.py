@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.incremental import *
+from parser_gen.lexer import GRAMMAR_LEXER
+from parser_gen import incremental
+
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar2.txt"
+
+
+class TestIncrementalParse(unittest.TestCase):
+    def __assert_parsed(self, doc):
+        expected = table_parse(StreamHandler.from_str(doc.text()), Grammar)
+        self.assertEqual(doc.grammar().json(), expected.json())
+        pos = 0
+        for rule, offset in zip(doc.grammar().productions(), doc.rule_offsets()):
+            self.assertEqual(offset, pos)
+            pos += len(str(rule))
+        self.assertEqual(pos, len(doc.text()))
+
+    def test_from_filename(self):
+        doc = IncrementalParse.from_filename(TEST_GRAMMAR)
+        with open(TEST_GRAMMAR, "r") as f:
+            self.assertEqual(doc.text(), f.read())
+        self.__assert_parsed(doc)
+
+    def test_reuse_rules(self):
+        doc = IncrementalParse("a = b ;\nc = d ;\ne = f ;\n")
+        rules = list(doc.grammar().productions())
+        doc.edit(12, 13, "'x' | g")
+        self.assertEqual(doc.text(), "a = b ;\nc = 'x' | g ;\ne = f ;\n")
+        self.__assert_parsed(doc)
+        new_rules = doc.grammar().productions()
+        self.assertIs(new_rules[0], rules[0])
+        self.assertIsNot(new_rules[1], rules[1])
+        self.assertIs(new_rules[2], rules[2])
+        self.assertEqual(doc.rule_offsets(), [0, 8, 22])
+
+    def test_edit_boundaries(self):
+        doc = IncrementalParse("a = b ;\nc = d ;\n")
+        # Whitespace joins the Rule before it
+        doc.edit(8, 8, "  ")
+        self.__assert_parsed(doc)
+        # Merge two rules into one
+        doc.edit(6, 14, "| ")
+        self.assertEqual(doc.text(), "a = b | d ;\n")
+        self.assertEqual(doc.rule_offsets(), [0])
+        # And split it again
+        doc.edit(6, 8, "; c = ")
+        self.assertEqual(doc.rule_offsets(), [0, 8])
+        self.__assert_parsed(doc)
+        doc.edit(0, 0, "z = y;")
+        doc.edit(len(doc.text()), len(doc.text()), "w = v ;")
+        self.__assert_parsed(doc)
+        doc.edit(0, len(doc.text()), "")
+        self.assertEqual(doc.grammar().productions(), [])
+        self.assertEqual(doc.rule_offsets(), [])
+
+    def test_lexer(self):
+        doc = IncrementalParse.from_filename(TEST_GRAMMAR, lexer=GRAMMAR_LEXER)
+        doc.edit(0, 7, "start")
+        self.assertEqual(str(doc.grammar()), doc.text())
+        self.assertEqual(doc.grammar().productions()[0].productions()[0].json(), {"Identifier": ["start"]})
+
+    def test_errors(self):
+        doc = IncrementalParse("a = b ;\nc = d ;\n")
+        self.assertRaises(RuntimeError, doc.edit, 14, 15, "")
+        self.assertEqual(doc.text(), "a = b ;\nc = d ;\n")
+        self.__assert_parsed(doc)
+        self.assertRaises(ValueError, doc.edit, 10, 100, "")
+
+        # The reparse runs on to the end of the text, and the error is
+        # reported at its position in the whole text
+        doc = IncrementalParse("a = b ;\nc = d ;\ne = f ;\n")
+        with self.assertRaises(ParseError) as caught:
+            doc.edit(4, 4, "'")
+        self.assertEqual((25, 4, 1), (caught.exception.pos(), caught.exception.line_no(), caught.exception.col_no()))
+        with self.assertRaises(ParseError) as caught:
+            doc.edit(14, 14, "!")
+        self.assertEqual((14, 2, 7), (caught.exception.pos(), caught.exception.line_no(), caught.exception.col_no()))
+        self.assertEqual("c = d !;", caught.exception.context())
+        self.__assert_parsed(doc)
+
+    def test_large(self):
+        n = 1000
+        text = "".join("r{} = a{} | 'b' ;\n".format(i, i) for i in xrange(n))
+        doc = IncrementalParse(text)
+        rules = list(doc.grammar().productions())
+
+        # Only the edited Rule is parsed again, reading nothing but its text
+        parsed = []
+
+        def counting_parse(stream, *args, **kwargs):
+            pos = stream.pos()
+            rule = table_parse(stream, *args, **kwargs)
+            parsed.append(stream.pos() - pos)
+            return rule
+
+        pos = doc.rule_offsets()[n // 2] + len("r500 = ")
+        incremental.table_parse = counting_parse
+        try:
+            doc.edit(pos, pos + 1, "x | c")
+        finally:
+            incremental.table_parse = table_parse
+        self.assertEqual([len("r500 = x | c500 | 'b' ;\n")], parsed)
+        new_rules = doc.grammar().productions()
+        self.assertEqual("r500 = x | c500 | 'b' ;\n", str(new_rules[n // 2]))
+        self.assertTrue(all(new_rules[i] is rules[i] for i in xrange(n) if i != n // 2))
+        self.__assert_parsed(doc)
+
+        end = len(doc.text())
+        with self.assertRaises(ParseError) as caught:
+            doc.edit(end - 3, end - 3, "|")
+        self.assertEqual((end - 1, n, 20), (caught.exception.pos(), caught.exception.line_no(), caught.exception.col_no()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -29,6 +29,19 @@ class TestIteratorTools(unittest.TestCase):
         for i, elem in enumerate(self.__iter):
             self.assertEqual(elem, elems[i])
 
+    def test_peek_repeatedly(self):
+        iterator = ExtendedIterator(xrange(100000))
+        for i in xrange(100000):
+            self.assertEqual(iterator.peek(2)[0], i)
+            next(iterator)
+        self.assertEqual(iterator.peek(1), [])
+
+        iterator = ExtendedIterator(xrange(ITEMS))
+        iterator.peek(3)
+        copied = copy.deepcopy(iterator)
+        self.assertEqual(list(copied), range(ITEMS))
+        self.assertEqual(list(iterator), range(ITEMS))
+
     def test_peek_empty_stream(self):
         iterator = ExtendedIterator(xrange(0))
         self.assertEqual(iterator.peek(1), [])
@@ -51,6 +64,60 @@ class TestIteratorTools(unittest.TestCase):
         x = list(all_iterator_partitions(self.__iter, 3))
         self.assertEqual(36, len(x))
 
+    def test_partitions_limit(self):
+        parts = next(all_iterator_partitions(self.__iter, 3))
+        self.assertEqual([list(p) for p in parts], [[0], [1], range(2, ITEMS)])
+        self.assertEqual(len(list(all_iterator_partitions(self.__iter, 3, limit=5))), 5)
+        self.assertEqual(list(all_iterator_partitions(self.__iter, ITEMS + 1)), [])
+
+
+class TestBufferIterator(unittest.TestCase):
+    def setUp(self):
+        self.__iter = BufferIterator("abcdefghij")
+
+    def test_peek(self):
+        self.assertEqual(self.__iter.peek(3), ["a", "b", "c"])
+        self.assertEqual(next(self.__iter), "a")
+        self.assertEqual(self.__iter.peek(20), list("bcdefghij"))
+        self.assertEqual(self.__iter.count(), 1)
+
+    def test_end(self):
+        self.__iter.set_end(3)
+        self.assertEqual(list(self.__iter), ["a", "b", "c"])
+        self.assertEqual(self.__iter.peek(1), [])
+        self.assertFalse(self.__iter)
+
+    def test_deep_copy(self):
+        next(self.__iter)
+        copied = copy.deepcopy(self.__iter)
+        self.assertEqual(list(self.__iter), list(copied))
+        self.assertEqual(copied.count(), ITEMS)
+
+    def test_boolean(self):
+        self.assertTrue(self.__iter)
+        self.assertFalse(BufferIterator(""))
+
+    def test_partitions(self):
+        next(self.__iter)
+        self.assertEqual(list(self.__iter.partitions(9)), [[(i, i + 1) for i in xrange(1, ITEMS)]])
+        self.assertEqual(list(self.__iter.partitions(2, limit=2)), [[(1, 2), (2, 10)], [(1, 3), (3, 10)]])
+        self.assertEqual(len(list(self.__iter.partitions(3))), 28)
+        view = self.__iter.view(2, 5)
+        self.assertEqual(list(view), ["c", "d", "e"])
+        self.assertIs(view.buffer(), self.__iter.buffer())
+
+        # Long buffers are split lazily
+        parts = BufferIterator("a" * 100000).partitions(4)
+        self.assertEqual(next(parts), [(0, 1), (1, 2), (2, 3), (3, 100000)])
+
+    def test_utf8_partitions(self):
+        buff = BufferIterator("a\xc3\xa9\xe2\x82\xac", utf8=True)
+        self.assertEqual(list(buff.offsets()), [0, 1, 3, 6])
+        self.assertEqual(list(buff.partitions(2)), [[(0, 1), (1, 6)], [(0, 3), (3, 6)]])
+        self.assertEqual(buff.item_before(6), 3)
+        self.assertEqual(buff.item_before(3), 1)
+        self.assertEqual(buff.item_before(1), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.json_writer import *
+from parser_gen.lexer import GRAMMAR_LEXER
+from parser_gen.ebnf import grammar_rules
+
+import json
+import StringIO
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar2.txt"
+
+
+class TestJsonWriter(unittest.TestCase):
+    def __dump(self, rule, **kwargs):
+        f = StringIO.StringIO()
+        dump_json(rule, f, **kwargs)
+        return f.getvalue()
+
+    def test_grammar(self):
+        for lexer in (None, GRAMMAR_LEXER):
+            with StreamHandler.from_filename(TEST_GRAMMAR) as stream:
+                prod = table_parse(stream, Grammar, lexer=lexer)
+            text = self.__dump(prod)
+            self.assertEqual(json.loads(text), prod.json())
+            self.assertEqual(text, json.dumps(prod.json()))
+            self.assertEqual(self.__dump(prod, compact=True, chunk_size=10), json.dumps(prod.json(), separators=(",", ":")))
+
+    def test_shapes(self):
+        grammar = table_parse(StreamHandler.from_str(
+            'a = "x" , { b | c } , [ "?" ] , [ "!" ] ;\n'
+            'b = \'y\' - "z" ;\n'
+            'c = ( digit | "\\n" ) ;\n'
+        ), Grammar)
+        rule_cls = grammar_rules(grammar)[0]
+        prod = table_parse(StreamHandler.from_str("xy1\ny?"), rule_cls)
+        self.assertEqual(json_shape_of(rule_cls), JSON_NAMED)
+        self.assertEqual(json_shape_of(Whitespace), JSON_VALUE)
+        self.assertEqual(json.loads(self.__dump(prod)), {
+            "a": [["x", [{"b": ["y"]}, {"c": ["1"]}, {"c": ["\n"]}, {"b": ["y"]}], "?", None]]
+        })
+
+    def test_pieces(self):
+        prod = table_parse(StreamHandler.from_str("a = b ;"), Rule)
+        pieces = list(iter_json(prod, compact=True))
+        self.assertEqual(pieces[:3], ['{"Rule":[', '{"Identifier":[', '"a"'])
+        self.assertEqual("".join(pieces), json.dumps(prod.json(), separators=(",", ":")))
+
+
+if __name__ == "__main__":
+    unittest.main()
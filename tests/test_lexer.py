@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.parse_table import *
+from parser_gen.driver import *
+from parser_gen.lexer import *
+from parser_gen.ebnf import grammar_rules
+from parser_gen.codegen import generate_parser
+
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar2.txt"
+
+
+class TestLexer(unittest.TestCase):
+    def setUp(self):
+        self.__table = ParseTable(Grammar)
+
+    def __lex(self, stream):
+        return table_parse(stream, Grammar, table=self.__table, lexer=GRAMMAR_LEXER)
+
+    def test_patterns(self):
+        pattern = GRAMMAR_LEXER.pattern(Identifier)
+        self.assertEqual(pattern.match("ab_1 = c").group(), "ab_1")
+        self.assertIsNone(pattern.match("_ab"))
+
+        pattern = GRAMMAR_LEXER.pattern(Terminal)
+        self.assertEqual(pattern.match("'a\\'b' c").group(), "'a\\'b'")
+        self.assertEqual(pattern.match('"caf\xc3\xa9"').group(), '"caf\xc3\xa9"')
+        self.assertIsNone(pattern.match("'abc"))
+
+        self.assertEqual(GRAMMAR_LEXER.pattern(Whitespace).match("a").group(), "")
+
+        # Like the parser, byte streams match whole characters of classes
+        rule_cls = repetition(character_class(["\xc3\xa9", "a"]))
+        pattern = Lexer([rule_cls]).pattern(rule_cls, utf8=False)
+        self.assertEqual(pattern.match("a\xc3\xa9\xc3\xa8").group(), "a\xc3\xa9")
+
+    def test_atomic_repetition(self):
+        # The parser never gives back what a repetition consumed.
+        rule_cls = concatenation(repetition(terminal("a")), terminal("a"))
+        self.assertIsNone(Lexer([rule_cls]).pattern(rule_cls).match("aaa"))
+
+    def test_not_regular(self):
+        self.assertRaises(ProductionRuleError, Lexer, [Grammar])
+        self.assertRaises(ProductionRuleError, Lexer, [Rule])
+
+    def test_tokens(self):
+        prod = self.__lex(StreamHandler.from_str("ab = 'x' | c ;"))
+        rule = prod.productions()[0]
+        self.assertEqual(rule.productions()[0].json(), {"Identifier": ["ab"]})
+        self.assertEqual(rule.productions()[1].json(), " ")
+        self.assertEqual(str(prod), "ab = 'x' | c ;")
+
+    def test_same_grammar(self):
+        with open(TEST_GRAMMAR, "r") as f:
+            s = f.read()
+        expected = table_parse(StreamHandler.from_str(s), Grammar)
+        with StreamHandler.from_filename(TEST_GRAMMAR) as stream:
+            prod = self.__lex(stream)
+        self.assertEqual(s, str(prod))
+        self.assertEqual(
+            generate_parser(grammar_rules(expected)[0]),
+            generate_parser(grammar_rules(prod)[0])
+        )
+
+    def test_position(self):
+        s = "a = 'caf\xc3\xa9' ;\nb = c ;"
+        for utf8 in (False, True):
+            expected = StreamHandler.from_str(s, utf8=utf8)
+            table_parse(expected, Grammar)
+            stream = StreamHandler.from_str(s, utf8=utf8)
+            self.__lex(stream)
+            self.assertEqual(stream.line_no(), expected.line_no())
+            self.assertEqual(stream.col_no(), expected.col_no())
+
+    def test_errors(self):
+        # Unterminated terminals fall back to the parser, which reports them.
+        self.assertRaises(RuntimeError, self.__lex, StreamHandler.from_str("a = 'b ;"))
+        self.assertRaises(ValueError, self.__lex, StreamHandler.from_iterator(iter("a = b;")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.packrat import *
+
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar.txt"
+
+
+class CountedLetter(Letter):
+    calls = 0
+
+    @classmethod
+    def get_rules(cls, *lookaheads):
+        cls.calls += 1
+        return super(CountedLetter, cls).get_rules(*lookaheads)
+
+
+class TestPackrat(unittest.TestCase):
+    def __make_prod(self, s, rule_cls):
+        return packrat_parse(StreamHandler.from_str(s), rule_cls)
+
+    def __test_rule(self, s, rule_cls, json):
+        prod = self.__make_prod(s, rule_cls)
+        self.assertEqual(s, str(prod))
+        self.assertEqual(prod.json(), json)
+
+    def __test_same_parse(self, s, rule_cls):
+        expected = table_parse(StreamHandler.from_str(s), rule_cls)
+        prod = self.__make_prod(s, rule_cls)
+        self.assertEqual(s, str(prod))
+        self.assertEqual(expected.json(), prod.json())
+
+    def test_shared_prefix(self):
+        rule_cls = alternation(terminal("ab"), terminal("ac"))
+        self.assertRaises(RuntimeError, table_parse, StreamHandler.from_str("ac"), rule_cls)
+        self.__test_rule("ac", rule_cls, "ac")
+
+        rule_cls = alternation(
+            concatenation(Identifier, terminal("("), Identifier, terminal(")")),
+            concatenation(Identifier, terminal("="), Identifier)
+        )
+        self.__test_rule("f=g", rule_cls, [
+            {"Identifier": ["f", []]}, "=", {"Identifier": ["g", []]}
+        ])
+
+    def test_left_recursion(self):
+        class Rhs(ProductionRule):
+            @classmethod
+            def alternatives(cls):
+                return [
+                    (Rhs, terminal("|"), Identifier),
+                    (Identifier,),
+                ]
+
+        self.__test_rule("abc", Rhs, {"Rhs": [{"Identifier": ["a", ["b", "c"]]}]})
+
+    def test_memoized(self):
+        n = 20
+        rule_cls = CountedLetter
+        for i in xrange(n):
+            # Every level tries its first alternative, fails on the last
+            # character and backtracks over the same letters.
+            rule_cls = alternation(
+                concatenation(rule_cls, terminal("!")),
+                concatenation(rule_cls, terminal("?"))
+            )
+        s = "a" + "?" * n
+        CountedLetter.calls = 0
+        prod = self.__make_prod(s, rule_cls)
+        self.assertEqual(s, str(prod))
+        self.assertEqual(CountedLetter.calls, 1)
+
+    def test_same_as_table_parse(self):
+        self.__test_same_parse("ABC", repetition(Letter))
+        self.__test_same_parse("", repetition(Letter))
+        self.__test_same_parse("'some \\string'", Terminal)
+        self.__test_same_parse("ident | ident2 | ident3", Alternation)
+        self.__test_same_parse("a = 'caf\xc3\xa9';", Grammar)
+        with open(TEST_GRAMMAR, "r") as f:
+            self.__test_same_parse(f.read(), Grammar)
+
+    def test_stream_position(self):
+        stream = StreamHandler.from_str("abc def")
+        packrat_parse(stream, Identifier)
+        self.assertEqual(stream.char(), "c")
+        self.assertEqual(stream.peek(), " ")
+        self.assertEqual(stream.col_no(), 3)
+
+    def test_syntax_error(self):
+        self.assertRaises(RuntimeError, self.__make_prod, "a = b", Rule)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.parallel import *
+
+import cPickle
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar2.txt"
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        with open(TEST_GRAMMAR, "r") as f:
+            self.__text = f.read()
+
+    def test_pickle_tree(self):
+        prod = table_parse(StreamHandler.from_str(self.__text), Grammar)
+        loaded = cPickle.loads(cPickle.dumps(prod, cPickle.HIGHEST_PROTOCOL))
+        self.assertEqual(loaded.json(), prod.json())
+        rep = loaded.productions()[0].productions()[0].productions()[1]
+        self.assertIs(type(rep), repetition(IdentifierCharacter))
+
+    def test_split_rules(self):
+        text = "a = ';' ;\nb = \"\\\";\" ;  c = d;"
+        self.assertEqual(split_rules(text, 1), [0, 10, 23])
+        self.assertEqual(split_rules(text, 12), [0, 23])
+        self.assertEqual(split_rules(text, 100), [0])
+
+    def test_same_parse(self):
+        expected = table_parse(StreamHandler.from_str(self.__text), Grammar)
+        for processes in (1, 2):
+            prod = parallel_parse(self.__text, processes=processes)
+            self.assertEqual(prod.json(), expected.json())
+        self.assertEqual(str(parallel_parse(self.__text, processes=2, lex=True)), self.__text)
+
+    def test_error_position(self):
+        text = "a = b ;\n" * 20 + "c = ! ;\n" + "d = e ;\n" * 20
+        with self.assertRaises(ParseError) as expected:
+            table_parse(StreamHandler.from_str(text), Grammar)
+        with self.assertRaises(ParseError) as caught:
+            parallel_parse(text, processes=2)
+        position = (expected.exception.pos(), expected.exception.line_no(), expected.exception.col_no())
+        self.assertEqual(position, (164, 21, 5))
+        self.assertEqual(position, (caught.exception.pos(), caught.exception.line_no(), caught.exception.col_no()))
+        self.assertEqual(expected.exception.context(), caught.exception.context())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.parse_table import *
+from parser_gen.driver import *
+from parser_gen.lexer import GRAMMAR_LEXER, Lexeme
+
+import itertools
+import pickle
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar.txt"
+
+
+class TestParseTable(unittest.TestCase):
+    def __test_same_parse(self, s, rule_cls):
+        expected = table_parse(StreamHandler.from_str(s), rule_cls)
+        prod = table_parse(StreamHandler.from_str(s), rule_cls, table=ParseTable(rule_cls))
+        self.assertEqual(s, str(prod))
+        self.assertEqual(expected.json(), prod.json())
+
+    def test_first_follow(self):
+        table = ParseTable(Identifier)
+        self.assertEqual(table.first(Identifier), set(string.ascii_letters))
+        self.assertFalse(table.nullable(Identifier))
+        self.assertEqual(table.follow(Identifier), set([EOF]))
+
+        rep = table.canonical(repetition(alternation(Letter, Digit, terminal("_"))))
+        self.assertTrue(table.nullable(rep))
+        self.assertEqual(table.follow(rep), set([EOF]))
+
+    def test_canonical_combinators(self):
+        table = ParseTable(repetition(Letter))
+        self.assertIs(table.canonical(repetition(Letter)), table.start())
+        self.assertIsNot(table.canonical(repetition(Digit)), table.start())
+
+    def test_table_entries(self):
+        table = ParseTable(Grammar)
+        a = table.canonical(terminal("a"))
+        self.assertIs(table.lookup(a, "a"), MATCH)
+        self.assertIsNone(table.lookup(a, "b"))
+        self.assertEqual(table.lookup(Grammar, "a"), (Rule, Grammar))
+        self.assertEqual(table.lookup(Grammar, EOF), ())
+        self.assertIsNone(table.lookup(Grammar, ";"))
+
+    def test_conflicts(self):
+        rule_cls = alternation(terminal("ab"), terminal("ac"))
+        table = ParseTable(rule_cls)
+        self.assertEqual(len(table.conflicts()), 1)
+        self.assertEqual(table.lookup(rule_cls, "a"), (table.canonical(terminal("ab")),))
+
+    def test_ll_k(self):
+        rule_cls = repetition(alternation(terminal("ab"), terminal("ac"), terminal("b")))
+        self.assertRaises(RuntimeError, table_parse, StreamHandler.from_str("ac"), rule_cls)
+        prod = table_parse(StreamHandler.from_str("acbab"), rule_cls, k=2)
+        self.assertEqual(prod.json(), ["ac", "b", "ab"])
+
+        table = ParseTable(rule_cls, k=2)
+        choice = table.lookup(table.canonical(alternation(terminal("ab"), terminal("ac"), terminal("b"))), "a")
+        self.assertIsInstance(choice, LookaheadChoice)
+        self.assertEqual(choice.choose(["a", "c"]), (terminal("ac"),))
+
+        rule_cls = alternation(
+            concatenation(Letter, terminal("="), Letter),
+            concatenation(Letter, terminal(":"), Digit)
+        )
+        prod = table_parse(StreamHandler.from_str("a:1"), rule_cls, k=2)
+        self.assertEqual(prod.json(), ["a", ":", "1"])
+        prod = table_parse(StreamHandler.from_str("a=b"), rule_cls, k=2)
+        self.assertEqual(prod.json(), ["a", "=", "b"])
+
+        # Resolved with the character following the shorter alternative
+        rule_cls = concatenation(alternation(terminal("a"), terminal("ab")), terminal(";"))
+        prod = table_parse(StreamHandler.from_str("ab;"), rule_cls, k=2)
+        self.assertEqual(prod.json(), ["ab", ";"])
+
+    def test_nullable_conflicts(self):
+        # Taking the optional "ab" on "a" rejects "ac"
+        rule_cls = concatenation(optional(concatenation(terminal("a"), terminal("b"))), terminal("a"), terminal("c"))
+        table = ParseTable(rule_cls)
+        self.assertEqual(len(table.conflicts()), 1)
+        self.assertEqual(table.lookup(table.canonical(optional(concatenation(terminal("a"), terminal("b")))), "a"),
+                         (table.canonical(concatenation(terminal("a"), terminal("b"))),))
+        self.assertRaises(ParseError, table_parse, StreamHandler.from_str("ac"), rule_cls, table=table)
+        prod = table_parse(StreamHandler.from_str("ac"), rule_cls, k=2)
+        self.assertEqual(prod.json(), [None, "a", "c"])
+        prod = table_parse(StreamHandler.from_str("abac"), rule_cls, k=2)
+        self.assertEqual(prod.json(), [["a", "b"], "a", "c"])
+
+        # Consuming whitespace early accepts whatever skipping it would
+        self.assertEqual(ParseTable(Grammar).conflicts(), [])
+        self.assertEqual(ParseTable(concatenation(Whitespace, Whitespace)).conflicts(), [])
+
+    def test_ll_k_rejected(self):
+        rule_cls = alternation(terminal("ab"), terminal("ac"))
+        self.assertRaises(ProductionRuleError, ParseTable, rule_cls, k=3)
+        self.assertRaises(ProductionRuleError, ParseTable, Grammar, k=2)
+
+        # Identifiers of any length come before the distinguishing character
+        rule_cls = alternation(
+            concatenation(Identifier, terminal("(")),
+            concatenation(Identifier, terminal("="))
+        )
+        self.assertRaises(ProductionRuleError, ParseTable, rule_cls, k=4)
+
+    def test_parse(self):
+        self.__test_same_parse("ABC", repetition(Letter))
+        self.__test_same_parse("", repetition(Letter))
+        self.__test_same_parse("abc", terminal("abc"))
+        self.__test_same_parse("", terminal(""))
+        self.__test_same_parse("'some \\string'", Terminal)
+        self.__test_same_parse("ident | ident2 | ident3", Alternation)
+        self.__test_same_parse("[a], b", Alternation)
+        self.__test_same_parse("a = b;", Grammar)
+        self.__test_same_parse("a = 'caf\xc3\xa9' | \"\xe2\x82\xac\";", Grammar)
+        with open(TEST_GRAMMAR, "r") as f:
+            self.__test_same_parse(f.read(), Grammar)
+
+    def test_syntax_error(self):
+        table = ParseTable(Rule)
+        self.assertRaises(RuntimeError, table_parse, StreamHandler.from_str("a = b"), Rule, table=table)
+        self.assertRaises(ValueError, table_parse, StreamHandler.from_str("a = b;"), Grammar, table=table)
+
+    def test_parse_error(self):
+        table = ParseTable(Grammar)
+        text = "a = b;\nc = d |;\ne = f;"
+        with self.assertRaises(ParseError) as caught:
+            table_parse(StreamHandler.from_str(text), Grammar, table=table)
+        error = caught.exception
+        self.assertEqual((";", "Concatenation"), (error.token(), error.rule_name()))
+        self.assertEqual((14, 2, 8), (error.pos(), error.line_no(), error.col_no()))
+        self.assertEqual(tuple(sorted(table.first(Concatenation))), error.expected())
+        self.assertIn("'('", str(error))
+        self.assertEqual(("c = d |;", 7), (error.context(), error.context_col()))
+        self.assertTrue(str(error).endswith("\n    c = d |;\n           ^"))
+
+        # Without a table, the expected characters are probed with get_rules
+        with self.assertRaises(ParseError) as caught:
+            table_parse(StreamHandler.from_str(";"), Identifier)
+        self.assertEqual(tuple(sorted(string.ascii_letters)), caught.exception.expected())
+        self.assertNotIn(";", caught.exception.expected())
+
+        pickled = pickle.loads(pickle.dumps(error))
+        self.assertEqual(str(error), str(pickled))
+
+    def test_parse_error_context(self):
+        table = ParseTable(Rule)
+        text = "a = " + "b | " * 50 + "| " + "c | " * 50 + "d;"
+        with self.assertRaises(ParseError) as caught:
+            table_parse(StreamHandler.from_str(text), Rule, table=table)
+        error = caught.exception
+        self.assertEqual(2 * CONTEXT_SIZE, len(error.context()))
+        self.assertEqual(text[error.pos() - CONTEXT_SIZE:error.pos() + CONTEXT_SIZE], error.context())
+        self.assertEqual(CONTEXT_SIZE, error.context_col())
+
+        # Windows are cut at whole UTF-8 sequences
+        text = "a = '" + "\xc3\xa9" * 30 + "' | ;"
+        with self.assertRaises(ParseError) as caught:
+            table_parse(StreamHandler.from_str(text, utf8=True), Rule, table=table)
+        error = caught.exception
+        self.assertEqual(error.context().decode("utf-8"), error.context().decode("utf-8", "ignore"))
+        self.assertEqual(u"\xe9' | ;", error.context().decode("utf-8")[-6:])
+        self.assertEqual(len(error.context().decode("utf-8")) - 1, error.context_col())
+
+    def test_parse_error_stream(self):
+        # The rest of the stream is never read, even when it does not end
+        chars = itertools.chain("a = ;", itertools.repeat("x"))
+        with self.assertRaises(ParseError) as caught:
+            table_parse(StreamHandler.from_iterator(chars), Rule, table=ParseTable(Rule))
+        self.assertEqual((";", 4, 1, 5), (caught.exception.context(), caught.exception.pos(),
+                                          caught.exception.line_no(), caught.exception.col_no()))
+
+    def test_events(self):
+        events = list(parse_events(StreamHandler.from_str("ab"), Identifier))
+        rep = repetition(IdentifierCharacter)
+        self.assertEqual(events, [
+            (ENTER, Identifier, 0),
+            (ENTER, Letter, 0), (TOKEN, "a", 0), (EXIT, Letter, 1),
+            (ENTER, rep, 1),
+            (ENTER, IdentifierCharacter, 1), (TOKEN, "b", 1), (EXIT, IdentifierCharacter, 2),
+            (EXIT, rep, 2),
+            (EXIT, Identifier, 2),
+        ])
+
+        events = list(parse_events(StreamHandler.from_str("ab ="), concatenation(Identifier, Whitespace), lexer=GRAMMAR_LEXER))
+        self.assertEqual(events[1:4], [(ENTER, Identifier, 0), (ENTER, Lexeme, 0), (TOKEN, "ab", 0)])
+
+        # Streams that can only be iterated are parsed as they are read
+        events = parse_events(StreamHandler.from_iterator(iter("ab")), Identifier)
+        self.assertEqual(next(events), (ENTER, Identifier, 0))
+
+    def test_build_tree(self):
+        with open(TEST_GRAMMAR, "r") as f:
+            text = f.read()
+        prod = build_tree(parse_events(StreamHandler.from_str(text), Grammar))
+        self.assertEqual(prod.json(), table_parse(StreamHandler.from_str(text), Grammar).json())
+
+        prod = build_tree(parse_events(StreamHandler.from_str(text), Grammar, lexer=GRAMMAR_LEXER))
+        self.assertEqual(str(prod), text)
+        self.assertIsInstance(prod.productions()[0].productions()[0].productions()[0], Lexeme)
+        # compiled_parse builds the same tree without the events
+        compiled = compiled_parse(StreamHandler.from_str(text), ParseTable(Grammar), lexer=GRAMMAR_LEXER)
+        self.assertEqual(compiled.json(), prod.json())
+
+    def test_extend_alphabet(self):
+        rule_cls = repetition(AnyCharacter)
+        table = ParseTable(rule_cls, alphabet="ab")
+        prod = table_parse(StreamHandler.from_str("axb"), rule_cls, table=table)
+        self.assertEqual(prod.json(), ["a", "x", "b"])
+        self.assertIn("x", table.alphabet())
+
+        # Entries of new characters are added without compiling the table again
+        text = "a = '" + "".join(unichr(0x4e00 + i).encode("utf-8") for i in range(20)) + "' | \"\xe2\x82\xac\";\n"
+        table = ParseTable(Grammar)
+        prod = table_parse(StreamHandler.from_str(text, utf8=True), Grammar, table=table)
+        self.assertEqual(text, str(prod))
+        compiled = ParseTable(Grammar, alphabet=tuple(table.alphabet()))
+        self.assertEqual(compiled.entries(), table.entries())
+        for rule_cls in compiled.rules():
+            self.assertEqual(compiled.first(rule_cls), table.first(rule_cls))
+            self.assertEqual(compiled.follow(rule_cls), table.follow(rule_cls))
+
+
+if __name__ == "__main__":
+    unittest.main()
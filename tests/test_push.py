@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.push import *
+
+import StringIO
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar2.txt"
+
+
+class TestPushParser(unittest.TestCase):
+    def setUp(self):
+        with open(TEST_GRAMMAR, "r") as f:
+            self.__text = f.read()
+
+    def test_chunks(self):
+        expected = table_parse(StreamHandler.from_str(self.__text), Grammar).json()
+        for size in (1, 7, 100, len(self.__text)):
+            chunks = [self.__text[i:i+size] for i in xrange(0, len(self.__text), size)]
+            self.assertEqual(parse_chunks(chunks, Grammar).json(), expected)
+        self.assertEqual(parse_reader(StringIO.StringIO(self.__text).read, Grammar, size=10).json(), expected)
+
+    def test_suspend(self):
+        parser = PushParser(Identifier)
+        self.assertEqual(parser.feed("a"), [])
+        self.assertEqual(parser.feed("b"), [
+            (ENTER, Identifier, 0), (ENTER, Letter, 0), (TOKEN, "a", 0),
+        ])
+        self.assertFalse(parser.done())
+        parser.feed("c")
+        # The repetition only ends at the end of the input
+        self.assertFalse(parser.done())
+        self.assertEqual(parser.close()[-1], (EXIT, Identifier, 3))
+        self.assertTrue(parser.done())
+        self.assertRaises(ValueError, parser.feed, "d")
+
+    def test_utf8(self):
+        text = "a = 'caf\xc3\xa9' | \"\xe2\x82\xac\";"
+        chunks = [text[i:i+1] for i in xrange(len(text))]
+        self.assertEqual(str(parse_chunks(chunks, Grammar)), text)
+
+    def test_errors(self):
+        parser = PushParser(Rule)
+        parser.feed("a = b")
+        self.assertRaises(RuntimeError, parser.close)
+        self.assertTrue(parser.done())
+
+        parser = PushParser(Rule)
+        self.assertRaises(RuntimeError, parser.feed, "a = ! ;")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.driver import *
+from parser_gen.lexer import GRAMMAR_LEXER
+from parser_gen.recovery import *
+from parser_gen.rule_profile import RuleProfile
+
+import pickle
+import unittest
+
+
+class TestRecovery(unittest.TestCase):
+    def __parse(self, text, recovery, **kwargs):
+        prod = table_parse(StreamHandler.from_str(text), Grammar, recovery=recovery, **kwargs)
+        self.assertIsInstance(prod, Grammar)
+        # The partial tree still holds the whole input
+        self.assertEqual(text, str(prod))
+        return prod
+
+    def test_valid(self):
+        text = "a = b;\nc = 'd' | [e];\n"
+        recovery = Recovery()
+        prod = self.__parse(text, recovery)
+        self.assertEqual([], recovery.errors())
+        self.assertEqual(table_parse(StreamHandler.from_str(text), Grammar).json(), prod.json())
+
+    def test_every_error(self):
+        text = "a = b;\nc = ;\nd = e;\nf = = g;\nh = i;\n"
+        recovery = Recovery()
+        prod = self.__parse(text, recovery)
+        errors = recovery.errors()
+        self.assertEqual([";", "="], [e.token() for e in errors])
+        self.assertEqual([(2, 5), (4, 5)], [(e.line_no(), e.col_no()) for e in errors])
+        self.assertEqual([11, 24], [e.pos() for e in errors])
+        self.assertEqual("Alternation", errors[0].rule_name())
+        self.assertTrue(str(errors[0]).startswith("Unable to handle token ';' for rule 'Alternation' at line 2, column 5."))
+        self.assertEqual(("c = ;", 4), (errors[0].context(), errors[0].context_col()))
+
+        # Rules resume at the ';' they expect, so every one is parsed
+        rules = prod.productions()
+        self.assertEqual(["a = b;\n", "c = ;\n", "d = e;\n", "f = = g;\n", "h = i;\n"], map(str, rules))
+        self.assertTrue(all(isinstance(r, Rule) for r in rules))
+        self.assertEqual(table_parse(StreamHandler.from_str("d = e;\n"), Rule).json(), rules[2].json())
+
+    def test_lexer(self):
+        recovery = Recovery()
+        self.__parse("a = b;\nc = ;\nd = e;\n", recovery, lexer=GRAMMAR_LEXER)
+        self.assertEqual([(2, 5)], [(e.line_no(), e.col_no()) for e in recovery.errors()])
+
+    def test_outside_rules(self):
+        recovery = Recovery()
+        prod = self.__parse("a = b;\n!x = y;\nz = w;", recovery)
+        self.assertEqual(1, len(recovery.errors()))
+        self.assertEqual("z = w;", str(prod.productions()[-1]))
+
+        recovery = Recovery()
+        prod = self.__parse("!abc = d;", recovery)
+        self.assertEqual([("!", "Grammar")], [(e.token(), e.rule_name()) for e in recovery.errors()])
+        self.assertEqual("abc = d;", str(prod.productions()[-1]))
+
+    def test_end_of_input(self):
+        for text in ("a = b", "a = b; c"):
+            recovery = Recovery()
+            self.__parse(text, recovery)
+            self.assertEqual([""], [e.token() for e in recovery.errors()])
+            self.assertEqual(len(text), recovery.errors()[0].pos())
+
+    def test_sync_chars(self):
+        text = "a = b.\nc = .\nd = e.\n"
+        recovery = Recovery(chars=".")
+        self.__parse(text, recovery)
+        self.assertEqual(3, len(recovery.errors()))
+
+    def test_profile(self):
+        recovery = Recovery()
+        profile = RuleProfile()
+        self.__parse("a = b;\nc = ;\nd = e;\n", recovery, profile=profile)
+        self.assertEqual(1, len(recovery.errors()))
+        self.assertEqual(3, profile.stats()[Rule].steps)
+
+    def test_pickle(self):
+        error = ParseError("x", "Rule", 3, 1, 4)
+        copied = pickle.loads(pickle.dumps(error))
+        self.assertEqual(str(error), str(copied))
+        self.assertEqual((3, 1, 4), (copied.pos(), copied.line_no(), copied.col_no()))
+        self.assertIsInstance(copied, RuntimeError)
+
+
+if __name__ == "__main__":
+    unittest.main()
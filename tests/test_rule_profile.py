@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from parser_gen.stream_handler import *
+from parser_gen.production_rules import *
+from parser_gen.parse_table import *
+from parser_gen.driver import *
+from parser_gen.rule_profile import *
+from parser_gen.lexer import GRAMMAR_LEXER
+
+import unittest
+
+
+TEST_GRAMMAR = "ebnf_grammar2.txt"
+
+
+class TestRuleProfile(unittest.TestCase):
+    def setUp(self):
+        with open(TEST_GRAMMAR, "r") as f:
+            self.__text = f.read()
+
+    def test_same_parse(self):
+        expected = table_parse(StreamHandler.from_str(self.__text), Grammar)
+        for table in (None, ParseTable(Grammar)):
+            profile = RuleProfile()
+            prod = table_parse(StreamHandler.from_str(self.__text), Grammar, table=table, profile=profile)
+            self.assertEqual(prod.json(), expected.json())
+            self.assertEqual(profile.stats()[Rule].steps, len(expected.productions()))
+
+        profile = RuleProfile()
+        prod = table_parse(StreamHandler.from_str(self.__text), Grammar, lexer=GRAMMAR_LEXER, profile=profile)
+        self.assertEqual(str(prod), self.__text)
+        self.assertNotIn(Letter, profile.stats())
+
+    def test_counters(self):
+        for table in (None, ParseTable(Identifier)):
+            profile = RuleProfile()
+            table_parse(StreamHandler.from_str("abc"), Identifier, table=table, profile=profile)
+            stats = profile.stats()
+            self.assertEqual(stats[Identifier], RuleStats(1, 1, 2, 1, stats[Identifier].seconds))
+            self.assertEqual(stats[terminal("c")][:4], (1, 0 if table is None else 1, 0, 1))
+            # Two elements and the end of the repetition
+            self.assertEqual(stats[repetition(IdentifierCharacter)].steps, 3)
+
+    def test_report(self):
+        profile = RuleProfile()
+        table_parse(StreamHandler.from_str("a = 'b' | c ;"), Rule, profile=profile)
+        report = profile.report(limit=3)
+        self.assertEqual(len(report.splitlines()), 4)
+        self.assertIn("seconds", report.splitlines()[0])
+        self.assertEqual(rule_name(repetition(concatenation(Identifier, terminal("_")))), "repetition(concatenation(Identifier, terminal('_')))")
+        self.assertEqual(rule_name(character_class("ba")), "character_class('ab')")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,14 +3,16 @@
 
 from parser_gen.stream_handler import *
 from parser_gen.production_rules import *
-from parser_gen.parse import *
+from parser_gen.driver import *
+from parser_gen import production_rules
 
 import unittest
+import sys
 
 
 class TestRules(unittest.TestCase):
-    def __make_prod(self, s, rule_cls):
-        return table_parse(StreamHandler.from_str(s), rule_cls)
+    def __make_prod(self, s, rule_cls, utf8=False):
+        return table_parse(StreamHandler.from_str(s, utf8=utf8), rule_cls)
 
     def __test_rule_str(self, s, rule_cls):
         prod = self.__make_prod(s, rule_cls)
@@ -20,8 +22,8 @@ class TestRules(unittest.TestCase):
         prod = self.__make_prod(s, rule_cls)
         self.assertEqual(prod.json(), expect)
 
-    def __test_rule(self, s, rule_cls, json=None):
-        prod = self.__make_prod(s, rule_cls)
+    def __test_rule(self, s, rule_cls, json=None, utf8=False):
+        prod = self.__make_prod(s, rule_cls, utf8=utf8)
         self.assertEqual(s, str(prod))
         if json:
             self.assertEqual(prod.json(), json)
@@ -32,6 +34,99 @@ class TestRules(unittest.TestCase):
     def test_digit(self):
         self.__test_rule("9", Digit, "9")
 
+    def test_interned_combinators(self):
+        self.assertIs(terminal("a"), terminal("a"))
+        self.assertIsNot(terminal("a"), terminal("b"))
+        self.assertIs(repetition(Letter), repetition(Letter))
+        self.assertIs(
+            alternation(Letter, Digit, terminal("_")),
+            alternation(Letter, Digit, terminal("_"))
+        )
+        self.assertIsNot(alternation(Letter, Identifier), alternation(Identifier, Letter))
+        self.assertIs(
+            exclusion(AnyCharacter, terminal("'")),
+            exclusion(AnyCharacter, terminal("'"))
+        )
+        self.assertIs(optional(Digit), optional(Digit))
+        self.assertIs(concatenation(Letter, Digit), concatenation(Letter, Digit))
+
+        # Longer inputs over the same characters create no new classes
+        self.__make_prod("x = 'abc' | { y };", Grammar)
+        count = len(production_rules._COMBINATORS)
+        self.__make_prod("x = 'abcabcabc' | { y } | { x }; y = x | 'cba';", Grammar)
+        self.assertEqual(count, len(production_rules._COMBINATORS))
+
+    def test_utf8(self):
+        self.__test_rule("'caf\xc3\xa9'", Terminal, json={
+            "Terminal": ["'", ["c", "a", "f", "\xc3\xa9"], "'"]
+        }, utf8=True)
+        self.__test_rule("\xc3\xa9\xe2\x82\xac", terminal("\xc3\xa9\xe2\x82\xac"), json="\xc3\xa9\xe2\x82\xac", utf8=True)
+
+        # Byte strings are read one byte at a time unless asked for
+        self.__test_rule("'caf\xc3\xa9'", Terminal, json={
+            "Terminal": ["'", ["c", "a", "f", "\xc3", "\xa9"], "'"]
+        })
+
+        # Terminals and classes match their characters a byte at a time then
+        for utf8 in (True, False):
+            self.__test_rule("caf\xc3\xa9", terminal("caf\xc3\xa9"), json="caf\xc3\xa9", utf8=utf8)
+            self.__test_rule("\xc3\xa9", terminal("\xc3\xa9"), json="\xc3\xa9", utf8=utf8)
+            rule_cls = repetition(character_class(["\xc3\xa9", "\xc3\xa8", "\xe2\x82\xac", "a"]))
+            self.__test_rule("a\xc3\xa8\xe2\x82\xac\xc3\xa9", rule_cls, json=["a", "\xc3\xa8", "\xe2\x82\xac", "\xc3\xa9"], utf8=utf8)
+            prod = table_parse(StreamHandler.from_str("caf\xc3\xa9", utf8=utf8), terminal("caf\xc3\xa9"),
+                               table=ParseTable(terminal("caf\xc3\xa9")))
+            self.assertEqual("caf\xc3\xa9", str(prod))
+        self.assertRaises(ParseError, self.__make_prod, "caf\xc3\xa8", terminal("caf\xc3\xa9"))
+
+    def test_character_classes(self):
+        vowel = character_class("aeiou")
+        self.assertIs(vowel, character_class("uoiea"))
+        self.assertTrue(vowel.matches("e"))
+        self.assertFalse(vowel.matches("b"))
+        self.assertFalse(vowel.matches(""))
+
+        self.assertTrue(character_range("a", "f").matches("c"))
+        self.assertFalse(character_range("a", "f").matches("g"))
+
+        consonant = character_difference(Letter, vowel, character_class("AEIOU"))
+        self.assertTrue(consonant.matches("b"))
+        self.assertFalse(consonant.matches("a"))
+        self.assertFalse(consonant.matches("1"))
+
+        not_vowel = negation(vowel)
+        self.assertTrue(not_vowel.matches("1"))
+        self.assertFalse(not_vowel.matches("a"))
+        self.assertIs(negation(not_vowel), vowel)
+        self.assertTrue(character_union(not_vowel, terminal("a")).matches("a"))
+        self.assertFalse(character_union(not_vowel, terminal("a")).matches("e"))
+
+        # Single character alternations and exclusions are character classes
+        self.assertIs(alternation(Letter, Digit, terminal("_")), character_union(Letter, Digit, terminal("_")))
+        quoted = exclusion(AnyCharacter, terminal("'"), terminal("\\"))
+        self.assertIs(quoted, character_class("'\\", negated=True))
+        self.assertTrue(quoted.matches("\xc3\xa9"))
+
+        self.__test_rule("b", consonant, json="b")
+        self.__test_rule("x9_", repetition(alternation(Letter, Digit, terminal("_"))), json=["x", "9", "_"])
+
+    def test_flat_repetition(self):
+        n = sys.getrecursionlimit() * 2
+        prod = self.__make_prod(" " * n, Whitespace)
+        self.assertEqual(len(prod.productions()), n)
+        self.assertEqual(prod.json(), " " * n)
+
+        s = "a=b;" * n
+        prod = self.__make_prod(s, Grammar)
+        self.assertEqual(len(prod.productions()), n)
+        self.assertEqual(len(prod.json()), n)
+
+        # Whitespace around the tokens and after the ";" of every Rule
+        s = "a = b;\n" * n
+        prod = self.__make_prod(s, Grammar)
+        self.assertEqual(len(prod.productions()), n)
+        self.assertEqual(len(prod.json()), n)
+        self.assertEqual(s, str(prod))
+
     def test_rest(self):
         """These need to be sorted into their own test methods."""
         self.__test_rule("]", Symbol, json="]")
@@ -6,7 +6,9 @@ from parser_gen.stream_handler import StreamHandler
 from parser_gen.iterator_tools import ExtendedIterator
 
 import unittest
+import tempfile
 import copy
+import os
 
 
 TEST_GRAMMAR = "ebnf_grammar.txt"
@@ -42,11 +44,122 @@ class TestStreamHandler(unittest.TestCase):
             self.handler.pop_char()
             copied_handler.pop_char()
 
+    def test_buffer_iteration(self):
+        """A handler over a buffer yields the same characters and positions."""
+        with open(TEST_GRAMMAR, "r") as f:
+            handler = StreamHandler.from_str(f.read())
+
+        while self.handler.char_iter():
+            self.assertEqual(self.handler.peek(), handler.peek())
+            self.handler.pop_char()
+            handler.pop_char()
+            self.assertEqual(self.handler.char(), handler.char())
+            self.assertEqual(self.handler.line_no(), handler.line_no())
+            self.assertEqual(self.handler.col_no(), handler.col_no())
+            self.assertEqual(self.handler.pos(), handler.pos())
+        self.assertFalse(handler.char_iter())
+
+    def test_buffer_advance(self):
+        """Advancing a buffer in bulk tracks lines and columns."""
+        for n in (0, 1, 9, 10, 11, 50, 10000):
+            handler = StreamHandler.from_filename(TEST_GRAMMAR)
+            self.addCleanup(handler.close)
+            expected = StreamHandler(ExtendedIterator(char_generator(TEST_GRAMMAR)))
+            handler.advance(n)
+            for i in xrange(n):
+                expected.pop_char()
+            self.assertEqual(expected.char(), handler.char())
+            self.assertEqual(expected.line_no(), handler.line_no())
+            self.assertEqual(expected.col_no(), handler.col_no())
+            self.assertEqual(expected.pos(), handler.pos())
+
+    def test_buffer_copy(self):
+        handler = StreamHandler.from_str("abcdef")
+        handler.advance(2)
+        copied = copy.deepcopy(handler)
+        handler.advance(2)
+        self.assertEqual(handler.char(), "d")
+        self.assertEqual(copied.char(), "b")
+        self.assertEqual(copied.peek_n(3), ["c", "d", "e"])
+        self.assertIs(handler.char_iter().buffer(), copied.char_iter().buffer())
+
+    def __temp_file(self, contents):
+        fd, filename = tempfile.mkstemp()
+        os.write(fd, contents)
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        return filename
+
+    def test_mmap_utf8(self):
+        """Multi byte characters are single items positioned by byte offset."""
+        handler = StreamHandler.from_filename(self.__temp_file("a\xc3\xa9\n\xe2\x82\xacb"))
+        self.addCleanup(handler.close)
+        self.assertEqual(handler.peek_n(3), ["a", "\xc3\xa9", "\n"])
+        handler.advance(2)
+        self.assertEqual(handler.char(), "\xc3\xa9")
+        self.assertEqual(handler.col_no(), 2)
+        self.assertEqual(handler.pos(), 3)
+        handler.pop_char()
+        handler.pop_char()
+        self.assertEqual(handler.char(), "\xe2\x82\xac")
+        self.assertEqual(handler.line_no(), 2)
+        self.assertEqual(handler.col_no(), 1)
+        self.assertEqual(handler.peek(), "b")
+
+        copied = copy.deepcopy(handler)
+        handler.advance(5)
+        self.assertEqual(handler.char(), "")
+        self.assertEqual(copied.peek(), "b")
+
+    def test_mmap_empty(self):
+        handler = StreamHandler.from_filename(self.__temp_file(""))
+        self.assertFalse(handler)
+        self.assertEqual(handler.peek(), "")
+
+    def test_mmap_close(self):
+        with StreamHandler.from_filename(self.__temp_file("abc")) as handler:
+            buff = handler.char_iter().buffer()
+            self.assertEqual(handler.peek(), "a")
+        self.assertRaises(ValueError, buff.read_byte)
+        with StreamHandler.from_filename(self.__temp_file("")) as handler:
+            self.assertFalse(handler)
+
+    def test_str_bytes(self):
+        """Byte strings are only split into UTF-8 sequences on request."""
+        handler = StreamHandler.from_str("\xe9ab")
+        self.assertEqual(handler.peek_n(3), ["\xe9", "a", "b"])
+        handler.advance(3)
+        self.assertEqual((handler.char(), handler.col_no()), ("b", 3))
+
+        handler = StreamHandler.from_str("\xc3\xa9ab", utf8=True)
+        self.assertEqual(handler.peek_n(3), ["\xc3\xa9", "a", "b"])
+        handler.advance(3)
+        self.assertEqual((handler.char(), handler.col_no()), ("b", 3))
+
     def test_no_partitions(self):
         handler = StreamHandler(ExtendedIterator(iter("")))
         parts = list(handler.partitions(3))
         self.assertFalse(parts)
 
+    def test_partitions(self):
+        handler = StreamHandler.from_str("ab\ncd")
+        handler.pop_char()
+        parts = list(handler.partitions(2))
+        self.assertEqual(len(parts), 3)
+        first, second = parts[1]
+        self.assertEqual(first.peek_n(10), ["b", "\n"])
+        self.assertEqual(second.peek_n(10), ["c", "d"])
+        self.assertIs(first.char_iter().buffer(), second.char_iter().buffer())
+
+        # Views start with the line and column of their offset.
+        expected = StreamHandler.from_str("ab\ncd")
+        expected.advance(3)
+        self.assertEqual((second.char(), second.line_no(), second.col_no()),
+                         (expected.char(), expected.line_no(), expected.col_no()))
+
+        self.assertEqual(list(handler.offset_partitions(2, limit=1)), [[(1, 2), (2, 5)]])
+        self.assertEqual(len(list(self.handler.partitions(3, limit=10))), 10)
+
 
 if __name__ == "__main__":
     unittest.main()